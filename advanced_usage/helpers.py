@@ -1,20 +1,41 @@
-from typing import List, Optional, Union, Callable, Dict, Any
+from typing import List, Optional, Tuple, Union, Callable, Dict, Any
 from pydantic import BaseModel, model_validator, field_validator
 from confluent_kafka import Consumer
+from confluent_kafka.admin import AdminClient
 import dlt
 import os
 import yaml
 from pathlib import Path
 
-from src.lib.kafka.message_processors import avro_processor, json_processor
+from src.lib.kafka.helpers import CONSUMER_PROFILES, consumer_tuning
+from src.lib.kafka.adaptive import AdaptiveBatchController
+from src.lib.kafka.dlq import DLQ_SINKS, DeadLetterQueue
+from src.lib.kafka.memory import MemoryGovernor
+from src.lib.kafka.metadata import ClusterMetadataCache
+from src.lib.kafka.message_processors import avro_processor, debezium_processor, json_processor
+from src.lib.kafka.pushdown import WHERE_OPS, RowPushdown, check_condition
+from src.lib.kafka.parallel import PartitionWorkerPool
 from src.lib.kafka.tracking import CustomOffsetTracker
-from src.lib.kafka.resources import enhanced_kafka_consumer
+from src.lib.kafka.backfill import TOffsetBound
+from src.lib.kafka.resources import enhanced_kafka_consumer, kafka_backfill
 
 class KafkaConfig(BaseModel):
     type: str = "simple"  # 'simple' or 'msk'
     consumer_group_id: str
     topics: Optional[List[str]] = None
     topics_regex: Optional[str] = None
+    metadata_ttl: float = 60.0  # seconds the cluster metadata is reused for
+    metadata_snapshot: Optional[str] = None  # JSON file to start repeated runs warm
+    metadata_snapshot_ttl: Optional[float] = None  # age up to which the snapshot is loaded, metadata_ttl if None
+    profile: Optional[str] = None  # 'throughput', 'low_latency' or 'memory_constrained'
+    consumer_overrides: Optional[Dict[str, Any]] = None  # raw librdkafka settings
+
+    @field_validator("profile")
+    @classmethod
+    def validate_profile(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and v not in CONSUMER_PROFILES:
+            raise ValueError(f"profile must be one of {tuple(CONSUMER_PROFILES)}")
+        return v
 
     @model_validator(mode="after")
     def validate_topic_choice(self) -> "KafkaConfig":
@@ -24,17 +45,101 @@ class KafkaConfig(BaseModel):
             raise ValueError("You must provide only one of 'topics' or 'topics_regex', not both")
         return self
     
+class AdaptiveConfig(BaseModel):
+    target: str = "throughput"  # 'throughput' or 'latency'
+    target_latency_ms: Optional[float] = None
+    min_batch_size: int = 100
+    max_batch_size: int = 50000
+    min_batch_timeout: float = 0.1
+    max_batch_timeout: float = 10.0
+
+
+class WhereConfig(BaseModel):
+    field: str  # value field, or 'topic', 'partition', 'key', 'key.<field>', 'header.<name>'
+    op: str = "=="  # see WHERE_OPS
+    value: Any = None
+
+    @field_validator("op")
+    @classmethod
+    def validate_op(cls, v: str) -> str:
+        if v not in WHERE_OPS:
+            raise ValueError(f"op must be one of {tuple(WHERE_OPS)}")
+        return v
+
+    @model_validator(mode="after")
+    def validate_value(self) -> "WhereConfig":
+        check_condition(self.field, self.op, self.value)
+        return self
+
+
+class DLQConfig(BaseModel):
+    sink: str = "table"  # 'table', 'file' or 'kafka'
+    table: str = "kafka_dlq"  # table of the 'table' sink
+    path: Optional[str] = None  # JSON lines file of the 'file' sink
+    topic: Optional[str] = None  # topic of the 'kafka' sink, on the resource cluster
+    max_error_ratio: Optional[float] = None  # aborts the run when a topic error ratio passes it
+    min_messages: int = 100  # messages of a topic seen before its error ratio is checked
+    log_interval: float = 10.0  # seconds between failure logs of a topic
+
+    @field_validator("sink")
+    @classmethod
+    def validate_sink(cls, v: str) -> str:
+        if v not in DLQ_SINKS:
+            raise ValueError(f"sink must be one of {DLQ_SINKS}")
+        return v
+
+    @model_validator(mode="after")
+    def validate_sink_target(self) -> "DLQConfig":
+        if self.sink == "file" and not self.path:
+            raise ValueError("'path' is required for the file sink")
+        if self.sink == "kafka" and not self.topic:
+            raise ValueError("'topic' is required for the kafka sink")
+        return self
+
+
 class ProcessingConfig(BaseModel):
-    serializer: str  # 'json' or 'avro'
+    serializer: str  # 'json', 'avro' or 'debezium'
     target_dataset: Optional[str]
     batch_size: Optional[int] = 3000
     batch_timeout: Optional[int] = 3
+    parallelism: int = 1
+    output_format: str = "rows"  # 'rows' or 'arrow'
+    json_engine: str = "stdlib"  # 'stdlib', 'orjson' or 'msgspec'
+    json_structs: Optional[Dict[str, Dict[str, str]]] = None  # topic -> {field: type}
+    json_struct_sample_size: int = 0
+    json_schema_sample_size: int = 0  # messages sampled to infer column types, nonconforming ones are rejected
+    json_schema_path: Optional[str] = None  # sidecar file of the inferred column types, besides the resource state
+    max_batch_bytes: Optional[int] = None  # bounds batches by message bytes, besides batch_size
+    max_rss_mb: Optional[int] = None  # pauses consumption while the process RSS is above it
+    adaptive: Optional[AdaptiveConfig] = None  # tunes batch_size and batch_timeout at runtime
+    table_mapping: Optional[Dict[str, str]] = None  # topic -> table name, unmapped topics are named after them
+    select: Optional[List[str]] = None  # top-level value fields to keep, the others aren't decoded where possible
+    where: Optional[List[WhereConfig]] = None  # ANDed conditions, message-level ones are checked before decoding
+    dlq: Optional[DLQConfig] = None  # dead letter queue of the messages failing to decode
+
+    @field_validator("parallelism")
+    @classmethod
+    def validate_parallelism(cls, v: int) -> int:
+        if v < 1:
+            raise ValueError("parallelism must be at least 1")
+        return v
+
+
+class ScheduleConfig(BaseModel):
+    lag_threshold: int = 1  # unread messages which trigger a run
+    max_staleness: Optional[float] = None  # seconds after which a run is triggered regardless of lag
 
 
 class ResourceConfig(BaseModel):
     name: str
     kafka: KafkaConfig
     processing: ProcessingConfig
+    schedule: ScheduleConfig = ScheduleConfig()
+
+    @property
+    def resource_name(self) -> str:
+        """Name of the dlt resource, which also keys its offsets in the pipeline state."""
+        return self.processing.target_dataset or self.name
 
     def create_consumer(self) -> Consumer:
         """Builds a Kafka Consumer instance based on the type."""
@@ -47,8 +152,10 @@ class ResourceConfig(BaseModel):
             conf = {
                 "bootstrap.servers": bootstrap_servers,
                 "group.id": group_id,
-                "auto.offset.reset": "earliest"
+                "auto.offset.reset": "earliest",
+                "enable.partition.eof": True,
             }
+            conf.update(consumer_tuning(self.kafka.profile, self.kafka.consumer_overrides))
             return Consumer(conf)
 
         elif self.kafka.type == "msk":
@@ -57,38 +164,218 @@ class ResourceConfig(BaseModel):
 
         else:
             raise ValueError(f"Unknown kafka type: {self.kafka.type}")
+
+    def create_admin_client(self) -> Optional[AdminClient]:
+        """Builds a Kafka AdminClient to resolve partition offsets in bulk."""
+        if self.kafka.type == "simple":
+            return AdminClient({"bootstrap.servers": os.getenv("BOOTSTRAP_SERVERS")})
+        return None
     
+    def create_pushdown(self) -> Optional[RowPushdown]:
+        """Compiles the select and where of the resource, if any."""
+        if not self.processing.select and not self.processing.where:
+            return None
+        return RowPushdown(
+            select=self.processing.select,
+            where=[w.model_dump() for w in self.processing.where or []],
+        )
+
+    def create_dlq(self) -> Optional[DeadLetterQueue]:
+        """Builds the dead letter queue of the resource, if any."""
+        dlq = self.processing.dlq
+        if dlq is None:
+            return None
+        return DeadLetterQueue(
+            sink=dlq.sink,
+            table_name=dlq.table,
+            path=dlq.path,
+            topic=dlq.topic,
+            producer_config={"bootstrap.servers": os.getenv("BOOTSTRAP_SERVERS")} if dlq.sink == "kafka" else None,
+            max_error_ratio=dlq.max_error_ratio,
+            min_messages=dlq.min_messages,
+            log_interval=dlq.log_interval,
+        )
+
     def get_msg_processor(self) -> Callable[[Any], Dict[str, Any]]:
         """Selects a message processor function based on the serializer."""
         if self.processing.serializer.lower() == "json":
-            return json_processor()
+            return json_processor(
+                engine=self.processing.json_engine,
+                structs=self.processing.json_structs,
+                struct_sample_size=self.processing.json_struct_sample_size,
+                schema_sample_size=self.processing.json_schema_sample_size,
+                schema_path=self.processing.json_schema_path,
+                pushdown=self.create_pushdown(),
+                dlq=self.create_dlq(),
+            )
         elif self.processing.serializer.lower() == "avro":
-            return avro_processor()
+            return avro_processor(
+                output_format=self.processing.output_format,
+                pushdown=self.create_pushdown(),
+                dlq=self.create_dlq(),
+            )
+        elif self.processing.serializer.lower() == "debezium":
+            return debezium_processor(pushdown=self.create_pushdown(), dlq=self.create_dlq())
         else:
             raise ValueError(f"Unsupported serializer: {self.processing.serializer}")
 
-    def build_resource(self, consumer: Consumer) -> Callable[[], Any]:
-        """Returns a DLT resource ready to be passed to pipeline.run"""
+    def build_resource(
+        self,
+        consumer: Consumer,
+        msg_processor: Optional[Callable[[Any], Dict[str, Any]]] = None,
+        admin_client: Optional[AdminClient] = None,
+        metadata_cache: Optional[ClusterMetadataCache] = None,
+        close_consumer: bool = True,
+        batch_controller: Optional[AdaptiveBatchController] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        worker_pool: Optional[PartitionWorkerPool] = None,
+    ) -> Callable[[], Any]:
+        """Returns a DLT resource ready to be passed to pipeline.run
+
+        Processor, admin client, metadata cache and batch controller are
+        created for the resource unless given, long-running callers pass
+        their own to reuse them across runs, and a `worker_pool` to keep
+        the parallel worker consumers open.
+        """
         return (
             enhanced_kafka_consumer(
+                topics=self.kafka.topics,
+                topics_regex=self.kafka.topics_regex,
+                credentials=consumer,
+                msg_processor=msg_processor or self.get_msg_processor(),
+                batch_size=self.processing.batch_size,
+                batch_timeout=self.processing.batch_timeout,
+                offset_tracker=CustomOffsetTracker,
+                parallelism=self.processing.parallelism,
+                consumer_factory=self.create_consumer,
+                output_format=self.processing.output_format,
+                admin_client=admin_client or self.create_admin_client(),
+                metadata_cache=metadata_cache or self.create_metadata_cache(consumer),
+                close_consumer=close_consumer,
+                max_batch_bytes=self.processing.max_batch_bytes,
+                max_rss_mb=self.processing.max_rss_mb,
+                batch_controller=batch_controller or self.create_batch_controller(),
+                shard=shard,
+                table_mapping=self.processing.table_mapping,
+                worker_pool=worker_pool,
+            ).with_name(self.resource_name)
+        )
+
+    def build_backfill_resource(
+        self,
+        consumer: Consumer,
+        start: TOffsetBound,
+        end: Optional[TOffsetBound] = None,
+        chunk_size: int = 100000,
+        max_workers: int = 4,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> Callable[[], Any]:
+        """Returns a DLT resource backfilling an offset or time range of the resource topics.
+
+        The resource shares the name, and so the state offsets, of the
+        incremental one, which continues after the backfilled range.
+        """
+        return (
+            kafka_backfill(
                 topics=self.kafka.topics,
                 topics_regex=self.kafka.topics_regex,
                 credentials=consumer,
                 msg_processor=self.get_msg_processor(),
+                start=start,
+                end=end,
+                chunk_size=chunk_size,
+                max_workers=max_workers,
                 batch_size=self.processing.batch_size,
                 batch_timeout=self.processing.batch_timeout,
-                offset_tracker=CustomOffsetTracker
-            ).with_name(self.processing.target_dataset or self.name)
+                consumer_factory=self.create_consumer,
+                output_format=self.processing.output_format,
+                admin_client=self.create_admin_client(),
+                metadata_cache=self.create_metadata_cache(consumer),
+                max_batch_bytes=self.processing.max_batch_bytes,
+                max_rss_mb=self.processing.max_rss_mb,
+                shard=shard,
+                table_mapping=self.processing.table_mapping,
+            ).with_name(self.resource_name)
         )
 
-    def build_pipeline(self, destination: str = "duckdb") -> dlt.Pipeline:
+    def create_batch_controller(self) -> Optional[AdaptiveBatchController]:
+        """Builds the adaptive batch controller, if adaptive batching is configured."""
+        if self.processing.adaptive is None:
+            return None
+        return AdaptiveBatchController(
+            self.processing.batch_size,
+            self.processing.batch_timeout,
+            **self.processing.adaptive.model_dump(),
+        )
+
+    def create_worker_pool(
+        self,
+        msg_processor: Callable[[Any], Dict[str, Any]],
+        batch_controller: Optional[AdaptiveBatchController] = None,
+        memory_governor: Optional[MemoryGovernor] = None,
+    ) -> Optional[PartitionWorkerPool]:
+        """Builds the pool of parallel worker consumers, if parallelism is configured.
+
+        The caller closes it. A memory governor is created from `max_rss_mb`
+        unless given.
+        """
+        if self.processing.parallelism <= 1:
+            return None
+        if memory_governor is None and self.processing.max_rss_mb:
+            memory_governor = MemoryGovernor(self.processing.max_rss_mb)
+        return PartitionWorkerPool(
+            self.create_consumer,
+            msg_processor,
+            self.processing.batch_size,
+            self.processing.batch_timeout,
+            max_batch_bytes=self.processing.max_batch_bytes,
+            memory_governor=memory_governor,
+            batch_controller=batch_controller,
+        )
+
+    def create_metadata_cache(self, consumer: Consumer) -> ClusterMetadataCache:
+        """Builds the cluster metadata cache shared by discovery and offset tracking."""
+        return ClusterMetadataCache(
+            consumer,
+            ttl=self.kafka.metadata_ttl,
+            snapshot_path=self.kafka.metadata_snapshot,
+            snapshot_ttl=self.kafka.metadata_snapshot_ttl,
+        )
+
+    def build_pipeline(
+        self, destination: str = "duckdb", shard: Optional[Tuple[int, int]] = None
+    ) -> dlt.Pipeline:
+        """Builds the resource pipeline.
+
+        Every shard gets its own pipeline, and so its own offsets in the
+        pipeline state, loading into the same dataset.
+        """
+        pipeline_name = f"{self.name}_{destination}"
+        if shard is not None:
+            pipeline_name += f"_shard{shard[0]}of{shard[1]}"
         return dlt.pipeline(
-            pipeline_name=f"{self.name}_{destination}",
+            pipeline_name=pipeline_name,
             destination=destination,
             dataset_name=self.processing.target_dataset or self.name,
             progress="log"
         )
 
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an 'i/N' shard spec into a (shard index, shards count) tuple."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected 'i/N', e.g. '0/4'")
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}': index must be in [0, {count})")
+    return index, count
+
+
+def parse_offset_bound(value: str) -> TOffsetBound:
+    """Parse a backfill bound: digits are an offset, anything else a timestamp."""
+    return int(value) if value.isdigit() else value
+
+
 def load_config_from_yaml(path: Union[str, Path]) -> List[ResourceConfig]:
     """Load and parse resource configurations from a YAML file."""
     path = Path(path)
@@ -1,7 +1,10 @@
 import argparse
 from pathlib import Path
 
-from advanced_usage.helpers import load_config_from_yaml
+from advanced_usage.helpers import load_config_from_yaml, parse_offset_bound, parse_shard
+from advanced_usage.multi_runner import run_resources
+from advanced_usage.scheduler import LagScheduler
+from advanced_usage.streaming import ContinuousRunner, PipelinedRunner
 
 import sys
 import logging
@@ -11,9 +14,27 @@ logger = logging.getLogger("dlt_kafka_runner")
 
 def main():
     parser = argparse.ArgumentParser(description="Run a DLT pipeline from a Kafka resource config.")
-    parser.add_argument("--resource", required=True, help="The name of the Kafka resource to run")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--resource", help="The name of the Kafka resource to run")
+    selection.add_argument("--resources", help="Comma-separated names of Kafka resources to run concurrently")
+    selection.add_argument("--all", action="store_true", help="Run all the Kafka resources concurrently")
     parser.add_argument("--destination", default="duckdb", help="DLT destination (e.g., duckdb, motherduck, snowflake)")
     parser.add_argument("--config", default=str(Path(__file__).parent.parent / "kafka.yml"), help="Path to YAML config file")
+    parser.add_argument("--continuous", action="store_true", help="Keep running extract/load cycles until SIGTERM")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between cycle starts in continuous mode")
+    parser.add_argument("--max-cycles", type=int, default=None, help="Stop continuous mode after this many cycles")
+    parser.add_argument("--max-workers", type=int, default=None, help="Resources run at the same time with --resources or --all")
+    parser.add_argument("--pipelined", action="store_true", help="Continuous mode consuming the next cycle while loading the previous one")
+    parser.add_argument("--schedule", action="store_true", help="Run the selected resources whenever their consumer lag calls for it")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds between lag polls in schedule mode")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="Read only the partitions owned by shard i of N, as 'i/N'")
+    parser.add_argument("--max-queued-cycles", type=int, default=2, help="Chunks read ahead of the load in pipelined mode")
+    parser.add_argument("--max-chunk-batches", type=int, default=10, help="Batches handed over to the load at once in pipelined mode")
+    parser.add_argument("--backfill", action="store_true", help="Read the --from/--to range in parallel chunks, then continue incrementally after it")
+    parser.add_argument("--from", dest="backfill_from", type=parse_offset_bound, default=0, help="Backfill start: an offset, or a timestamp (e.g. 2024-01-01T00:00:00Z)")
+    parser.add_argument("--to", dest="backfill_to", type=parse_offset_bound, default=None, help="Backfill end, exclusive: an offset or a timestamp. The high watermarks if omitted")
+    parser.add_argument("--backfill-chunk-size", type=int, default=100000, help="Maximum offsets of a partition read by one backfill worker at once")
+    parser.add_argument("--backfill-workers", type=int, default=4, help="Worker consumers reading the backfill chunks")
 
     args = parser.parse_args()
 
@@ -22,19 +43,92 @@ def main():
         config_path = Path(args.config)
         resources = load_config_from_yaml(config_path)
 
-        # Find the requested resource
-        resource_config = next((r for r in resources if r.name == args.resource), None)
-        if resource_config is None:
-            logger.error(f"No resource found with name '{args.resource}' in {args.config}")
-            sys.exit(1)
+        if args.all:
+            selected = resources
+        else:
+            names = [n.strip() for n in (args.resources or args.resource).split(",") if n.strip()]
+            by_name = {r.name: r for r in resources}
+            missing = [n for n in names if n not in by_name]
+            if missing:
+                logger.error(f"No resources found with names {missing} in {args.config}")
+                sys.exit(1)
+            selected = [by_name[n] for n in names]
+
+        if args.schedule:
+            logger.info(f"Scheduling {len(selected)} resources by lag, polling every {args.poll_interval}s")
+            scheduler = LagScheduler(
+                selected,
+                destination=args.destination,
+                max_workers=args.max_workers or 4,
+                poll_interval=args.poll_interval,
+                shard=args.shard,
+            )
+            scheduler.run()
+            return
+
+        if args.all or args.resources:
+            logger.info(f"Running {len(selected)} resources with up to {args.max_workers or 'cpu count'} workers")
+            results = run_resources(
+                selected, destination=args.destination, max_workers=args.max_workers, shard=args.shard
+            )
+            if any(r["status"] != "ok" for r in results):
+                sys.exit(1)
+            return
+
+        resource_config = selected[0]
+
+        if args.backfill:
+            logger.info(f"Backfilling {args.resource} from {args.backfill_from} to {args.backfill_to or 'the high watermarks'}")
+            consumer = resource_config.create_consumer()
+            resource = resource_config.build_backfill_resource(
+                consumer,
+                start=args.backfill_from,
+                end=args.backfill_to,
+                chunk_size=args.backfill_chunk_size,
+                max_workers=args.backfill_workers,
+                shard=args.shard,
+            )
+            pipeline = resource_config.build_pipeline(destination=args.destination, shard=args.shard)
+            info = pipeline.run(resource, loader_file_format="parquet")
+            logger.info(f"Backfill completed with loads IDs: {info}")
+            return
+
+        if args.pipelined:
+            logger.info(
+                f"Running {args.resource} pipelined, up to {args.max_queued_cycles} chunks "
+                f"of {args.max_chunk_batches} batches ahead"
+            )
+            runner = PipelinedRunner(
+                resource_config,
+                destination=args.destination,
+                interval=args.interval,
+                max_cycles=args.max_cycles,
+                max_queued_cycles=args.max_queued_cycles,
+                shard=args.shard,
+                max_chunk_batches=args.max_chunk_batches,
+            )
+            runner.run()
+            return
+
+        if args.continuous:
+            logger.info(f"Running {args.resource} continuously every {args.interval}s")
+            runner = ContinuousRunner(
+                resource_config,
+                destination=args.destination,
+                interval=args.interval,
+                max_cycles=args.max_cycles,
+                shard=args.shard,
+            )
+            runner.run()
+            return
 
         # Create consumer, resource, and pipeline
         logger.info(f"Creating Kafka consumer for resource: {args.resource}")
         consumer = resource_config.create_consumer()
 
         logger.info(f"Building resource and pipeline for destination: {args.destination}")
-        resource = resource_config.build_resource(consumer)
-        pipeline = resource_config.build_pipeline(destination=args.destination)
+        resource = resource_config.build_resource(consumer, shard=args.shard)
+        pipeline = resource_config.build_pipeline(destination=args.destination, shard=args.shard)
 
         # Run the pipeline
         logger.info("Running DLT pipeline...")
@@ -0,0 +1,134 @@
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from advanced_usage.helpers import ResourceConfig
+from src.lib.kafka.metadata import ClusterMetadataCache
+
+logger = logging.getLogger("dlt_kafka_runner")
+
+
+def prefetch_metadata(resources: List[ResourceConfig], snapshot_path: str) -> None:
+    """List the cluster topics once and save them for all the resources to start from.
+
+    Args:
+        resources (List[ResourceConfig]): Resources to run, on the same cluster.
+        snapshot_path (str): Path of the metadata snapshot to write.
+    """
+    consumer = resources[0].create_consumer()
+    try:
+        cache = ClusterMetadataCache(
+            consumer, ttl=resources[0].kafka.metadata_ttl, snapshot_path=snapshot_path
+        )
+        topics = cache.topic_names()
+        logger.info(f"Listed {len(topics)} cluster topics for {len(resources)} resources")
+    finally:
+        consumer.close()
+
+
+def run_resource(
+    resource_config: ResourceConfig, destination: str, shard: Optional[Tuple[int, int]] = None
+) -> Dict[str, Any]:
+    """Run one resource to the end, in a worker process.
+
+    Args:
+        resource_config (ResourceConfig): Resource to run.
+        destination (str): dlt destination name.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            to read only the partitions owned by the shard.
+
+    Returns:
+        Dict[str, Any]: Resource name, status, loaded rows by table,
+            run time and error, if any.
+    """
+    logging.basicConfig(level=logging.INFO)
+    started = time.monotonic()
+    result: Dict[str, Any] = {"name": resource_config.name, "status": "ok", "rows": {}, "error": None}
+    try:
+        consumer = resource_config.create_consumer()
+        resource = resource_config.build_resource(consumer, shard=shard)
+        pipeline = resource_config.build_pipeline(destination=destination, shard=shard)
+        pipeline.run(resource, loader_file_format="parquet")
+
+        row_counts = pipeline.last_trace.last_normalize_info.row_counts
+        result["rows"] = {t: n for t, n in row_counts.items() if not t.startswith("_dlt")}
+    except Exception as e:
+        logger.exception(f"Resource {resource_config.name} failed: {e}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+
+    result["seconds"] = time.monotonic() - started
+    return result
+
+
+def format_report(results: List[Dict[str, Any]], elapsed: float) -> str:
+    """Render a per-resource throughput table of a multi-resource run."""
+    lines = [f"{'resource':<30} {'status':<8} {'rows':>10} {'seconds':>9} {'rows/s':>10}"]
+    total_rows = 0
+    for result in sorted(results, key=lambda r: r["name"]):
+        rows = sum(result["rows"].values())
+        total_rows += rows
+        rate = rows / result["seconds"] if result["seconds"] else 0.0
+        lines.append(
+            f"{result['name']:<30} {result['status']:<8} {rows:>10} {result['seconds']:>9.2f} {rate:>10.1f}"
+        )
+    rate = total_rows / elapsed if elapsed else 0.0
+    lines.append(f"{'total':<30} {'':<8} {total_rows:>10} {elapsed:>9.2f} {rate:>10.1f}")
+    return "\n".join(lines)
+
+
+def run_resources(
+    resources: List[ResourceConfig],
+    destination: str = "duckdb",
+    max_workers: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> List[Dict[str, Any]]:
+    """Run several resources concurrently, each in its own process.
+
+    The cluster topics are listed once, up front, and every resource
+    starts from that metadata snapshot, unless it sets its own. The
+    snapshot is loaded however late a resource starts, as it lives only
+    as long as the run.
+
+    Args:
+        resources (List[ResourceConfig]): Resources to run.
+        destination (str): dlt destination name.
+        max_workers (Optional[int]): Resources run at the same time,
+            the number of CPUs if None.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            applied to every resource.
+
+    Returns:
+        List[Dict[str, Any]]: Results of the resources, as returned by `run_resource`.
+    """
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix="dlt_kafka_") as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, "metadata.json")
+        prefetch_metadata(resources, snapshot_path)
+
+        configs = [
+            r
+            if r.kafka.metadata_snapshot
+            else r.model_copy(
+                update={
+                    "kafka": r.kafka.model_copy(
+                        update={"metadata_snapshot": snapshot_path, "metadata_snapshot_ttl": float("inf")}
+                    )
+                }
+            )
+            for r in resources
+        ]
+
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(run_resource, config, destination, shard): config.name for config in configs}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                logger.info(f"Resource {result['name']} finished: {result['status']}")
+
+    logger.info("Throughput report:\n" + format_report(results, time.monotonic() - started))
+    return results
@@ -0,0 +1,218 @@
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import dlt
+from confluent_kafka import TopicPartition
+
+from advanced_usage.helpers import ResourceConfig
+from advanced_usage.multi_runner import run_resource
+from advanced_usage.streaming import committed_offsets
+from src.lib.kafka.helpers import partition_shard, read_high_watermarks
+from src.lib.kafka.metadata import ClusterMetadataCache
+
+logger = logging.getLogger("dlt_kafka_runner")
+
+
+class LagScheduler:
+    """Runs resources when their consumer lag calls for it.
+
+    Every `poll_interval` seconds the lag of every idle resource is
+    computed: high watermarks of its partitions minus the offsets saved
+    in its pipeline state. A resource is due when the lag reaches its
+    `schedule.lag_threshold`, or when `schedule.max_staleness` seconds
+    passed since its last run. Due resources are started in a process
+    pool, the most lagged first, while there are free worker slots.
+
+    Watermarks are read with one scheduler consumer, and topics through
+    one metadata cache, for all the resources. Pipelines are built once
+    per resource, their states are read from disk on every poll. SIGTERM
+    and SIGINT stop the scheduling, the running resources are waited for.
+
+    A failed run is logged and its resource is due again on the next poll.
+    A broken process pool, e.g. after a worker got killed, is replaced.
+
+    Args:
+        resources (List[ResourceConfig]): Resources to schedule, on the same cluster.
+        destination (str): dlt destination name.
+        max_workers (int): Resources run at the same time.
+        poll_interval (float): Seconds between lag polls.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            to schedule on the lag of the partitions owned by the shard.
+    """
+
+    def __init__(
+        self,
+        resources: List[ResourceConfig],
+        destination: str = "duckdb",
+        max_workers: int = 4,
+        poll_interval: float = 10.0,
+        shard: Optional[Tuple[int, int]] = None,
+    ):
+        self.resources = {r.name: r for r in resources}
+        self.destination = destination
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.shard = shard
+
+        self.consumer = resources[0].create_consumer()
+        self.admin_client = resources[0].create_admin_client()
+        self.metadata_cache = ClusterMetadataCache(self.consumer, ttl=resources[0].kafka.metadata_ttl)
+
+        self._pipelines: Dict[str, dlt.Pipeline] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # running resources, with the pool they run in
+        self._running: Dict[str, Tuple[Future, ProcessPoolExecutor]] = {}
+        # time of the last run start, by resource name
+        self._last_run: Dict[str, float] = {}
+        self._stop = threading.Event()
+
+    def stop(self, *_args) -> None:
+        """Stop scheduling new runs, the running ones are finished."""
+        if not self._stop.is_set():
+            logger.info("Stop requested, waiting for the running resources")
+        self._stop.set()
+
+    def lag(self, resource_config: ResourceConfig) -> int:
+        """Messages of a resource topics not loaded yet.
+
+        Args:
+            resource_config (ResourceConfig): Resource to compute the lag of.
+
+        Returns:
+            int: Sum of the per-partition lags.
+        """
+        kafka = resource_config.kafka
+        topics = kafka.topics or self.metadata_cache.match(kafka.topics_regex)
+        parts = [
+            TopicPartition(t_name, part)
+            for t_name, partitions in self.metadata_cache.partitions(topics).items()
+            for part in partitions
+            if self.shard is None or partition_shard(t_name, part, self.shard[1]) == self.shard[0]
+        ]
+        watermarks = read_high_watermarks(self.consumer, parts, self.admin_client)
+
+        pipeline = self._pipelines.get(resource_config.name)
+        if pipeline is None:
+            pipeline = self._pipelines[resource_config.name] = resource_config.build_pipeline(
+                destination=self.destination, shard=self.shard
+            )
+        offsets = committed_offsets(pipeline, resource_config.resource_name)
+
+        lag = 0
+        for part, high in zip(parts, watermarks):
+            next_offset = offsets.get(part.topic, {}).get(str(part.partition), -1) + 1
+            lag += max(high - next_offset, 0)
+        return lag
+
+    def due(self) -> List[str]:
+        """Names of the idle resources due to run, the most lagged first."""
+        now = time.monotonic()
+        lags = {}
+        for name, resource_config in self.resources.items():
+            if name in self._running:
+                continue
+
+            try:
+                lag = self.lag(resource_config)
+            except Exception as e:
+                logger.warning(f"Failed to compute lag of {name}: {e}")
+                continue
+
+            schedule = resource_config.schedule
+            last_run = self._last_run.get(name)
+            stale = schedule.max_staleness is not None and (
+                last_run is None or now - last_run >= schedule.max_staleness
+            )
+            if lag >= schedule.lag_threshold or stale:
+                lags[name] = lag
+
+        return sorted(lags, key=lags.get, reverse=True)
+
+    def _new_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def _failed(self, name: str, error: BaseException) -> None:
+        logger.error(f"Resource {name} failed: {error!r}, rescheduling it")
+        # due again on the next poll, regardless of its staleness
+        self._last_run.pop(name, None)
+
+    def _collect(self) -> None:
+        broken = False
+        for name, (future, pool) in list(self._running.items()):
+            if not future.done():
+                continue
+
+            del self._running[name]
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                self._failed(name, e)
+                broken = broken or pool is self._pool
+                continue
+            except Exception as e:
+                self._failed(name, e)
+                continue
+
+            logger.info(
+                f"Resource {name} finished: {result['status']}, "
+                f"{sum(result['rows'].values())} rows in {result['seconds']:.2f}s"
+            )
+            if result["status"] != "ok":
+                self._last_run.pop(name, None)
+
+        if broken:
+            logger.warning("Worker pool broke, starting a new one")
+            self._new_pool()
+
+    def _submit(self, name: str) -> None:
+        logger.info(f"Scheduling {name}")
+        self._last_run[name] = time.monotonic()
+        try:
+            future = self._pool.submit(run_resource, self.resources[name], self.destination, self.shard)
+        except BrokenProcessPool as e:
+            self._failed(name, e)
+            self._new_pool()
+            return
+        self._running[name] = (future, self._pool)
+
+    def run(self, max_polls: Optional[int] = None) -> None:
+        """Poll lags and run the due resources until stopped.
+
+        Args:
+            max_polls (Optional[int]): Stop after this many polls, run
+                until signalled if None.
+        """
+        previous_handlers = {
+            sig: signal.signal(sig, self.stop) for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        polls = 0
+        self._new_pool()
+        try:
+            while not self._stop.is_set():
+                self._collect()
+
+                free_slots = self.max_workers - len(self._running)
+                if free_slots > 0:
+                    for name in self.due()[:free_slots]:
+                        self._submit(name)
+
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    break
+                self._stop.wait(self.poll_interval)
+
+            wait([future for future, _ in self._running.values()])
+            self._collect()
+        finally:
+            self._pool.shutdown(wait=True)
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            self.consumer.close()
@@ -0,0 +1,352 @@
+import copy
+import logging
+import queue
+import signal
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import dlt
+from dlt.common.typing import DictStrAny
+
+from advanced_usage.helpers import ResourceConfig
+from src.lib.kafka.memory import MemoryGovernor
+from src.lib.kafka.resources import read_batches
+from src.lib.kafka.tracking import CustomOffsetTracker
+
+logger = logging.getLogger("dlt_kafka_runner")
+
+
+class ContinuousRunner:
+    """Runs a Kafka resource in repeated extract/normalize/load cycles.
+
+    The consumer, message processor, admin client, metadata cache, batch
+    controller, parallel worker pool and dlt pipeline are created once and
+    reused by every cycle, so a cycle pays only for reading and loading the
+    new messages: with `parallelism` > 1 the worker consumers stay open,
+    and their batch controllers keep learning, between cycles. Every cycle
+    starts a new offset tracker, which reads fresh high watermarks.
+
+    SIGTERM and SIGINT stop the runner after the in-flight cycle is
+    loaded, so its offsets are committed with the data.
+
+    Args:
+        resource_config (ResourceConfig): Resource to run.
+        destination (str): dlt destination name.
+        interval (float): Seconds between cycle starts. A cycle running
+            longer than that is followed by the next one right away.
+        max_cycles (Optional[int]): Stop after this many cycles, run
+            until signalled if None.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            to read only the partitions owned by the shard.
+    """
+
+    def __init__(
+        self,
+        resource_config: ResourceConfig,
+        destination: str = "duckdb",
+        interval: float = 5.0,
+        max_cycles: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ):
+        self.resource_config = resource_config
+        self.interval = interval
+        self.max_cycles = max_cycles
+        self.shard = shard
+        self._stop = threading.Event()
+
+        self.consumer = resource_config.create_consumer()
+        self.msg_processor = resource_config.get_msg_processor()
+        self.admin_client = resource_config.create_admin_client()
+        self.metadata_cache = resource_config.create_metadata_cache(self.consumer)
+        # batch size and timeout keep adapting across the cycles
+        self.batch_controller = resource_config.create_batch_controller()
+        self.worker_pool = resource_config.create_worker_pool(self.msg_processor, self.batch_controller)
+
+        self.pipeline = resource_config.build_pipeline(destination=destination, shard=shard)
+        # signals are handled here, between cycles, so dlt mustn't abort a cycle on them
+        self.pipeline.runtime_config.intercept_signals = False
+
+    def close(self) -> None:
+        """Close the consumer and the worker consumers."""
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+        self.consumer.close()
+
+    def stop(self, *_args) -> None:
+        """Ask the runner to stop once the in-flight cycle is loaded."""
+        if not self._stop.is_set():
+            logger.info("Stop requested, finishing the in-flight cycle")
+        self._stop.set()
+
+    def run_cycle(self) -> None:
+        """Extract, normalize and load the messages that arrived since the last cycle."""
+        resource = self.resource_config.build_resource(
+            self.consumer,
+            msg_processor=self.msg_processor,
+            admin_client=self.admin_client,
+            metadata_cache=self.metadata_cache,
+            close_consumer=False,
+            batch_controller=self.batch_controller,
+            shard=self.shard,
+            worker_pool=self.worker_pool,
+        )
+        self.pipeline.run(resource, loader_file_format="parquet")
+
+    def run(self) -> int:
+        """Run cycles until stopped or `max_cycles` is reached.
+
+        Returns:
+            int: Number of completed cycles.
+        """
+        previous_handlers = {
+            sig: signal.signal(sig, self.stop) for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        cycles = 0
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                self.run_cycle()
+                cycles += 1
+
+                row_counts = self.pipeline.last_trace.last_normalize_info.row_counts
+                logger.info(
+                    f"Cycle {cycles} loaded {row_counts} in {time.monotonic() - started:.2f}s"
+                )
+
+                if self.max_cycles is not None and cycles >= self.max_cycles:
+                    break
+                self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        finally:
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            self.close()
+
+        logger.info(f"Continuous run stopped after {cycles} cycles")
+        return cycles
+
+
+def committed_offsets(pipeline: dlt.Pipeline, resource_name: str) -> Dict[str, Dict[str, int]]:
+    """Offsets of a resource as committed by the last successful load.
+
+    Args:
+        pipeline (dlt.Pipeline): Pipeline the resource is loaded with.
+        resource_name (str): Name of the resource.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Last loaded offset by partition, by topic.
+    """
+    schema_name = pipeline.default_schema_name or pipeline.pipeline_name
+    sources = pipeline.state.get("sources", {})
+    resources = sources.get(schema_name, {}).get("resources", {})
+    if resource_name not in resources:
+        # pipeline objects created before the first load don't know the schema name
+        resources = next(
+            (s["resources"] for s in sources.values() if resource_name in s.get("resources", {})), {}
+        )
+    return copy.deepcopy(resources.get(resource_name, {}).get("offsets", {}))
+
+
+class PipelinedRunner(ContinuousRunner):
+    """Runs a Kafka resource with extraction overlapped with loading.
+
+    A consumer thread reads cycle after cycle and hands them over to
+    the main thread, which normalizes and loads them, through a bounded
+    queue. A cycle is handed over in chunks of at most `max_chunk_batches`
+    batches, so chunk N+1 is consumed and decoded while chunk N is being
+    loaded, and the consumer is blocked once `max_queued_cycles` chunks
+    wait for load: a large backlog is never held in memory as a whole.
+    On a stop signal the chunks already queued are loaded before exiting.
+
+    The consumer thread keeps its read offsets in memory. Every chunk
+    carries a snapshot of them, taken when it's handed over, which is
+    written into the resource state by the load of that chunk, so the
+    offsets move forward in the pipeline state only together with the
+    data they cover. If a load fails, the runner stops, and the next
+    run starts from the last loaded offsets.
+
+    Args:
+        resource_config (ResourceConfig): Resource to run.
+        destination (str): dlt destination name.
+        interval (float): Seconds between the starts of cycles, which
+            read no messages.
+        max_cycles (Optional[int]): Stop after this many loaded chunks,
+            run until signalled if None.
+        max_queued_cycles (int): Chunks buffered before the consumer
+            thread is blocked.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            to read only the partitions owned by the shard.
+        max_chunk_batches (int): Batches read before they are handed
+            over to the loader, each one within `batch_size` messages
+            and `max_batch_bytes`.
+    """
+
+    def __init__(
+        self,
+        resource_config: ResourceConfig,
+        destination: str = "duckdb",
+        interval: float = 5.0,
+        max_cycles: Optional[int] = None,
+        max_queued_cycles: int = 2,
+        shard: Optional[Tuple[int, int]] = None,
+        max_chunk_batches: int = 10,
+    ):
+        super().__init__(resource_config, destination, interval, max_cycles, shard)
+        self.max_chunk_batches = max_chunk_batches
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queued_cycles)
+
+        self._loading = threading.Event()
+        max_rss_mb = resource_config.processing.max_rss_mb
+        # the reader waits for the loader to drain the queued chunks
+        self._memory_governor = (
+            MemoryGovernor(max_rss_mb, draining=lambda: self._loading.is_set() or not self._queue.empty())
+            if max_rss_mb
+            else None
+        )
+        if self.worker_pool is not None:
+            # its workers wait for the loader too, no worker consumers are created yet
+            self.worker_pool = resource_config.create_worker_pool(
+                self.msg_processor, self.batch_controller, self._memory_governor
+            )
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _topics(self) -> List[str]:
+        kafka = self.resource_config.kafka
+        if kafka.topics:
+            return kafka.topics
+        return self.metadata_cache.match(kafka.topics_regex)
+
+    def _read(self, state: DictStrAny) -> None:
+        processing = self.resource_config.processing
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                tracker = CustomOffsetTracker(
+                    self.consumer,
+                    self._topics(),
+                    state,
+                    admin_client=self.admin_client,
+                    metadata=self.metadata_cache,
+                    shard=self.shard,
+                )
+
+                items: List[Any] = []
+                batches = handed_over = 0
+                for batch_items in read_batches(
+                    self.consumer,
+                    tracker,
+                    self.msg_processor,
+                    processing.batch_size,
+                    processing.batch_timeout,
+                    processing.output_format,
+                    processing.parallelism,
+                    self.resource_config.create_consumer,
+                    processing.max_batch_bytes,
+                    self._memory_governor,
+                    self.batch_controller,
+                    processing.table_mapping,
+                    self.worker_pool,
+                ):
+                    items.extend(batch_items)
+                    batches += 1
+                    if batches >= self.max_chunk_batches:
+                        # the offsets moved over exactly the batches of the chunk
+                        if not self._put((items, copy.deepcopy(state["offsets"]))):
+                            return
+                        items, batches = [], 0
+                        handed_over += 1
+                self.consumer.resume(self.consumer.assignment())
+
+                if items:
+                    if not self._put((items, copy.deepcopy(state["offsets"]))):
+                        break
+                elif not handed_over:
+                    self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        except Exception as e:
+            logger.error(f"Consumer thread failed: {e}")
+            self._put(e)
+        finally:
+            self.consumer.unassign()
+
+    def _load(self, items: List[Any], offsets: Dict[str, Dict[str, int]]) -> None:
+        def _read_cycle() -> Iterator[Any]:
+            # committed with the load, only if it succeeds
+            state = dlt.current.resource_state()
+            state["offsets"] = offsets
+            bind_state = getattr(self.msg_processor, "bind_state", None)
+            if bind_state is not None:
+                bind_state(state)
+            yield from items
+
+        resource = dlt.resource(_read_cycle, name=self.resource_config.resource_name)
+        self._loading.set()
+        try:
+            self.pipeline.run(resource(), loader_file_format="parquet")
+        finally:
+            self._loading.clear()
+
+    def run(self) -> int:
+        """Read and load cycles until stopped or `max_cycles` is loaded.
+
+        Returns:
+            int: Number of loaded cycles.
+        """
+        previous_handlers = {
+            sig: signal.signal(sig, self.stop) for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        # restore the state from the destination, if it's not local
+        self.pipeline.sync_destination()
+        state = {"offsets": committed_offsets(self.pipeline, self.resource_config.resource_name)}
+        reader = threading.Thread(target=self._read, args=(state,), name="kafka-reader", daemon=True)
+        reader.start()
+
+        cycles = 0
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    # the reader stops only when asked to, or failed
+                    if not reader.is_alive():
+                        break
+                    continue
+                if isinstance(item, BaseException):
+                    raise item
+
+                started = time.monotonic()
+                items, offsets = item
+                self._load(items, offsets)
+                cycles += 1
+
+                row_counts = self.pipeline.last_trace.last_normalize_info.row_counts
+                logger.info(
+                    f"Cycle {cycles} loaded {row_counts} in {time.monotonic() - started:.2f}s"
+                )
+
+                if self.max_cycles is not None and cycles >= self.max_cycles:
+                    break
+        finally:
+            self._stop.set()
+            # unblock the reader waiting on a full queue, cycles read after
+            # the stop aren't loaded and so are read again by the next run
+            while reader.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            self.close()
+
+        logger.info(f"Pipelined run stopped after {cycles} cycles")
+        return cycles
@@ -0,0 +1,168 @@
+from typing import List, Optional
+
+from confluent_kafka import Message
+from dlt.common import logger
+
+ADAPTIVE_TARGETS = ("throughput", "latency")
+
+# multiplicative steps of the throughput hill climb
+_GROW = 1.25
+_SHRINK = 0.8
+
+
+class AdaptiveBatchController:
+    """Tunes the `consume()` batch size and timeout from the measured batches.
+
+    Every batch reports how many messages were asked for and got, how long
+    `consume()` and decoding took and how big the messages were. Values are
+    kept within the configured bounds and moved toward the target:
+
+    - "throughput": the batch size hill-climbs on messages per second, it
+      keeps growing (or shrinking) while the rate improves and turns back
+      when it drops. Batches coming back short mean the topics are idle,
+      so the timeout is cut to waste less time waiting for them.
+    - "latency": batches slower than `target_latency_ms` halve the batch
+      size, faster ones grow it by `min_batch_size` (AIMD). The timeout
+      is never longer than the target.
+
+    Every change is logged with the measurements it was made on.
+
+    Args:
+        batch_size (int): Initial batch size.
+        batch_timeout (float): Initial batch timeout, in seconds.
+        min_batch_size (int): Batch size lower bound.
+        max_batch_size (int): Batch size upper bound.
+        min_batch_timeout (float): Batch timeout lower bound, in seconds.
+        max_batch_timeout (float): Batch timeout upper bound, in seconds.
+        target (str): "throughput" or "latency".
+        target_latency_ms (Optional[float]): Batch consume and decode time
+            to stay under, required for the "latency" target.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        batch_timeout: float,
+        min_batch_size: int = 100,
+        max_batch_size: int = 50000,
+        min_batch_timeout: float = 0.1,
+        max_batch_timeout: float = 10.0,
+        target: str = "throughput",
+        target_latency_ms: Optional[float] = None,
+    ):
+        if target not in ADAPTIVE_TARGETS:
+            raise ValueError(f"Unknown adaptive target: {target}. Expected one of {ADAPTIVE_TARGETS}")
+        if target == "latency" and not target_latency_ms:
+            raise ValueError("target_latency_ms is required for the latency target")
+
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.min_batch_timeout = min_batch_timeout
+        self.max_batch_timeout = max_batch_timeout
+        self.target = target
+        self.target_latency_ms = target_latency_ms
+
+        if target == "latency":
+            max_batch_timeout = min(max_batch_timeout, target_latency_ms / 1000)
+        self.batch_size = int(min(max(batch_size, min_batch_size), max_batch_size))
+        self.batch_timeout = min(max(batch_timeout, min_batch_timeout), max_batch_timeout)
+
+        self._last_rate: Optional[float] = None
+        self._direction = 1
+
+    def clone(self) -> "AdaptiveBatchController":
+        """A controller with the same settings and no measurements, e.g. for another worker."""
+        return AdaptiveBatchController(
+            self.batch_size,
+            self.batch_timeout,
+            self.min_batch_size,
+            self.max_batch_size,
+            self.min_batch_timeout,
+            self.max_batch_timeout,
+            self.target,
+            self.target_latency_ms,
+        )
+
+    def merge(self, controllers: List["AdaptiveBatchController"]) -> None:
+        """Take the mean batch size and timeout of other controllers, e.g. of the workers' clones.
+
+        Args:
+            controllers (List[AdaptiveBatchController]): Controllers tuned
+                separately, with the same settings as this one.
+        """
+        if not controllers:
+            return
+        size = sum(c.batch_size for c in controllers) / len(controllers)
+        timeout = sum(c.batch_timeout for c in controllers) / len(controllers)
+        self._apply(int(size), timeout, f"mean of {len(controllers)} workers")
+
+    def record(
+        self,
+        requested: int,
+        messages: List[Message],
+        consume_seconds: float,
+        decode_seconds: float,
+    ) -> None:
+        """Adjust the batch size and timeout after a batch.
+
+        Args:
+            requested (int): Messages asked from `consume()`.
+            messages (List[Message]): Messages it returned.
+            consume_seconds (float): Time spent in `consume()`.
+            decode_seconds (float): Time spent processing the messages.
+        """
+        count = len(messages)
+        if not count:
+            return
+
+        elapsed = consume_seconds + decode_seconds
+        avg_bytes = sum(len(m.value() or b"") for m in messages) / count
+        is_full = count >= requested
+        # a batch bounded by the remaining messages or bytes says nothing of its size
+        is_capped = requested < self.batch_size
+
+        size, timeout = self.batch_size, self.batch_timeout
+        if self.target == "latency":
+            if elapsed * 1000 > self.target_latency_ms:
+                size = size // 2
+                reason = f"batch took {elapsed * 1000:.0f} ms, over {self.target_latency_ms:.0f} ms"
+            elif is_full and not is_capped:
+                size = size + self.min_batch_size
+                reason = f"batch took {elapsed * 1000:.0f} ms, under {self.target_latency_ms:.0f} ms"
+            else:
+                return
+        elif not is_full:
+            # idle topics: the batch size isn't the limit, the wait is
+            timeout = timeout * _SHRINK
+            reason = f"batch returned {count}/{requested} messages in {consume_seconds:.2f}s"
+        elif is_capped:
+            return
+        else:
+            rate = count / elapsed if elapsed else float("inf")
+            if self._last_rate is not None and rate < self._last_rate * 0.95:
+                self._direction = -self._direction
+            self._last_rate = rate
+
+            size = size * (_GROW if self._direction > 0 else _SHRINK)
+            if consume_seconds > timeout * 0.5:
+                timeout = timeout * _GROW
+            reason = f"{rate:.0f} msgs/s"
+
+        self._apply(int(size), timeout, f"{reason}, avg message {avg_bytes:.0f} B")
+
+    def _apply(self, size: int, timeout: float, reason: str) -> None:
+        max_timeout = self.max_batch_timeout
+        if self.target == "latency":
+            max_timeout = min(max_timeout, self.target_latency_ms / 1000)
+
+        size = min(max(size, self.min_batch_size), self.max_batch_size)
+        timeout = min(max(timeout, self.min_batch_timeout), max_timeout)
+        if size == self.batch_size and timeout == self.batch_timeout:
+            return
+
+        logger.info(
+            f"Adaptive batching ({self.target}): batch_size {self.batch_size} -> {size}, "
+            f"batch_timeout {self.batch_timeout:.2f}s -> {timeout:.2f}s: {reason}"
+        )
+        self.batch_size = size
+        self.batch_timeout = timeout
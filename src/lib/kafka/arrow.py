@@ -0,0 +1,227 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from dlt.common.libs.pyarrow import pyarrow as pa
+from dlt.common.typing import TDataItems
+
+from .dlq import RateLimitedLog
+
+KAFKA_TOPIC_COLUMN = "_kafka__topic"
+
+# mixed type columns are logged at most once per topic column and interval
+_mixed_types_log = RateLimitedLog()
+
+
+def _flatten(prefix: str, value: Dict[str, Any], row: Dict[str, Any]) -> None:
+    # mirror dlt's normalizer, which flattens nested dicts with `__`
+    for k, v in value.items():
+        if isinstance(v, dict):
+            _flatten(f"{prefix}__{k}", v, row)
+        else:
+            row[f"{prefix}__{k}"] = v
+
+
+class MixedTypesError(ValueError):
+    """A column has values of different types, which don't make an Arrow array.
+
+    Args:
+        name (str): Column name.
+        indices (List[int]): Positions of the values not of the column's
+            most common type.
+    """
+
+    def __init__(self, name: str, indices: List[int]):
+        super().__init__(f"Column {name} has mixed types, in {len(indices)} values")
+        self.name = name
+        self.indices = indices
+
+
+def _minority_indices(values: List[Any]) -> List[int]:
+    # types of the single values, those failing on their own never fit
+    types: List[Optional["pa.DataType"]] = []
+    for value in values:
+        try:
+            types.append(None if value is None else pa.array([value]).type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            types.append(pa.null())
+
+    counts = Counter(t for t in types if t is not None and t != pa.null())
+    if not counts:
+        return [i for i, t in enumerate(types) if t is not None]
+    common = counts.most_common(1)[0][0]
+    minority = [i for i, t in enumerate(types) if t is not None and t != common]
+    # values of the same type which still don't fit together
+    return minority or [i for i, t in enumerate(types) if t is not None]
+
+
+def mixed_types_reason(error: MixedTypesError) -> str:
+    """Reject reason of the rows left out of a mixed type column."""
+    return f"value of {error.name} has another type than the rest of the column"
+
+
+def log_mixed_types(topic: str, error: MixedTypesError, count: int) -> None:
+    """Log the rows left out of a mixed type column, at most once per column and interval."""
+    _mixed_types_log.warning(
+        f"{topic}.{error.name}",
+        f"Column {error.name} of topic {topic} has mixed types, "
+        f"{len(error.indices)} of {count} messages go to the rejects table",
+    )
+
+
+def values_to_array(name: str, values: List[Any]) -> "pa.Array":
+    """Build an Arrow array of a column.
+
+    Args:
+        name (str): Column name.
+        values (List[Any]): Column values.
+
+    Raises:
+        MixedTypesError: The values have different types, with the positions
+            of the ones not of the most common type.
+
+    Returns:
+        pa.Array: The column.
+    """
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise MixedTypesError(name, _minority_indices(values)) from e
+
+
+def flat_columns(name: str, values: List[Any]) -> Dict[str, "pa.Array"]:
+    """Build the columns of a value, flattened the same way `rows_to_tables` does.
+
+    Dict values, e.g. record keys, become `<name>__<field>` columns,
+    other values a single `<name>` column.
+
+    Args:
+        name (str): Column name.
+        values (List[Any]): Column values.
+
+    Raises:
+        MixedTypesError: A column has mixed types.
+
+    Returns:
+        Dict[str, pa.Array]: Columns by name.
+    """
+    flat_rows = []
+    for value in values:
+        flat: Dict[str, Any] = {}
+        if isinstance(value, dict):
+            _flatten(name, value, flat)
+        else:
+            flat[name] = value
+        flat_rows.append(flat)
+
+    names = list(dict.fromkeys(k for flat in flat_rows for k in flat))
+    return {k: values_to_array(k, [flat.get(k) for flat in flat_rows]) for k in names}
+
+
+def rows_to_tables(
+    rows: List[Dict[str, Any]], rejects: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, "pa.Table"]:
+    """Convert processed Kafka messages into Arrow tables, one per topic.
+
+    The `_kafka` metadata is flattened into `_kafka__<field>` columns,
+    the same names dlt gives them when normalizing rows. Columns are
+    the union of all the keys of the topic rows, absent values are null.
+
+    Rows with a value of another type than the most common one of its
+    column are left out of the tables, into `rejects` with their
+    `_reject_reason`, so that a column keeps its type from batch to batch.
+
+    Args:
+        rows (List[Dict[str, Any]]): Processed messages, each with the
+            `_kafka` metadata dict.
+        rejects (Optional[List[Dict[str, Any]]]): Collects the rows left out.
+
+    Raises:
+        MixedTypesError: A column has mixed types and `rejects` is None.
+
+    Returns:
+        Dict[str, pa.Table]: Tables by topic name.
+    """
+    by_topic: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+    for row in rows:
+        flat = {k: v for k, v in row.items() if k != "_kafka"}
+        _flatten("_kafka", row["_kafka"], flat)
+        by_topic.setdefault(row["_kafka"]["topic"], []).append((row, flat))
+
+    tables = {}
+    for topic, topic_rows in by_topic.items():
+        while topic_rows:
+            # dict preserves the order in which columns first appear
+            names = list(dict.fromkeys(k for _, flat in topic_rows for k in flat))
+            try:
+                tables[topic] = pa.table(
+                    {name: values_to_array(name, [flat.get(name) for _, flat in topic_rows]) for name in names}
+                )
+                break
+            except MixedTypesError as e:
+                if rejects is None:
+                    raise
+                left_out = set(e.indices)
+                log_mixed_types(topic, e, len(topic_rows))
+                rejects.extend(
+                    {**row, "_reject_reason": mixed_types_reason(e)}
+                    for i, (row, _) in enumerate(topic_rows)
+                    if i in left_out
+                )
+                topic_rows = [item for i, item in enumerate(topic_rows) if i not in left_out]
+
+    return tables
+
+
+def split_table_by_topic(table: "pa.Table") -> Dict[str, "pa.Table"]:
+    """Split an Arrow table with messages of several topics.
+
+    Args:
+        table (pa.Table): A table with the `_kafka__topic` column.
+
+    Returns:
+        Dict[str, pa.Table]: Tables by topic name.
+    """
+    topic_column = table.column(KAFKA_TOPIC_COLUMN)
+    topics = topic_column.unique().to_pylist()
+    if len(topics) == 1:
+        return {topics[0]: table}
+
+    return {topic: table.filter(pa.compute.equal(topic_column, topic)) for topic in topics}
+
+
+def to_topic_tables(items: TDataItems) -> Tuple[Dict[str, "pa.Table"], List[Dict[str, Any]]]:
+    """Turn a processed batch into Arrow tables, one per topic.
+
+    Accepts any output of a message processor: a list of dicts,
+    an Arrow table or a list of Arrow tables, with the rejected rows
+    of a columnar decoder next to them.
+
+    Args:
+        items (TDataItems): A processed batch.
+
+    Returns:
+        Tuple[Dict[str, pa.Table], List[Dict[str, Any]]]: Tables by topic
+            name, and the rejected rows, with their `_reject_reason`.
+    """
+    rejects: List[Dict[str, Any]] = []
+    if isinstance(items, pa.Table):
+        return split_table_by_topic(items), rejects
+
+    if not items:
+        return {}, rejects
+
+    if all(isinstance(item, dict) for item in items):
+        return rows_to_tables(items, rejects), rejects
+
+    tables: Dict[str, List[pa.Table]] = {}
+    for item in items:
+        if isinstance(item, dict):
+            rejects.append(item)
+            continue
+        for topic, topic_table in split_table_by_topic(item).items():
+            tables.setdefault(topic, []).append(topic_table)
+
+    return {
+        topic: parts[0] if len(parts) == 1 else pa.concat_tables(parts, promote_options="default")
+        for topic, parts in tables.items()
+    }, rejects
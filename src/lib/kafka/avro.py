@@ -0,0 +1,534 @@
+import json
+import struct
+import threading
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from confluent_kafka import Message
+from confluent_kafka.schema_registry import SchemaRegistryClient
+from dlt.common import logger
+from dlt.common.libs.pyarrow import pyarrow as pa
+from dlt.common.schema.typing import TColumnSchema, TTableSchemaColumns
+from fastavro import parse_schema, schemaless_reader
+
+from .arrow import MixedTypesError, flat_columns, log_mixed_types, mixed_types_reason, values_to_array
+from .pushdown import RowPushdown
+
+MAGIC_BYTE = 0
+HEADER_SIZE = 5
+
+# logical types decoded column-wise from their raw (int/long) Avro values
+_LOGICAL_ARROW_TYPES = {
+    "timestamp-millis": pa.timestamp("ms", tz="UTC"),
+    "timestamp-micros": pa.timestamp("us", tz="UTC"),
+    "local-timestamp-millis": pa.timestamp("ms"),
+    "local-timestamp-micros": pa.timestamp("us"),
+    "date": pa.date32(),
+    "time-millis": pa.time32("ms"),
+    "time-micros": pa.time64("us"),
+}
+
+_PRIMITIVE_ARROW_TYPES = {
+    "string": pa.string(),
+    "int": pa.int32(),
+    "long": pa.int64(),
+    "float": pa.float32(),
+    "double": pa.float64(),
+    "boolean": pa.bool_(),
+    "bytes": pa.binary(),
+    "enum": pa.string(),
+    "fixed": pa.binary(),
+}
+
+# dlt columns of the logical types, which carry the timestamp precision
+_LOGICAL_DLT_COLUMNS: Dict[str, TColumnSchema] = {
+    "timestamp-millis": {"data_type": "timestamp", "precision": 3},
+    "timestamp-micros": {"data_type": "timestamp", "precision": 6},
+    "local-timestamp-millis": {"data_type": "timestamp", "precision": 3, "timezone": False},
+    "local-timestamp-micros": {"data_type": "timestamp", "precision": 6, "timezone": False},
+    "date": {"data_type": "date"},
+    "time-millis": {"data_type": "time", "precision": 3},
+    "time-micros": {"data_type": "time", "precision": 6},
+    "uuid": {"data_type": "text"},
+}
+
+_PRIMITIVE_DLT_COLUMNS: Dict[str, TColumnSchema] = {
+    "string": {"data_type": "text"},
+    "int": {"data_type": "bigint", "precision": 32},
+    "long": {"data_type": "bigint"},
+    "float": {"data_type": "double"},
+    "double": {"data_type": "double"},
+    "boolean": {"data_type": "bool"},
+    "bytes": {"data_type": "binary"},
+    "enum": {"data_type": "text"},
+    "fixed": {"data_type": "binary"},
+    "map": {"data_type": "json"},
+}
+
+# the `_kafka` metadata added to every row, flattened by dlt
+_KAFKA_DLT_COLUMNS: TTableSchemaColumns = {
+    "_kafka__topic": {"name": "_kafka__topic", "data_type": "text", "nullable": False},
+    "_kafka__partition": {"name": "_kafka__partition", "data_type": "bigint", "nullable": False},
+    "_kafka__offset": {"name": "_kafka__offset", "data_type": "bigint", "nullable": False},
+    "_kafka__timestamp": {"name": "_kafka__timestamp", "data_type": "bigint", "nullable": True},
+}
+
+
+def parse_confluent_header(value: Optional[bytes]) -> Optional[int]:
+    """Read the schema id from a Confluent wire format value.
+
+    Args:
+        value (Optional[bytes]): A raw message value or key.
+
+    Returns:
+        Optional[int]: Schema id, None if the value is not Confluent-framed.
+    """
+    if not value or len(value) < HEADER_SIZE or value[0] != MAGIC_BYTE:
+        return None
+    return struct.unpack(">I", value[1:HEADER_SIZE])[0]
+
+
+class _ColumnPlan:
+    """How to build the Arrow column of a top-level record field."""
+
+    __slots__ = ("name", "raw_type", "arrow_type")
+
+    def __init__(self, name: str, raw_type: Optional["pa.DataType"], arrow_type: Optional["pa.DataType"]):
+        self.name = name
+        # type of the values as decoded, cast to `arrow_type` when they differ
+        self.raw_type = raw_type
+        self.arrow_type = arrow_type
+
+    def build(self, values: List[Any]) -> "pa.Array":
+        if self.raw_type is None:
+            return values_to_array(self.name, values)
+        array = pa.array(values, type=self.raw_type)
+        if self.arrow_type != self.raw_type:
+            array = array.cast(self.arrow_type)
+        return array
+
+
+def _plan_field(field: Dict[str, Any]) -> Tuple[Dict[str, Any], _ColumnPlan]:
+    """Plan a top-level field, stripping the logical types decoded column-wise."""
+    field_type = field["type"]
+    is_union = isinstance(field_type, list)
+    branches = field_type if is_union else [field_type]
+    non_null = [b for b in branches if b != "null"]
+
+    if len(non_null) != 1:
+        # multi-type unions are left to Arrow type inference
+        return field, _ColumnPlan(field["name"], None, None)
+
+    branch = non_null[0]
+    if isinstance(branch, dict):
+        logical_type = _LOGICAL_ARROW_TYPES.get(branch.get("logicalType"))
+        if logical_type is not None:
+            raw = {k: v for k, v in branch.items() if k != "logicalType"}
+            raw_type = pa.int32() if raw["type"] == "int" else pa.int64()
+            stripped = [raw if b is branch else b for b in branches]
+            new_field = {**field, "type": stripped if is_union else raw}
+            return new_field, _ColumnPlan(field["name"], raw_type, logical_type)
+        # complex types and the logical types left to fastavro are inferred
+        is_plain = isinstance(branch["type"], str) and "logicalType" not in branch
+        arrow_type = _PRIMITIVE_ARROW_TYPES.get(branch["type"]) if is_plain else None
+    else:
+        arrow_type = _PRIMITIVE_ARROW_TYPES.get(branch)
+
+    return field, _ColumnPlan(field["name"], arrow_type, arrow_type)
+
+
+def _projected_schema(schema: Dict[str, Any], fields: List[str]) -> Optional[Dict[str, Any]]:
+    """Parsed reader schema with only the given top-level fields, None if it can't stand alone."""
+    try:
+        return parse_schema({**schema, "fields": [f for f in schema["fields"] if f["name"] in fields]})
+    except Exception as e:
+        # e.g. a kept field uses a named type defined in a dropped one
+        logger.warning(f"Can't project schema {schema.get('name')} on {fields}, decoding all the fields: {e}")
+        return None
+
+
+class _SchemaReader:
+    """Parsed writer schema, reader schema and column plans of a single schema id."""
+
+    def __init__(self, schema: Dict[str, Any], pushdown: Optional[RowPushdown] = None):
+        fields = []
+        self.columns: List[_ColumnPlan] = []
+        for field in schema["fields"]:
+            new_field, plan = _plan_field(field)
+            fields.append(new_field)
+            if pushdown is None or pushdown.select is None or field["name"] in pushdown.select:
+                self.columns.append(plan)
+
+        self.parsed_schema = parse_schema({**schema, "fields": fields})
+        self.reader_schema = None
+        if pushdown is not None and pushdown.decode_fields:
+            self.reader_schema = _projected_schema({**schema, "fields": fields}, pushdown.decode_fields)
+
+
+class AvroArrowDecoder:
+    """Decodes batches of Confluent-framed Avro messages into Arrow tables.
+
+    The schema id is read from the message header and one parsed reader
+    is cached per schema id, so the Schema Registry is queried once per
+    schema. Top-level logical types (timestamps, dates, times) are decoded
+    as raw numbers and converted column-wise by Arrow.
+
+    With a pushdown, only the fields it needs are decoded, through a
+    projected reader schema, and filtered out messages are skipped.
+
+    Args:
+        schema_registry_client (SchemaRegistryClient): Client to fetch
+            writer schemas by id.
+        pushdown (Optional[RowPushdown]): Compiled `select` and `where`.
+    """
+
+    def __init__(self, schema_registry_client: SchemaRegistryClient, pushdown: Optional[RowPushdown] = None):
+        self._client = schema_registry_client
+        self._pushdown = pushdown
+        # None marks schema ids which can't be decoded column-wise
+        self._readers: Dict[int, Optional[_SchemaReader]] = {}
+        self._lock = threading.Lock()
+
+    def _reader(self, schema_id: int) -> Optional[_SchemaReader]:
+        if schema_id in self._readers:
+            return self._readers[schema_id]
+
+        with self._lock:
+            if schema_id in self._readers:
+                return self._readers[schema_id]
+            try:
+                schema = json.loads(self._client.get_schema(schema_id).schema_str)
+                if not isinstance(schema, dict) or schema.get("type") != "record":
+                    raise ValueError("only record schemas are decoded column-wise")
+                self._readers[schema_id] = _SchemaReader(schema, self._pushdown)
+            except Exception as e:
+                logger.warning(f"Schema id {schema_id} can't be decoded column-wise: {e}")
+                self._readers[schema_id] = None
+
+            return self._readers[schema_id]
+
+    def decode_batch(
+        self, messages: List[Message], deserialize_key: Callable[[Message], Any]
+    ) -> Tuple[List["pa.Table"], List[Message], List[Tuple[Message, str]]]:
+        """Decode messages into Arrow tables, one per topic and schema id.
+
+        Values of multi-type unions, and keys, are typed by Arrow inference.
+        The messages with a value of another type than the most common one
+        in the batch are left out, so that a column keeps its type.
+
+        Args:
+            messages (List[Message]): Messages with Avro-serialized values.
+            deserialize_key (Callable[[Message], Any]): Key deserializer.
+
+        Returns:
+            Tuple[List[pa.Table], List[Message], List[Tuple[Message, str]]]:
+                Decoded tables, messages which couldn't be decoded column-wise,
+                and messages left out of mixed type columns, with the reason.
+        """
+        groups: Dict[Tuple[str, int], List[Message]] = {}
+        rejected = []
+        for msg in messages:
+            schema_id = parse_confluent_header(msg.value())
+            if schema_id is None or self._reader(schema_id) is None:
+                rejected.append(msg)
+            else:
+                groups.setdefault((msg.topic(), schema_id), []).append(msg)
+
+        tables = []
+        mixed = []
+        for (topic, schema_id), group in groups.items():
+            table, failed, group_mixed = self._decode_group(topic, self._readers[schema_id], group, deserialize_key)
+            if table is not None:
+                tables.append(table)
+            rejected.extend(failed)
+            mixed.extend(group_mixed)
+
+        return tables, rejected, mixed
+
+    def _decode_group(
+        self,
+        topic: str,
+        reader: _SchemaReader,
+        messages: List[Message],
+        deserialize_key: Callable[[Message], Any],
+    ) -> Tuple[Optional["pa.Table"], List[Message], List[Tuple[Message, str]]]:
+        parsed_schema = reader.parsed_schema
+        reader_schema = reader.reader_schema
+        filter_value = self._pushdown.filter_value if self._pushdown else None
+        columns: List[List[Any]] = [[] for _ in reader.columns]
+        names = [plan.name for plan in reader.columns]
+        partitions, offsets, timestamps, keys = [], [], [], []
+
+        # decoded messages, aligned with the column values
+        decoded: List[Message] = []
+        failed: List[Message] = []
+        mixed: List[Tuple[Message, str]] = []
+        for msg in messages:
+            try:
+                record = schemaless_reader(BytesIO(msg.value()[HEADER_SIZE:]), parsed_schema, reader_schema)
+            except Exception:
+                failed.append(msg)
+                continue
+
+            if filter_value is not None:
+                record = filter_value(record)
+                if record is None:
+                    continue
+
+            for values, name in zip(columns, names):
+                values.append(record.get(name))
+
+            ts = msg.timestamp()[1]
+            partitions.append(msg.partition())
+            offsets.append(msg.offset())
+            timestamps.append(ts if ts >= 0 else None)
+            keys.append(deserialize_key(msg))
+            decoded.append(msg)
+
+        while decoded:
+            try:
+                arrays = {plan.name: plan.build(values) for plan, values in zip(reader.columns, columns)}
+                # record keys are flattened as in the rows converted to Arrow
+                keys_arrays = flat_columns("_kafka__key", keys)
+                break
+            except MixedTypesError as e:
+                # values of a minority type of a multi-type union, or keys
+                left_out = set(e.indices)
+                log_mixed_types(topic, e, len(decoded))
+                mixed.extend((msg, mixed_types_reason(e)) for i, msg in enumerate(decoded) if i in left_out)
+
+                def _keep(values: List[Any]) -> List[Any]:
+                    return [v for i, v in enumerate(values) if i not in left_out]
+
+                decoded, partitions, offsets, timestamps, keys = map(
+                    _keep, (decoded, partitions, offsets, timestamps, keys)
+                )
+                columns = [_keep(values) for values in columns]
+
+        if not decoded:
+            return None, failed, mixed
+
+        arrays["_kafka__topic"] = pa.array([topic] * len(offsets), type=pa.string())
+        arrays["_kafka__partition"] = pa.array(partitions, type=pa.int64())
+        arrays["_kafka__offset"] = pa.array(offsets, type=pa.int64())
+        arrays["_kafka__timestamp"] = pa.array(timestamps, type=pa.int64())
+        arrays.update(keys_arrays)
+
+        return pa.table(arrays), failed, mixed
+
+
+class AvroProjectedReader:
+    """Decodes Confluent-framed Avro values into dicts of the given top-level fields.
+
+    A reader schema with only the given fields is derived from every
+    writer schema id, once, and fastavro schema resolution skips the
+    other fields without building them.
+
+    Args:
+        schema_registry_client (SchemaRegistryClient): Client to fetch
+            writer schemas by id.
+        fields (List[str]): Top-level fields to decode.
+    """
+
+    def __init__(self, schema_registry_client: SchemaRegistryClient, fields: List[str]):
+        self._client = schema_registry_client
+        self._fields = fields
+        # writer and reader schemas by schema id
+        self._schemas: Dict[int, Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, value: bytes) -> Dict[str, Any]:
+        schema_id = parse_confluent_header(value)
+        if schema_id is None:
+            raise ValueError("Value is not Confluent-framed")
+
+        schemas = self._schemas.get(schema_id)
+        if schemas is None:
+            with self._lock:
+                schemas = self._schemas.get(schema_id)
+                if schemas is None:
+                    schema = json.loads(self._client.get_schema(schema_id).schema_str)
+                    if not isinstance(schema, dict) or schema.get("type") != "record":
+                        raise ValueError(f"Schema id {schema_id} is not a record schema")
+                    schemas = self._schemas[schema_id] = (
+                        parse_schema(schema),
+                        _projected_schema(schema, self._fields),
+                    )
+
+        return schemaless_reader(BytesIO(value[HEADER_SIZE:]), *schemas)
+
+
+class _TableHintsBuilder:
+    """Walks an Avro record schema, collecting dlt columns of the table and its nested tables."""
+
+    def __init__(self, flatten: bool = True) -> None:
+        # False for Arrow tables, which keep records and arrays as struct and list columns
+        self.flatten = flatten
+        self.named: Dict[str, Any] = {}
+        self.nested: Dict[Tuple[str, ...], TTableSchemaColumns] = {}
+
+    def _resolve(self, avro_type: Any) -> Any:
+        if isinstance(avro_type, str):
+            return self.named.get(avro_type, avro_type)
+        if isinstance(avro_type, dict) and avro_type.get("type") in ("record", "enum", "fixed"):
+            name = avro_type["name"]
+            self.named[name] = avro_type
+            if avro_type.get("namespace"):
+                self.named[f"{avro_type['namespace']}.{name}"] = avro_type
+        return avro_type
+
+    def record(
+        self,
+        path: Tuple[str, ...],
+        fields: List[Dict[str, Any]],
+        columns: TTableSchemaColumns,
+        prefix: str = "",
+        nullable: bool = False,
+    ) -> TTableSchemaColumns:
+        for field in fields:
+            self.field(path, prefix + field["name"], field["type"], columns, nullable)
+        return columns
+
+    def field(
+        self,
+        path: Tuple[str, ...],
+        name: str,
+        avro_type: Any,
+        columns: TTableSchemaColumns,
+        nullable: bool = False,
+    ) -> None:
+        avro_type = self._resolve(avro_type)
+        if isinstance(avro_type, list):
+            branches = [self._resolve(b) for b in avro_type]
+            non_null = [b for b in branches if b != "null"]
+            if len(non_null) != 1:
+                # multi-type unions become variant columns, left to inference
+                return
+            nullable = nullable or len(non_null) < len(branches)
+            avro_type = non_null[0]
+
+        if isinstance(avro_type, dict):
+            type_name = avro_type["type"]
+            if type_name in ("record", "array") and not self.flatten:
+                columns[name] = {"name": name, "data_type": "json", "nullable": nullable}
+                return
+            if type_name == "record":
+                # nested records are flattened into `parent__child` columns
+                self.record(path, avro_type["fields"], columns, f"{name}__", nullable)
+                return
+            if type_name == "array":
+                self.array(path + (name,), avro_type["items"])
+                return
+
+            logical_type = avro_type.get("logicalType")
+            if logical_type == "decimal":
+                column: TColumnSchema = {
+                    "data_type": "decimal",
+                    "precision": avro_type["precision"],
+                    "scale": avro_type.get("scale", 0),
+                }
+            elif logical_type in _LOGICAL_DLT_COLUMNS:
+                column = dict(_LOGICAL_DLT_COLUMNS[logical_type])  # type: ignore[assignment]
+            elif isinstance(type_name, str) and type_name in _PRIMITIVE_DLT_COLUMNS:
+                column = dict(_PRIMITIVE_DLT_COLUMNS[type_name])  # type: ignore[assignment]
+            else:
+                self.field(path, name, type_name, columns, nullable)
+                return
+        elif avro_type in _PRIMITIVE_DLT_COLUMNS:
+            column = dict(_PRIMITIVE_DLT_COLUMNS[avro_type])  # type: ignore[assignment]
+        else:
+            return
+
+        columns[name] = {"name": name, **column, "nullable": nullable}
+
+    def array(self, path: Tuple[str, ...], items: Any) -> None:
+        # arrays become nested tables, with the item fields or a `value` column
+        items = self._resolve(items)
+        columns: TTableSchemaColumns = {}
+        if isinstance(items, dict) and items.get("type") == "record":
+            self.record(path, items["fields"], columns)
+        else:
+            self.field(path, "value", items, columns)
+        if columns:
+            self.nested[path] = columns
+
+
+def avro_table_hints(schema: Dict[str, Any], flatten: bool = True) -> Dict[str, Any]:
+    """Translate an Avro record schema into dlt table hints.
+
+    Fields become columns with their types, decimal precision and
+    timestamp precision. Nullability (unions with null) is kept in the
+    nested tables, top-level columns are always nullable. Nested records
+    are flattened into `parent__child` columns and arrays are described
+    as nested tables, the same way dlt normalizes the decoded rows.
+    Multi-type unions are left to dlt type inference.
+
+    Args:
+        schema (Dict[str, Any]): Avro record schema.
+        flatten (bool): If False, records and arrays become `json` columns,
+            as the struct and list columns of Arrow tables are loaded.
+
+    Returns:
+        Dict[str, Any]: `columns` and `nested_hints`, as accepted by
+            `dlt.mark.make_hints`.
+    """
+    builder = _TableHintsBuilder(flatten)
+    builder._resolve(schema)
+    # undecodable messages land in the same table as error rows without
+    # the record fields, so its top-level columns must stay nullable
+    columns = builder.record((), schema["fields"], {}, nullable=True)
+    columns.update(_KAFKA_DLT_COLUMNS)
+
+    return {
+        "columns": columns,
+        "nested_hints": {path: {"columns": nested} for path, nested in builder.nested.items()},
+    }
+
+
+class AvroTableHints:
+    """dlt table hints of registry schemas, translated once per schema id.
+
+    Args:
+        schema_registry_client (SchemaRegistryClient): Client to fetch
+            writer schemas by id.
+        select (Optional[List[str]]): Top-level fields to translate, all if None.
+        flatten (bool): Flatten records and arrays as dlt normalizes rows,
+            False for Arrow tables (see `avro_table_hints`).
+    """
+
+    def __init__(
+        self,
+        schema_registry_client: SchemaRegistryClient,
+        select: Optional[List[str]] = None,
+        flatten: bool = True,
+    ):
+        self._client = schema_registry_client
+        self._select = select
+        self._flatten = flatten
+        # None marks schema ids which can't be translated
+        self._hints: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, schema_id: int) -> Optional[Dict[str, Any]]:
+        """Table hints of a schema id, None if it isn't a record schema."""
+        if schema_id in self._hints:
+            return self._hints[schema_id]
+
+        with self._lock:
+            if schema_id in self._hints:
+                return self._hints[schema_id]
+            try:
+                schema = json.loads(self._client.get_schema(schema_id).schema_str)
+                if not isinstance(schema, dict) or schema.get("type") != "record":
+                    raise ValueError("only record schemas are translated")
+                if self._select is not None:
+                    schema = {**schema, "fields": [f for f in schema["fields"] if f["name"] in self._select]}
+                self._hints[schema_id] = avro_table_hints(schema, self._flatten)
+                logger.info(
+                    f"Translated schema id {schema_id} into {len(self._hints[schema_id]['columns'])} columns"
+                )
+            except Exception as e:
+                logger.warning(f"Schema id {schema_id} can't be translated into table hints: {e}")
+                self._hints[schema_id] = None
+
+            return self._hints[schema_id]
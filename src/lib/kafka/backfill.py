@@ -0,0 +1,114 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from confluent_kafka import Consumer, TopicPartition
+from confluent_kafka.admin import AdminClient
+from dlt.common import logger
+from dlt.common.time import ensure_pendulum_datetime
+
+from .helpers import read_offsets_for_times, read_watermarks
+from .parallel import TPartitionRange
+
+# an offset, or a timestamp to resolve into the offsets of every partition
+TOffsetBound = Union[int, str, datetime]
+
+
+def _resolve_bound(
+    consumer: Consumer,
+    parts: List[TopicPartition],
+    bound: TOffsetBound,
+    watermarks: List[Tuple[int, int]],
+    admin_client: Optional[AdminClient],
+) -> List[int]:
+    # offsets are clamped to the watermarks, as the messages before the
+    # log start are deleted, timestamps after the last message resolve
+    # to the high watermarks
+    if isinstance(bound, int):
+        return [min(max(bound, low), high) for low, high in watermarks]
+
+    ts = ensure_pendulum_datetime(bound).int_timestamp * 1000
+    offsets = read_offsets_for_times(
+        consumer, [TopicPartition(p.topic, p.partition, ts) for p in parts], admin_client
+    )
+    return [high if offset == -1 else offset for offset, (_, high) in zip(offsets, watermarks)]
+
+
+def resolve_backfill_ranges(
+    consumer: Consumer,
+    partitions: Dict[str, List[int]],
+    start: TOffsetBound,
+    end: Optional[TOffsetBound] = None,
+    admin_client: Optional[AdminClient] = None,
+) -> List[TPartitionRange]:
+    """Resolve a backfill range into start and end offsets of every partition.
+
+    Timestamps are resolved with the same bulk requests `OffsetTracker`
+    uses for `start_from`, all the partitions at once. Offsets are clamped
+    to the low and high watermarks, so a start before the log start of a
+    partition, e.g. after retention deleted its first messages, reads
+    from the log start.
+
+    Args:
+        consumer (confluent_kafka.Consumer): Kafka consumer.
+        partitions (Dict[str, List[int]]): Partitions by topic name.
+        start (TOffsetBound): First offset, or timestamp, to read.
+        end (Optional[TOffsetBound]): Offset, or timestamp, to stop
+            before. The high watermarks if None.
+        admin_client (Optional[AdminClient]): Admin client for batched requests.
+
+    Returns:
+        List[TPartitionRange]: Non-empty ranges, with exclusive ends.
+    """
+    parts = [
+        TopicPartition(t_name, part) for t_name, t_parts in partitions.items() for part in t_parts
+    ]
+    watermarks = read_watermarks(consumer, parts, admin_client)
+
+    starts = _resolve_bound(consumer, parts, start, watermarks, admin_client)
+    ends = (
+        [high for _, high in watermarks]
+        if end is None
+        else _resolve_bound(consumer, parts, end, watermarks, admin_client)
+    )
+
+    return [
+        (part.topic, part.partition, first, last)
+        for part, first, last in zip(parts, starts, ends)
+        if first < last
+    ]
+
+
+def chunk_ranges(ranges: List[TPartitionRange], chunk_size: int) -> List[TPartitionRange]:
+    """Split partition ranges into chunks of at most `chunk_size` offsets.
+
+    Chunks are interleaved across the partitions, so that workers taking
+    them in order spread over the partitions instead of draining one
+    partition at a time.
+
+    Args:
+        ranges (List[TPartitionRange]): Partition ranges, with exclusive ends.
+        chunk_size (int): Maximum offsets in a chunk.
+
+    Returns:
+        List[TPartitionRange]: Chunks of the ranges.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    per_range = [
+        [
+            (t_name, part, first, min(first + chunk_size, end))
+            for first in range(start, end, chunk_size)
+        ]
+        for t_name, part, start, end in ranges
+    ]
+
+    chunks = []
+    for i in range(max(map(len, per_range), default=0)):
+        chunks += [range_chunks[i] for range_chunks in per_range if i < len(range_chunks)]
+
+    logger.info(
+        f"Split {sum(end - start for _, _, start, end in ranges)} offsets "
+        f"of {len(ranges)} partitions into {len(chunks)} chunks"
+    )
+    return chunks
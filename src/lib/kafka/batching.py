@@ -0,0 +1,167 @@
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple, Union, runtime_checkable
+
+from confluent_kafka import KafkaError, Message
+from dlt.common import logger
+from dlt.common.typing import TDataItems
+
+OUTPUT_FORMATS = ("rows", "arrow")
+
+
+@runtime_checkable
+class BatchMessageProcessor(Protocol):
+    """Message processor, which is able to process a whole batch at once.
+
+    Processors implementing `process_batch` are called once per
+    `Consumer.consume()` batch instead of once per message, which
+    avoids per-message call overhead and allows vectorized decoding.
+    The returned value is either a list of items or a table (e.g.
+    `pyarrow.Table`) accepted by dlt.
+    """
+
+    def __call__(self, msg: Message) -> Dict[str, Any]:
+        ...
+
+    def process_batch(self, messages: List[Message]) -> TDataItems:
+        ...
+
+
+def process_messages(
+    messages: List[Message],
+    msg_processor: Union[Callable[[Message], Dict[str, Any]], BatchMessageProcessor],
+    on_eof: Optional[Callable[[str, int], None]] = None,
+) -> Tuple[TDataItems, List[Message]]:
+    """Process a batch of consumed Kafka messages.
+
+    Partition EOF events are passed to `on_eof`, other error events are
+    logged (retriable and non-fatal ones) or raised (fatal ones), the
+    rest of the messages are passed through the message processor: in
+    one `process_batch` call, if the processor implements it, or
+    message by message otherwise.
+
+    Args:
+        messages (List[confluent_kafka.Message]): Messages returned by
+            a single `Consumer.consume()` call.
+        msg_processor (Union[Callable, BatchMessageProcessor]): A
+            function-converter for every message or a batch processor.
+        on_eof (Optional[Callable[[str, int], None]]): Called with the topic
+            and partition of every partition EOF event.
+
+    Returns:
+        Tuple[TDataItems, List[confluent_kafka.Message]]: Processed
+            items and the messages they were produced from, so that the
+            caller can renew its offsets.
+    """
+    consumed = []
+    for msg in messages:
+        if msg.error():
+            err = msg.error()
+            if err.code() == KafkaError._PARTITION_EOF:
+                if on_eof is not None:
+                    on_eof(msg.topic(), msg.partition())
+            elif err.retriable() or not err.fatal():
+                logger.warning(f"ERROR: {err} - RETRYING")
+            else:
+                raise err
+        else:
+            consumed.append(msg)
+
+    if isinstance(msg_processor, BatchMessageProcessor):
+        return msg_processor.process_batch(consumed), consumed
+
+    return [msg_processor(msg) for msg in consumed], consumed
+
+
+
+def group_by_topic(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group processed messages of a batch by their topics.
+
+    Args:
+        rows (List[Dict[str, Any]]): Processed messages with the `_kafka` metadata.
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Messages by topic name.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        topic = row["_kafka"]["topic"]
+        group = groups.get(topic)
+        if group is None:
+            groups[topic] = [row]
+        else:
+            group.append(row)
+
+    return groups
+
+
+class TopicTableRouter:
+    """Maps topic names to destination table names.
+
+    Table names come from `table_mapping`, or are derived from the topic
+    name by `default`. Either way every topic is resolved once and cached,
+    so routing a batch costs a dict lookup per topic, not per row.
+
+    Args:
+        table_mapping (Optional[Dict[str, str]]): Table names by topic name.
+        default (Callable[[str], str]): Derives the table name of an
+            unmapped topic.
+    """
+
+    def __init__(
+        self,
+        table_mapping: Optional[Dict[str, str]] = None,
+        default: Callable[[str], str] = str,
+    ):
+        self._tables: Dict[str, str] = dict(table_mapping or {})
+        self._default = default
+
+    def __call__(self, topic: str) -> str:
+        table = self._tables.get(topic)
+        if table is None:
+            table = self._tables[topic] = self._default(topic)
+        return table
+
+
+class ByteBudget:
+    """Bounds batches by the size of their messages, besides their count.
+
+    Keeps a moving average of the message size, to ask `consume()` for
+    no more messages than fit into `max_bytes`, and splits the consumed
+    batches which still don't fit into byte-bounded chunks.
+
+    Args:
+        max_bytes (Optional[int]): Maximum size of a batch's message
+            keys and values, no limit if None.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self._avg_size: Optional[float] = None
+
+    def limit(self, count: int) -> int:
+        """Bound a number of messages to consume by the expected batch size."""
+        if self.max_bytes is None or not self._avg_size:
+            return count
+        return max(1, min(count, int(self.max_bytes // self._avg_size)))
+
+    def split(self, messages: List[Message]) -> List[List[Message]]:
+        """Split consumed messages into chunks of at most `max_bytes`.
+
+        A message bigger than `max_bytes` makes a chunk on its own.
+        """
+        if self.max_bytes is None or not messages:
+            return [messages]
+
+        chunks: List[List[Message]] = [[]]
+        chunk_bytes = total_bytes = 0
+        for msg in messages:
+            size = len(msg.value() or b"") + len(msg.key() or b"")
+            total_bytes += size
+            if chunks[-1] and chunk_bytes + size > self.max_bytes:
+                chunks.append([])
+                chunk_bytes = 0
+            chunks[-1].append(msg)
+            chunk_bytes += size
+
+        avg_size = total_bytes / len(messages)
+        self._avg_size = avg_size if self._avg_size is None else (self._avg_size + avg_size) / 2
+        return chunks
@@ -1,24 +1,33 @@
 import re
-from typing import List, Union
+from typing import List, Optional
 from confluent_kafka import Consumer
 
+from .metadata import ClusterMetadataCache
 
-def resolve_topics_regex(consumer: Consumer, pattern: str) -> List[str]:
+
+def resolve_topics_regex(
+    consumer: Consumer, pattern: str, metadata: Optional[ClusterMetadataCache] = None
+) -> List[str]:
     """
     Resolve topic names from Kafka using a regex pattern.
 
     Args:
         consumer: An existing Kafka consumer
         pattern: Regex pattern to match topic names
+        metadata: Cluster metadata cache to match against, listed topics
+            and matches are reused by the later metadata reads
 
     Returns:
         List of matched topic names
     """
     try:
+        if metadata is not None:
+            return metadata.match(pattern)
+
         metadata = consumer.list_topics(timeout=10.0)
         all_topics = list(metadata.topics.keys())
         matched = [t for t in all_topics if re.match(pattern, t)]
         return matched
     except Exception as e:
         print(f"Failed to list topics: {e}")
-        return []
\ No newline at end of file
+        return []
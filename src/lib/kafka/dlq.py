@@ -0,0 +1,214 @@
+import base64
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from confluent_kafka import Message, Producer
+from dlt.common import logger
+
+DLQ_SINKS = ("table", "file", "kafka")
+
+
+class DeadLetterThresholdExceeded(RuntimeError):
+    """Raised when the share of undecodable messages of a topic passes the limit."""
+
+
+class RateLimitedLog:
+    """Logs a warning per key at most once per `interval` seconds.
+
+    The first message of a key is logged right away, the following ones
+    are counted and summarized with the latest message once the interval
+    has passed, so a storm of failures costs a counter increment each.
+
+    Args:
+        interval (float): Minimum seconds between two warnings of a key.
+    """
+
+    def __init__(self, interval: float = 10.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # last logged time and suppressed count by key
+        self._keys: Dict[str, Tuple[float, int]] = {}
+
+    def warning(self, key: str, message: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            logged_at, suppressed = self._keys.get(key, (None, 0))
+            if logged_at is not None and now - logged_at < self.interval:
+                self._keys[key] = (logged_at, suppressed + 1)
+                return
+            self._keys[key] = (now, 0)
+
+        if suppressed:
+            message = f"{message} ({suppressed} similar suppressed in the last {now - logged_at:.0f}s)"
+        logger.warning(message)
+
+
+class DeadLetterQueue:
+    """Buffers messages processors failed to decode and flushes them to a sink.
+
+    Failed messages are kept raw, with the error, and written in batches
+    by `flush`, which the resources call after every processed batch:
+
+    - "table": rows with the raw key and value go to the `table_name` dlt
+      table, through `drain_rows`, and are loaded with the rest of the data
+    - "file": JSON lines appended to `path`, keys and values base64 encoded
+    - "kafka": messages produced to `topic` as they were read, with the
+      error and origin in `dlq.*` headers; the flush waits for delivery
+
+    Messages and errors are counted per topic. Once a topic has at least
+    `min_messages`, an error ratio over `max_error_ratio` raises
+    `DeadLetterThresholdExceeded`, which aborts the run before its offsets
+    move. Failures are logged at most once per `log_interval` per topic.
+
+    Args:
+        sink (str): One of `DLQ_SINKS`.
+        table_name (str): Table of the "table" sink.
+        path (Optional[str]): File of the "file" sink.
+        topic (Optional[str]): Topic of the "kafka" sink.
+        producer_config (Optional[Dict[str, Any]]): Producer configuration
+            of the "kafka" sink.
+        max_error_ratio (Optional[float]): Error ratio of a topic to abort
+            the run over, no limit if None.
+        min_messages (int): Messages of a topic to see before its ratio is checked.
+        log_interval (float): Minimum seconds between failure logs of a topic.
+    """
+
+    def __init__(
+        self,
+        sink: str = "table",
+        table_name: str = "kafka_dlq",
+        path: Optional[str] = None,
+        topic: Optional[str] = None,
+        producer_config: Optional[Dict[str, Any]] = None,
+        max_error_ratio: Optional[float] = None,
+        min_messages: int = 100,
+        log_interval: float = 10.0,
+    ):
+        if sink not in DLQ_SINKS:
+            raise ValueError(f"Unknown DLQ sink: {sink}. Expected one of {DLQ_SINKS}")
+        if sink == "file" and not path:
+            raise ValueError("path is required for the file DLQ sink")
+        if sink == "kafka" and (not topic or not producer_config):
+            raise ValueError("topic and producer_config are required for the kafka DLQ sink")
+
+        self.sink = sink
+        self.table_name = table_name
+        self.path = path
+        self.topic = topic
+        self.max_error_ratio = max_error_ratio
+        self.min_messages = min_messages
+
+        self._producer = Producer(producer_config) if sink == "kafka" else None
+        self._log = RateLimitedLog(log_interval)
+        self._lock = threading.Lock()
+        self._buffer: List[Tuple[Message, str]] = []
+        self._rows: List[Dict[str, Any]] = []
+        # messages seen and errors by topic
+        self._messages: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Messages seen and dead-lettered by topic."""
+        return {
+            topic: {"messages": count, "errors": self._errors.get(topic, 0)}
+            for topic, count in self._messages.items()
+        }
+
+    def count(self, messages: List[Message]) -> None:
+        """Count the messages of a batch handed to the processor."""
+        with self._lock:
+            for msg in messages:
+                topic = msg.topic()
+                self._messages[topic] = self._messages.get(topic, 0) + 1
+
+    def add(self, msg: Message, error: Any) -> None:
+        """Buffer a failed message, checking the error ratio of its topic.
+
+        Raises:
+            DeadLetterThresholdExceeded: The topic error ratio is over the limit.
+        """
+        topic = msg.topic()
+        with self._lock:
+            self._buffer.append((msg, str(error)))
+            errors = self._errors[topic] = self._errors.get(topic, 0) + 1
+            messages = max(self._messages.get(topic, 0), errors)
+
+        self._log.warning(
+            topic,
+            f"Dead-lettered {topic}[{msg.partition()}]@{msg.offset()}: {error} "
+            f"({errors} of {messages} messages)",
+        )
+
+        if (
+            self.max_error_ratio is not None
+            and messages >= self.min_messages
+            and errors / messages > self.max_error_ratio
+        ):
+            raise DeadLetterThresholdExceeded(
+                f"{errors} of {messages} messages of topic {topic} failed to decode, "
+                f"over the {self.max_error_ratio:.1%} limit"
+            )
+
+    def flush(self) -> None:
+        """Write the buffered messages to the sink."""
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+        if not buffer:
+            return
+
+        if self.sink == "table":
+            rows = [self._to_row(msg, error) for msg, error in buffer]
+            with self._lock:
+                self._rows.extend(rows)
+        elif self.sink == "file":
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(self._to_record(msg, error)) + "\n" for msg, error in buffer))
+        else:
+            for msg, error in buffer:
+                self._producer.produce(
+                    self.topic,
+                    value=msg.value(),
+                    key=msg.key(),
+                    headers=(msg.headers() or [])
+                    + [
+                        ("dlq.error", error.encode()),
+                        ("dlq.topic", msg.topic().encode()),
+                        ("dlq.partition", str(msg.partition()).encode()),
+                        ("dlq.offset", str(msg.offset()).encode()),
+                    ],
+                )
+            remaining = self._producer.flush(30)
+            if remaining:
+                raise RuntimeError(f"{remaining} dead letters weren't delivered to {self.topic}")
+
+        logger.info(f"Flushed {len(buffer)} dead letters to the {self.sink} sink")
+
+    def drain_rows(self) -> List[Dict[str, Any]]:
+        """Take the rows flushed to the "table" sink since the last call."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        return rows
+
+    @staticmethod
+    def _to_row(msg: Message, error: str) -> Dict[str, Any]:
+        ts = msg.timestamp()[1]
+        return {
+            "topic": msg.topic(),
+            "partition": msg.partition(),
+            "offset": msg.offset(),
+            "timestamp": ts if ts >= 0 else None,
+            "error": error,
+            "raw_key": msg.key(),
+            "raw_value": msg.value(),
+        }
+
+    @classmethod
+    def _to_record(cls, msg: Message, error: str) -> Dict[str, Any]:
+        record = cls._to_row(msg, error)
+        for field in ("raw_key", "raw_value"):
+            if record[field] is not None:
+                record[field] = base64.b64encode(record[field]).decode()
+        return record
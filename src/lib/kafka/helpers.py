@@ -1,16 +1,72 @@
-from typing import Any, Dict, List
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from confluent_kafka import Consumer, Message, TopicPartition  # type: ignore
-from confluent_kafka.admin import AdminClient, TopicMetadata  # type: ignore
+from confluent_kafka.admin import AdminClient, OffsetSpec  # type: ignore
 
 from dlt import config, secrets
-from dlt.common import pendulum
+from dlt.common import logger, pendulum
 from dlt.common.configuration import configspec
 from dlt.common.configuration.specs import CredentialsConfiguration
 from dlt.common.time import ensure_pendulum_datetime
 from dlt.common.typing import DictStrAny, TSecretValue, TAnyDateTime
 from dlt.common.utils import digest128
 
+from .metadata import ClusterMetadataCache
+
+# max concurrent watermark requests on a tracker initialization
+WATERMARK_WORKERS = 16
+
+# librdkafka consumer settings of the named tuning profiles
+CONSUMER_PROFILES: Dict[str, Dict[str, Any]] = {
+    # big fetches, waiting for them to fill up: backfills, high-volume topics
+    "throughput": {
+        "fetch.min.bytes": 1048576,
+        "fetch.wait.max.ms": 500,
+        "fetch.max.bytes": 52428800,
+        "max.partition.fetch.bytes": 10485760,
+        "queued.min.messages": 500000,
+        "queued.max.messages.kbytes": 1048576,
+    },
+    # fetches returned as soon as there's any data
+    "low_latency": {
+        "fetch.min.bytes": 1,
+        "fetch.wait.max.ms": 10,
+        "fetch.error.backoff.ms": 50,
+    },
+    # small fetches and a small prefetch queue
+    "memory_constrained": {
+        "fetch.max.bytes": 5242880,
+        "max.partition.fetch.bytes": 1048576,
+        "queued.min.messages": 1000,
+        "queued.max.messages.kbytes": 16384,
+    },
+}
+
+
+def consumer_tuning(
+    profile: Optional[str] = None, overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Get librdkafka consumer settings of a tuning profile.
+
+    Args:
+        profile (Optional[str]): One of `CONSUMER_PROFILES`, no profile if None.
+        overrides (Optional[Dict[str, Any]]): Raw librdkafka settings,
+            applied over the profile ones.
+
+    Returns:
+        Dict[str, Any]: Settings to update a consumer config with.
+    """
+    if profile is not None and profile not in CONSUMER_PROFILES:
+        raise ValueError(
+            f"Unknown consumer profile: {profile}. Expected one of {tuple(CONSUMER_PROFILES)}"
+        )
+
+    settings = dict(CONSUMER_PROFILES[profile]) if profile else {}
+    settings.update(overrides or {})
+    return settings
 
 def default_msg_processor(msg: Message) -> Dict[str, Any]:
     """Basic Kafka message processor.
@@ -51,11 +107,158 @@ def default_msg_processor(msg: Message) -> Dict[str, Any]:
     }
 
 
+class PartitionOffset:
+    """Current and maximum offsets of a single tracked partition.
+
+    Args:
+        topic (str): Topic name.
+        partition (int): Partition number.
+        cur (int): The last read offset.
+        max (int): Maximum offset (partition length).
+    """
+
+    __slots__ = ("topic", "partition", "key", "cur", "max")
+
+    def __init__(self, topic: str, partition: int, cur: int, max: int) -> None:
+        self.topic = topic
+        self.partition = partition
+        # partition key in the pipeline state
+        self.key = str(partition)
+        self.cur = cur
+        self.max = max
+
+    @property
+    def unread(self) -> int:
+        """Number of messages left to read up to the maximum offset."""
+        return max(self.max - self.cur - 1, 0)
+
+
+def read_high_watermarks(
+    consumer: Consumer, parts: List[TopicPartition], admin_client: AdminClient = None
+) -> List[int]:
+    """Read high watermarks of the given partitions in bulk.
+
+    Uses a single `list_offsets` request per broker, when an admin
+    client is given. Otherwise queries the partitions concurrently,
+    with a bounded number of in-flight requests.
+
+    Args:
+        consumer (confluent_kafka.Consumer): Kafka consumer.
+        parts (List[TopicPartition]): Partitions to read watermarks of.
+        admin_client (Optional[AdminClient]): Admin client for batched requests.
+
+    Returns:
+        List[int]: High watermarks, in the order of the partitions.
+    """
+    if not parts:
+        return []
+
+    if admin_client is not None:
+        futures = admin_client.list_offsets(
+            {TopicPartition(p.topic, p.partition): OffsetSpec.latest() for p in parts}
+        )
+        return [futures[p].result().offset for p in parts]
+
+    with ThreadPoolExecutor(max_workers=min(WATERMARK_WORKERS, len(parts))) as pool:
+        return [high for _, high in pool.map(consumer.get_watermark_offsets, parts)]
+
+
+def read_watermarks(
+    consumer: Consumer, parts: List[TopicPartition], admin_client: AdminClient = None
+) -> List[Tuple[int, int]]:
+    """Read low and high watermarks of the given partitions in bulk.
+
+    Like `read_high_watermarks`, with one more `list_offsets` request
+    per broker, for the earliest offsets, when an admin client is given.
+
+    Args:
+        consumer (confluent_kafka.Consumer): Kafka consumer.
+        parts (List[TopicPartition]): Partitions to read watermarks of.
+        admin_client (Optional[AdminClient]): Admin client for batched requests.
+
+    Returns:
+        List[Tuple[int, int]]: Low and high watermarks, in the order of the partitions.
+    """
+    if not parts:
+        return []
+
+    if admin_client is not None:
+        earliest = admin_client.list_offsets(
+            {TopicPartition(p.topic, p.partition): OffsetSpec.earliest() for p in parts}
+        )
+        latest = admin_client.list_offsets(
+            {TopicPartition(p.topic, p.partition): OffsetSpec.latest() for p in parts}
+        )
+        return [(earliest[p].result().offset, latest[p].result().offset) for p in parts]
+
+    with ThreadPoolExecutor(max_workers=min(WATERMARK_WORKERS, len(parts))) as pool:
+        return list(pool.map(consumer.get_watermark_offsets, parts))
+
+
+def read_offsets_for_times(
+    consumer: Consumer, parts: List[TopicPartition], admin_client: AdminClient = None
+) -> List[int]:
+    """Read offsets of the given partitions for their timestamps in bulk.
+
+    Uses a single `list_offsets` request per broker, when an admin
+    client is given, and one `offsets_for_times` call otherwise.
+
+    Args:
+        consumer (confluent_kafka.Consumer): Kafka consumer.
+        parts (List[TopicPartition]): Partitions with timestamps, in
+            milliseconds, as offsets.
+        admin_client (Optional[AdminClient]): Admin client for batched requests.
+
+    Returns:
+        List[int]: Offsets of the earliest messages at or after the
+            timestamps, -1 for partitions without such messages.
+    """
+    if not parts:
+        return []
+
+    if admin_client is not None:
+        futures = admin_client.list_offsets(
+            {
+                TopicPartition(p.topic, p.partition): OffsetSpec.for_timestamp(p.offset)
+                for p in parts
+            }
+        )
+        return [futures[p].result().offset for p in parts]
+
+    return [p.offset for p in consumer.offsets_for_times(parts)]
+
+
+def partition_shard(topic: str, partition: int, shard_count: int) -> int:
+    """Index of the shard owning a partition.
+
+    Partitions of a topic are dealt out round-robin, starting from a
+    shard picked by a hash of the topic name, so every shard owns a
+    partition of a topic with at least `shard_count` partitions, and
+    small topics land on different shards. Ownership is the same on
+    every node without coordination, and doesn't move when partitions
+    are added to a topic.
+
+    Args:
+        topic (str): Topic name.
+        partition (int): Partition number.
+        shard_count (int): Number of shards.
+
+    Returns:
+        int: Shard index, from 0 to `shard_count` - 1.
+    """
+    return (partition + zlib.crc32(topic.encode())) % shard_count
+
+
 class OffsetTracker(dict):  # type: ignore
     """Object to control offsets of the given topics.
 
     Tracks all the partitions of the given topics with two params:
-    current offset and maximum offset (partition length).
+    current offset and maximum offset (partition length). Partitions
+    of a topic are kept in a list, indexed by the partition number.
+
+    Counters of unfinished partitions and unread messages are updated
+    as offsets move, so `has_unread` and `remaining` don't scan the
+    partitions.
 
     Args:
         consumer (confluent_kafka.Consumer): Kafka consumer.
@@ -63,6 +266,12 @@ class OffsetTracker(dict):  # type: ignore
         pl_state (DictStrAny): Pipeline current state.
         start_from (Optional[pendulum.DateTime]): A timestamp, after which messages
             are read. Older messages are ignored.
+        admin_client (Optional[AdminClient]): Admin client to resolve the
+            partition offsets with batched `list_offsets` requests.
+        metadata (Optional[ClusterMetadataCache]): Cluster metadata cache
+            to read the topics partitions from.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            to track only the partitions owned by the shard.
     """
 
     def __init__(
@@ -71,10 +280,16 @@ class OffsetTracker(dict):  # type: ignore
         topic_names: List[str],
         pl_state: DictStrAny,
         start_from: pendulum.DateTime = None,
+        admin_client: AdminClient = None,
+        metadata: ClusterMetadataCache = None,
+        shard: Tuple[int, int] = None,
     ):
         super().__init__()
 
         self._consumer = consumer
+        self._admin_client = admin_client
+        self._metadata = metadata
+        self._shard = shard
         self._topics = self._read_topics(topic_names)
 
         # read/init current offsets
@@ -84,80 +299,127 @@ class OffsetTracker(dict):  # type: ignore
 
         self._init_partition_offsets(start_from)
 
-    def _read_topics(self, topic_names: List[str]) -> Dict[str, TopicMetadata]:
-        """Read the given topics metadata from Kafka.
+    def _read_topics(self, topic_names: List[str]) -> Dict[str, List[int]]:
+        """Read the given topics partitions from Kafka.
 
-        Reads all the topics at once, instead of requesting
-        each in a separate call. Returns only those needed.
+        Reads through the cluster metadata cache, if given: the topics
+        already listed aren't requested again. Otherwise, reads all the
+        topics at once, instead of requesting each in a separate call.
+        Returns only those needed, and only the partitions owned by the
+        tracker shard, if it's set.
 
         Args:
             topic_names (list): Names of topics to be read.
 
         Returns:
-            dict: Metadata of the given topics.
+            dict: Partition ids of the given topics.
         """
-        tracked_topics = {}
-        topics = self._consumer.list_topics().topics
-
-        for t_name in topic_names:
-            tracked_topics[t_name] = topics[t_name]
+        if self._metadata is not None:
+            tracked_topics = self._metadata.partitions(topic_names)
+        else:
+            tracked_topics = {}
+            topics = self._consumer.list_topics().topics
+
+            for t_name in topic_names:
+                tracked_topics[t_name] = list(topics[t_name].partitions)
+
+        if self._shard is not None:
+            # keep only the partitions owned by this shard
+            index, count = self._shard
+            tracked_topics = {
+                t_name: [p for p in parts if partition_shard(t_name, p, count) == index]
+                for t_name, parts in tracked_topics.items()
+            }
 
         return tracked_topics
 
+    def _read_watermarks(self, parts: List[TopicPartition]) -> List[int]:
+        return read_high_watermarks(self._consumer, parts, self._admin_client)
+
+    def _read_offsets_for_times(self, parts: List[TopicPartition]) -> List[int]:
+        return read_offsets_for_times(self._consumer, parts, self._admin_client)
+
     def _init_partition_offsets(self, start_from: pendulum.DateTime) -> None:
         """Designate current and maximum offsets for every partition.
 
-        Current offsets are read from the state, if present. Set equal
-        to the partition beginning otherwise.
+        Current offsets are the last read ones: read from the state,
+        if present. Set right before the partition beginning otherwise.
+
+        Offsets of all the partitions of all the topics are resolved
+        in bulk, not one partition or topic at a time.
 
         Args:
             start_from (pendulum.DateTime): A timestamp, at which to start
                 reading. Older messages are ignored.
         """
-        all_parts = []
-        for t_name, topic in self._topics.items():
-            self[t_name] = {}
+        # partitions which reached their maximum offsets, but aren't paused yet
+        self._finished: List[TopicPartition] = []
+        self._unfinished = 0
+        self._remaining = 0
 
-            # init all the topic partitions from the partitions' metadata
-            parts = [
+        # init all the topics partitions from the partitions' metadata
+        all_parts = []
+        for t_name, partitions in self._topics.items():
+            self[t_name] = [None] * (max(partitions, default=-1) + 1)
+            all_parts += [
                 TopicPartition(
                     t_name,
                     part,
                     start_from.int_timestamp * 1000 if start_from is not None else 0,
                 )
-                for part in topic.partitions
+                for part in partitions
             ]
 
-            # get offsets for the timestamp, if given
-            if start_from is not None:
-                ts_offsets = self._consumer.offsets_for_times(parts)
+        started = time.monotonic()
+        max_offsets = self._read_watermarks(all_parts)
+        # get offsets for the timestamp, if given
+        if start_from is not None:
+            ts_offsets = self._read_offsets_for_times(all_parts)
+        logger.info(
+            f"Resolved offsets of {len(all_parts)} partitions in {time.monotonic() - started:.2f}s"
+        )
 
-            # designate current and maximum offsets for every partition
-            for i, part in enumerate(parts):
-                max_offset = self._consumer.get_watermark_offsets(part)[1]
+        # designate current and maximum offsets for every partition
+        for i, part in enumerate(all_parts):
+            max_offset = max_offsets[i]
 
-                if start_from is not None:
-                    if ts_offsets[i].offset != -1:
-                        cur_offset = ts_offsets[i].offset
-                    else:
-                        cur_offset = max_offset - 1
+            # the offset of the next message to read
+            if start_from is not None:
+                if ts_offsets[i] != -1:
+                    next_offset = ts_offsets[i]
                 else:
-                    cur_offset = (
-                        self._cur_offsets[t_name].get(str(part.partition), -1) + 1
-                    )
-
-                self[t_name][str(part.partition)] = {
-                    "cur": cur_offset,
-                    "max": max_offset,
-                }
+                    next_offset = max_offset
+            else:
+                next_offset = (
+                    self._cur_offsets[part.topic].get(str(part.partition), -1) + 1
+                )
 
-                parts[i].offset = cur_offset
+            offset = PartitionOffset(part.topic, part.partition, next_offset - 1, max_offset)
+            self[part.topic][part.partition] = offset
+            if offset.unread:
+                self._unfinished += 1
+                self._remaining += offset.unread
 
-            all_parts += parts
+            all_parts[i].offset = next_offset
 
         # assign the current offsets to the consumer
         self._consumer.assign(all_parts)
 
+    def partitions(self) -> Iterator[PartitionOffset]:
+        """Iterate over offsets of all the tracked partitions.
+
+        Yields:
+            PartitionOffset: Offsets of a partition.
+        """
+        for parts in self.values():
+            for offset in parts:
+                if offset is not None:
+                    yield offset
+
+    def unread_partitions(self) -> List[TopicPartition]:
+        """Partitions with messages left to read."""
+        return [TopicPartition(o.topic, o.partition) for o in self.partitions() if o.unread]
+
     @property
     def has_unread(self) -> bool:
         """Check if there are unread messages in the tracked topics.
@@ -166,12 +428,33 @@ class OffsetTracker(dict):  # type: ignore
             bool: True, if there are messages to read, False if all
                 the current offsets are equal to their maximums.
         """
-        for parts in self.values():
-            for part in parts.values():
-                if part["cur"] + 1 < part["max"]:
-                    return True
+        return self._unfinished > 0
+
+    @property
+    def remaining(self) -> int:
+        """Count messages left to read up to the maximum offsets.
+
+        The count is an upper bound: compacted topics and transaction
+        markers leave gaps between offsets.
+
+        Returns:
+            int: Number of messages left to read.
+        """
+        return self._remaining
+
+    def _advance(self, offset: PartitionOffset, cur: int) -> None:
+        # offsets only move forward
+        if cur <= offset.cur:
+            return
+
+        unread = offset.unread
+        offset.cur = cur
+        self._remaining -= unread - offset.unread
+        if unread and not offset.unread:
+            self._unfinished -= 1
+            self._finished.append(TopicPartition(offset.topic, offset.partition))
 
-        return False
+        self._cur_offsets[offset.topic][offset.key] = cur
 
     def renew(self, msg: Message) -> None:
         """Update partition offset from the given message.
@@ -179,13 +462,44 @@ class OffsetTracker(dict):  # type: ignore
         Args:
             msg (confluent_kafka.Message): A read Kafka message.
         """
-        topic = msg.topic()
-        partition = str(msg.partition())
+        self._advance(self[msg.topic()][msg.partition()], msg.offset())
+
+    def renew_batch(self, messages: List[Message]) -> None:
+        """Update partition offsets from a batch of read messages.
+
+        Every partition is updated once, with the last offset read from
+        it: messages of a partition come in offset order.
+
+        Args:
+            messages (List[confluent_kafka.Message]): Read Kafka messages.
+        """
+        last_offsets = {(msg.topic(), msg.partition()): msg.offset() for msg in messages}
+        for (topic, partition), cur in last_offsets.items():
+            self._advance(self[topic][partition], cur)
+
+    def mark_eof(self, topic: str, partition: int) -> None:
+        """Mark a partition as read up to its end.
+
+        Called on a partition EOF event, which means there is nothing
+        left to read, even if the current offset hasn't reached the
+        maximum because of gaps in offsets.
 
+        Args:
+            topic (str): Topic name.
+            partition (int): Partition number.
+        """
         offset = self[topic][partition]
-        offset["cur"] = msg.offset()
+        self._advance(offset, offset.max - 1)
 
-        self._cur_offsets[topic][partition] = msg.offset()
+    def pause_finished(self) -> None:
+        """Pause fetching of the partitions, which reached their maximum offsets.
+
+        Keeps the consumer from reading past the offsets snapshot
+        taken on the tracker initialization.
+        """
+        if self._finished:
+            self._consumer.pause(self._finished)
+            self._finished = []
 
 
 @configspec
@@ -203,10 +517,15 @@ class KafkaCredentials(CredentialsConfiguration):
     sasl_mechanisms: str = config.value
     sasl_username: str = config.value
     sasl_password: TSecretValue = secrets.value
+    profile: Optional[str] = None
+    consumer_overrides: Optional[DictStrAny] = None
 
     def init_consumer(self) -> Consumer:
         """Init a Kafka consumer from this credentials.
 
+        Settings of the tuning profile, if set, and the raw librdkafka
+        overrides are applied over the connection ones.
+
         Returns:
             confluent_kafka.Consumer: an initiated consumer.
         """
@@ -218,5 +537,22 @@ class KafkaCredentials(CredentialsConfiguration):
             "sasl.username": self.sasl_username,
             "sasl.password": self.sasl_password,
             "auto.offset.reset": "earliest",
+            "enable.partition.eof": True,
         }
+        config.update(consumer_tuning(self.profile, self.consumer_overrides))
         return Consumer(config)
+
+    def init_admin_client(self) -> AdminClient:
+        """Init a Kafka admin client from this credentials.
+
+        Returns:
+            confluent_kafka.admin.AdminClient: an initiated admin client.
+        """
+        config = {
+            "bootstrap.servers": self.bootstrap_servers,
+            "security.protocol": self.security_protocol,
+            "sasl.mechanisms": self.sasl_mechanisms,
+            "sasl.username": self.sasl_username,
+            "sasl.password": self.sasl_password,
+        }
+        return AdminClient(config)
@@ -0,0 +1,300 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from dlt.common import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+JSON_ENGINES = ("stdlib", "orjson", "msgspec")
+
+# field type names accepted in declared struct schemas
+STRUCT_FIELD_TYPES: Dict[str, Any] = {
+    "bool": bool,
+    "int": int,
+    "float": float,
+    "str": str,
+    "dict": dict,
+    "list": list,
+    "any": Any,
+}
+
+# resource state key of the inferred column types, by topic
+SCHEMA_STATE_KEY = "json_schemas"
+
+# dlt column types inferred from JSON values, nested values are left to dlt
+_DLT_COLUMN_TYPES = {bool: "bool", int: "bigint", float: "double", str: "text"}
+
+# JSON value types conforming to every inferred dlt column type
+_CONFORMING_TYPES = {"bool": (bool,), "bigint": (int,), "double": (int, float), "text": (str,)}
+
+
+def resolve_json_loads(engine: str = "stdlib") -> Callable[[bytes], Any]:
+    """Get a function parsing JSON straight from bytes with the given engine.
+
+    Falls back to the standard library when the engine is not installed.
+
+    Args:
+        engine (str): One of "stdlib", "orjson" or "msgspec".
+
+    Returns:
+        Callable[[bytes], Any]: JSON parsing function.
+    """
+    if engine not in JSON_ENGINES:
+        raise ValueError(f"Unknown JSON engine: {engine}. Expected one of {JSON_ENGINES}")
+
+    if engine == "orjson":
+        if orjson is not None:
+            return orjson.loads
+    elif engine == "msgspec":
+        if msgspec is not None:
+            return msgspec.json.Decoder().decode
+    else:
+        return json.loads
+
+    logger.warning(f"JSON engine {engine} is not installed, falling back to stdlib json")
+    return json.loads
+
+
+def projected_json_loads(fields: List[str]) -> Optional[Callable[[bytes], Dict[str, Any]]]:
+    """Get a function parsing only the given top-level fields of JSON objects.
+
+    Other fields are skipped by msgspec without being built into Python
+    objects. Missing fields are None.
+
+    Args:
+        fields (List[str]): Fields to parse.
+
+    Returns:
+        Optional[Callable[[bytes], Dict[str, Any]]]: Parsing function,
+            None when msgspec is not installed.
+    """
+    if msgspec is None:
+        return None
+
+    struct_type: Type[Any] = msgspec.defstruct(
+        "projection",
+        [(f"f{i}", Any, None) for i in range(len(fields))],
+        rename={f"f{i}": name for i, name in enumerate(fields)},
+    )
+    decode = msgspec.json.Decoder(struct_type).decode
+    to_builtins = msgspec.to_builtins
+
+    return lambda value: to_builtins(decode(value))
+
+
+def _infer_field_type(values: List[Any]) -> Any:
+    types = {type(v) for v in values if v is not None}
+    if types == {int, float}:
+        return float
+    if len(types) == 1:
+        field_type = types.pop()
+        if field_type in STRUCT_FIELD_TYPES.values():
+            return field_type
+    return Any
+
+
+class TopicStructs:
+    """Typed per-topic msgspec structs for decoding known JSON topics.
+
+    Structs are either declared per topic as a mapping of field names to
+    type names (see `STRUCT_FIELD_TYPES`), or inferred from the first
+    `sample_size` messages of a topic. Declared structs are authoritative:
+    fields not declared are skipped while decoding. Inferred structs reject
+    messages with unknown fields, so they get decoded generically and
+    no data is lost. All the fields are nullable.
+
+    Args:
+        declared (Optional[Dict[str, Dict[str, str]]]): Struct schemas by topic.
+        sample_size (int): Messages sampled per topic to infer a struct,
+            0 disables inference.
+    """
+
+    def __init__(self, declared: Optional[Dict[str, Dict[str, str]]] = None, sample_size: int = 0):
+        if msgspec is None:
+            raise ImportError("Typed JSON structs require msgspec: pip install msgspec")
+
+        self._sample_size = sample_size
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[Dict[str, Any]]] = {}
+        self._decoders: Dict[str, Callable[[bytes], Dict[str, Any]]] = {}
+
+        for topic, fields in (declared or {}).items():
+            unknown = set(fields.values()) - set(STRUCT_FIELD_TYPES)
+            if unknown:
+                raise ValueError(f"Unknown struct field types for topic {topic}: {unknown}")
+            field_types = {name: STRUCT_FIELD_TYPES[t] for name, t in fields.items()}
+            self._decoders[topic] = self._make_decoder(topic, field_types, forbid_unknown_fields=False)
+
+    @staticmethod
+    def _make_decoder(
+        topic: str, field_types: Dict[str, Any], forbid_unknown_fields: bool
+    ) -> Callable[[bytes], Dict[str, Any]]:
+        # JSON field names are not always identifiers, attributes are renamed
+        names = list(field_types)
+        struct_type: Type[Any] = msgspec.defstruct(
+            f"{topic.replace('.', '_')}_struct",
+            [(f"f{i}", Optional[field_types[name]], None) for i, name in enumerate(names)],
+            rename={f"f{i}": name for i, name in enumerate(names)},
+            forbid_unknown_fields=forbid_unknown_fields,
+        )
+        decode = msgspec.json.Decoder(struct_type).decode
+        to_builtins = msgspec.to_builtins
+
+        return lambda value: to_builtins(decode(value))
+
+    def decoder(self, topic: str) -> Optional[Callable[[bytes], Dict[str, Any]]]:
+        """Get the typed decoder of a topic, None if there's no struct yet."""
+        return self._decoders.get(topic)
+
+    def observe(self, topic: str, value: Any) -> None:
+        """Sample a generically decoded message, inferring the struct once enough are seen."""
+        if not self._sample_size or topic in self._decoders or not isinstance(value, dict):
+            return
+
+        with self._lock:
+            if topic in self._decoders:
+                return
+            sample = self._samples.setdefault(topic, [])
+            sample.append(value)
+            if len(sample) < self._sample_size:
+                return
+
+            names = list(dict.fromkeys(k for row in sample for k in row))
+            field_types = {name: _infer_field_type([row.get(name) for row in sample]) for name in names}
+            self._decoders[topic] = self._make_decoder(topic, field_types, forbid_unknown_fields=True)
+            del self._samples[topic]
+
+        logger.info(f"Inferred JSON struct for topic {topic}: {field_types}")
+
+
+def _infer_column_type(values: List[Any]) -> Optional[str]:
+    types = {type(v) for v in values if v is not None}
+    if types == {int, float}:
+        return "double"
+    if len(types) == 1:
+        return _DLT_COLUMN_TYPES.get(types.pop())
+    return None
+
+
+class TopicSchemaCache:
+    """Per-topic dlt column types, inferred from a sample of JSON messages.
+
+    The first `sample_size` messages of a topic are sampled, and every
+    top-level field with a single scalar type across the sample gets a
+    column type. Fields with mixed or nested values are left to dlt.
+    Once inferred, the column types of a topic are kept, so messages
+    contradicting them are rejected instead of creating variant columns.
+    New fields are accepted.
+
+    Inferred types are persisted in the resource state, when bound to
+    it with `bind_state`, and in a JSON sidecar file, when given, so the
+    following runs start from them instead of sampling again.
+
+    Args:
+        sample_size (int): Messages sampled per topic to infer its columns.
+        path (Optional[str]): Path of the JSON sidecar file.
+    """
+
+    def __init__(self, sample_size: int, path: Optional[str] = None):
+        self._sample_size = sample_size
+        self._path = path
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[Dict[str, Any]]] = {}
+        # column types by topic, shared with the bound resource state
+        self._columns: Dict[str, Dict[str, str]] = {}
+        self._hints: Dict[str, Dict[str, Any]] = {}
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    for topic, columns in json.load(f).items():
+                        self._set(topic, columns)
+                logger.info(f"Loaded inferred JSON schemas of {len(self._columns)} topics from {path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable JSON schemas file {path}: {e}")
+
+    def _set(self, topic: str, columns: Dict[str, str]) -> None:
+        self._columns[topic] = columns
+        self._hints[topic] = {
+            "columns": {
+                name: {"name": name, "data_type": data_type, "nullable": True}
+                for name, data_type in columns.items()
+            }
+        }
+
+    def _save(self) -> None:
+        tmp_path = f"{self._path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._columns, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning(f"Failed to save JSON schemas file {self._path}: {e}")
+
+    def bind_state(self, state: Dict[str, Any]) -> None:
+        """Load the column types saved in a resource state, and save the inferred ones there."""
+        with self._lock:
+            saved = state.setdefault(SCHEMA_STATE_KEY, {})
+            for topic, columns in saved.items():
+                if topic not in self._columns:
+                    self._set(topic, columns)
+            saved.update(self._columns)
+            self._columns = saved
+
+    def table_hints(self, topic: str) -> Optional[Dict[str, Any]]:
+        """Column hints of a topic, None while it's being sampled."""
+        return self._hints.get(topic)
+
+    def check(self, topic: str, value: Dict[str, Any]) -> Optional[str]:
+        """Validate a decoded message against the topic column types, sampling it if there are none yet.
+
+        Returns:
+            Optional[str]: Why the message doesn't conform, None if it does.
+        """
+        columns = self._columns.get(topic)
+        if columns is None:
+            self._observe(topic, value)
+            return None
+
+        for name, data_type in columns.items():
+            v = value.get(name)
+            if v is None:
+                continue
+            # bools are ints to isinstance
+            if not isinstance(v, _CONFORMING_TYPES[data_type]) or (
+                isinstance(v, bool) and data_type != "bool"
+            ):
+                return f"field {name} is {type(v).__name__}, expected {data_type}"
+        return None
+
+    def _observe(self, topic: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            if topic in self._columns:
+                return
+            sample = self._samples.setdefault(topic, [])
+            sample.append(value)
+            if len(sample) < self._sample_size:
+                return
+
+            names = list(dict.fromkeys(k for row in sample for k in row))
+            columns = {}
+            for name in names:
+                data_type = _infer_column_type([row.get(name) for row in sample])
+                if data_type is not None:
+                    columns[name] = data_type
+            self._set(topic, columns)
+            del self._samples[topic]
+            if self._path:
+                self._save()
+
+        logger.info(f"Inferred JSON columns of topic {topic} from {len(sample)} messages: {columns}")
@@ -0,0 +1,148 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from confluent_kafka import Message
+from confluent_kafka.serialization import MessageField, SerializationContext
+
+from .avro import parse_confluent_header
+
+KEY_FORMATS = ("avro", "json", "string", "binary")
+
+# first bytes of JSON documents, other than the true/false/null literals
+_JSON_STARTS = frozenset(b'{["-0123456789 \t\r\n')
+_JSON_LITERALS = frozenset((b"true", b"false", b"null"))
+
+
+def _is_utf8(key: bytes) -> bool:
+    try:
+        key.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+class KeyDecoder:
+    """Deserializes message keys, learning the key format of every topic.
+
+    The first key of a topic is probed in order: Avro (only Confluent-framed
+    keys, when an Avro deserializer is given), JSON, UTF-8 string and raw
+    binary. The first format that works is cached for the topic, and the
+    following keys are decoded with it directly. The topic is probed again
+    when a key stops matching the cached format, and, for topics cached as
+    strings or binary, which any key matches, when a key may be in an earlier
+    format: Avro-framed, looking like JSON or, for binary topics, valid UTF-8.
+    Other keys of those topics are decoded without probing. Every key is thus
+    decoded as it would be if all the formats were probed for it.
+
+    The decoder is shared by partition workers: formats and stats are
+    updated under a lock.
+
+    Args:
+        avro_deserializer (Optional[Callable]): Confluent Avro deserializer
+            for Avro keys. Avro is not probed without it.
+    """
+
+    def __init__(self, avro_deserializer: Optional[Callable[[bytes, SerializationContext], Any]] = None):
+        self._avro_deserializer = avro_deserializer
+        self._contexts: Dict[str, SerializationContext] = {}
+        self._formats: Dict[str, str] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        decoders = {
+            "avro": self._decode_avro,
+            "json": self._decode_json,
+            "string": self._decode_string,
+            "binary": self._decode_binary,
+        }
+        self._decoders = {
+            fmt: decoders[fmt]
+            for fmt in KEY_FORMATS
+            if fmt != "avro" or avro_deserializer is not None
+        }
+
+    def __call__(self, msg: Message) -> Optional[Any]:
+        """
+        Deserialize message key with the format learned for its topic
+
+        Args:
+            msg: Kafka message
+
+        Returns:
+            Deserialized key or None if no key
+        """
+        key = msg.key()
+        if key is None:
+            return None
+
+        topic = msg.topic()
+        fmt = self._formats.get(topic)
+        if fmt is not None:
+            if not self._may_precede(fmt, key):
+                try:
+                    value = self._decoders[fmt](topic, key)
+                except Exception:
+                    pass
+                else:
+                    with self._lock:
+                        self._stats[topic]["decoded"] += 1
+                    return value
+
+            with self._lock:
+                self._stats[topic]["reprobes"] += 1
+
+        return self._probe(topic, key)
+
+    def _probe(self, topic: str, key: bytes) -> Any:
+        for fmt, decoder in self._decoders.items():
+            try:
+                value = decoder(topic, key)
+            except Exception:
+                continue
+
+            with self._lock:
+                stats = self._stats.setdefault(topic, {"format": fmt, "decoded": 0, "reprobes": 0})
+                stats["format"] = fmt
+                stats["decoded"] += 1
+                self._formats[topic] = fmt
+            return value
+
+    def _may_precede(self, fmt: str, key: bytes) -> bool:
+        # whether a key of a topic cached as string or binary may be in an
+        # earlier format, which the cached decoder would accept anyway
+        if fmt != "string" and fmt != "binary":
+            return False
+        if "avro" in self._decoders and parse_confluent_header(key) is not None:
+            return True
+        if fmt == "binary":
+            # JSON and strings are valid UTF-8, binary keys rarely are
+            return key.isascii() or _is_utf8(key)
+        return bool(key) and key[0] in _JSON_STARTS or key in _JSON_LITERALS
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Key format detected for every topic, with decoded keys and reprobe counts."""
+        with self._lock:
+            return {topic: dict(stats) for topic, stats in self._stats.items()}
+
+    def _decode_avro(self, topic: str, key: bytes) -> Any:
+        if parse_confluent_header(key) is None:
+            raise ValueError("Key is not Confluent-framed")
+
+        ctx = self._contexts.get(topic)
+        if ctx is None:
+            ctx = self._contexts[topic] = SerializationContext(topic, MessageField.KEY)
+        return self._avro_deserializer(key, ctx)
+
+    @staticmethod
+    def _decode_json(topic: str, key: bytes) -> Any:
+        return json.loads(key)
+
+    @staticmethod
+    def _decode_string(topic: str, key: bytes) -> str:
+        return key.decode("utf-8")
+
+    @staticmethod
+    def _decode_binary(topic: str, key: bytes) -> str:
+        return f"<binary_key_length_{len(key)}>"
@@ -0,0 +1,120 @@
+import gc
+import time
+from typing import Callable, List, Optional
+
+import psutil
+from confluent_kafka import Consumer, TopicPartition
+from dlt.common import logger
+
+from .dlq import RateLimitedLog
+
+MB = 1024 * 1024
+
+
+class MemoryGovernor:
+    """Pauses consumption while the process RSS is above a ceiling.
+
+    Once the RSS passes `max_rss_mb`, garbage is collected first. Memory
+    still over the ceiling can only drain in another thread, e.g. a loader
+    taking the queued batches, which `draining` tells about: while it is
+    busy, the given partitions are paused, so neither the caller nor
+    librdkafka prefetch fetch more messages, and the caller waits.
+    Consumption is resumed when the RSS drops under `resume_ratio` of the
+    ceiling, the gap keeps the consumer from flapping around the ceiling,
+    or when nothing is left to drain, or after `max_wait` seconds.
+
+    Without a draining thread, e.g. in the extract step of a pipeline run,
+    which itself flushes the yielded items, waiting would only stall it:
+    the caller keeps reading, with a warning.
+
+    Args:
+        max_rss_mb (int): RSS ceiling, in megabytes.
+        resume_ratio (float): Part of the ceiling to drop under to resume.
+        check_interval (float): Seconds between RSS checks while paused.
+        max_wait (Optional[float]): Maximum seconds to stay paused,
+            no limit if None.
+        draining (Optional[Callable[[], bool]]): Tells whether another
+            thread is still draining the data read so far.
+    """
+
+    def __init__(
+        self,
+        max_rss_mb: int,
+        resume_ratio: float = 0.8,
+        check_interval: float = 0.5,
+        max_wait: Optional[float] = 60.0,
+        draining: Optional[Callable[[], bool]] = None,
+    ):
+        self.max_rss = max_rss_mb * MB
+        self.resume_rss = int(self.max_rss * resume_ratio)
+        self.check_interval = check_interval
+        self.max_wait = max_wait
+        self.draining = draining
+        self._process = psutil.Process()
+        self._log = RateLimitedLog()
+
+    def rss(self) -> int:
+        """Current resident set size of the process, in bytes."""
+        return self._process.memory_info().rss
+
+    def throttle(
+        self,
+        consumer: Consumer,
+        partitions: Callable[[], List[TopicPartition]],
+        draining: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """Pause the partitions until memory drains, if the RSS is over the ceiling.
+
+        Args:
+            consumer (confluent_kafka.Consumer): Consumer to pause.
+            partitions (Callable[[], List[TopicPartition]]): Gives the
+                partitions to pause, called only when the ceiling is passed.
+            draining (Optional[Callable[[], bool]]): Tells whether another
+                thread is still draining the caller's data, besides the
+                governor's own `draining`.
+        """
+        if self.rss() <= self.max_rss:
+            return
+
+        gc.collect()
+        rss = self.rss()
+        if rss <= self.resume_rss:
+            return
+
+        checks = [check for check in (draining, self.draining) if check is not None]
+
+        def _draining() -> bool:
+            return any(check() for check in checks)
+
+        if not _draining():
+            self._log.warning(
+                "rss",
+                f"RSS {rss // MB} MB is over {self.max_rss // MB} MB, with nothing draining "
+                "the data read so far, reading on",
+            )
+            return
+
+        parts = partitions()
+        consumer.pause(parts)
+        logger.warning(
+            f"RSS {rss // MB} MB is over {self.max_rss // MB} MB, "
+            f"paused {len(parts)} partitions"
+        )
+
+        started = time.monotonic()
+        try:
+            while rss > self.resume_rss and _draining():
+                waited = time.monotonic() - started
+                if self.max_wait is not None and waited >= self.max_wait:
+                    logger.warning(
+                        f"RSS {rss // MB} MB didn't drain in {waited:.0f}s, resuming anyway"
+                    )
+                    break
+
+                time.sleep(self.check_interval)
+                gc.collect()
+                rss = self.rss()
+        finally:
+            consumer.resume(parts)
+
+        logger.info(f"RSS is {rss // MB} MB, resumed after {time.monotonic() - started:.1f}s")
@@ -1,21 +1,42 @@
+from typing import Dict, Any, List, Optional, Tuple, Union
 import json
-from typing import Dict, Any, Optional
+import threading
 from confluent_kafka import Message
 from confluent_kafka.schema_registry import SchemaRegistryClient
 from confluent_kafka.schema_registry.avro import AvroDeserializer
 from confluent_kafka.serialization import SerializationContext, MessageField
+from dlt.common import logger
 import os
 
+from .avro import AvroProjectedReader, AvroTableHints, parse_confluent_header
+from .dlq import DeadLetterQueue, RateLimitedLog
+from .json_decoding import TopicSchemaCache, TopicStructs, projected_json_loads, resolve_json_loads
+from .keys import KeyDecoder
+from .pushdown import RowPushdown
+
 
 class AvroMessageProcessor:
     """Message processor for Avro-serialized Kafka messages"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        output_format: str = "rows",
+        pushdown: Optional[RowPushdown] = None,
+        dlq: Optional[DeadLetterQueue] = None,
+    ):
         """
         Initialize the Avro processor with Schema Registry URL
         
+        The Schema Registry URL is read from the SCHEMA_REGISTRY_URL environment variable.
+
         Args:
-            schema_registry_url: URL of the Confluent Schema Registry
+            output_format: 'rows' to process batches into dicts, 'arrow' to decode
+                them column-wise into Arrow tables
+            pushdown: Compiled `select` and `where` of the resource, with a `select`
+                only the selected and filtered fields are decoded, through projected
+                reader schemas
+            dlq: Dead letter queue for the messages failing to deserialize, which are
+                then left out of the batch instead of becoming `_avro_error` rows
         """
         # Create Schema Registry client
         schema_registry_url = os.getenv("SCHEMA_REGISTRY_URL")
@@ -24,14 +45,44 @@ class AvroMessageProcessor:
         schema_registry_client = SchemaRegistryClient({
             'url': schema_registry_url
         })
+        self.schema_registry_client = schema_registry_client
         
         # Create Avro deserializer
         self.avro_deserializer = AvroDeserializer(schema_registry_client)
+        self.key_decoder = KeyDecoder(self.avro_deserializer)
+
+        self.pushdown = pushdown
+        self.dlq = dlq
+        # failures are logged at most once per topic and interval
+        self._error_log = RateLimitedLog()
+        # decodes only the fields the pushdown needs
+        self.projected_reader = None
+        if pushdown is not None and pushdown.decode_fields:
+            self.projected_reader = AvroProjectedReader(schema_registry_client, pushdown.decode_fields)
+
+        # Columnar decoder, caching one reader per schema id
+        self.arrow_decoder = None
+        if output_format == "arrow":
+            from .avro import AvroArrowDecoder
+
+            self.arrow_decoder = AvroArrowDecoder(schema_registry_client, pushdown)
+
+        # dlt table hints of the registry schemas, Arrow tables keep records as structs
+        self.schema_hints = AvroTableHints(
+            schema_registry_client,
+            pushdown.select if pushdown else None,
+            flatten=self.arrow_decoder is None,
+        )
+        # the latest value schema id seen on every topic
+        self._schema_ids: Dict[str, int] = {}
+        # partition workers share the processor, its caches are updated under the lock
+        self._lock = threading.Lock()
         print(f"AvroMessageProcessor initialized with Schema Registry: {schema_registry_url}")
     
     def _deserialize_key(self, msg: Message) -> Optional[Any]:
         """
-        Deserialize message key, trying Avro first, then JSON, then string fallback
+        Deserialize message key with the format learned for its topic: Avro, JSON,
+        string or raw bytes info (see `KeyDecoder`)
         
         Args:
             msg: Kafka message
@@ -39,26 +90,39 @@ class AvroMessageProcessor:
         Returns:
             Deserialized key or None if no key
         """
-        if msg.key() is None:
+        return self.key_decoder(msg)
+
+    @property
+    def key_format_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Key format detected for every topic, with decoded keys and reprobe counts"""
+        return self.key_decoder.stats
+
+    def table_hints(self, topic: str) -> Optional[Dict[str, Any]]:
+        """
+        dlt table hints of the latest value schema seen on a topic
+
+        Hints are translated once per schema id (see `avro_table_hints`) and the
+        same object is returned until the topic schema id changes, so callers can
+        attach them to the topic table only when they change.
+
+        Args:
+            topic: Topic name
+
+        Returns:
+            `columns` and `nested_hints` of the topic table, None if unknown
+        """
+        schema_id = self._schema_ids.get(topic)
+        if schema_id is None:
             return None
-            
-        # Try Avro deserialization first
-        try:
-            ctx = SerializationContext(msg.topic(), MessageField.KEY)
-            return self.avro_deserializer(msg.key(), ctx)
-        except Exception:
-            # Avro failed, try JSON
-            try:
-                return json.loads(msg.key().decode('utf-8'))
-            except Exception:
-                # JSON failed, fallback to string
-                try:
-                    return msg.key().decode('utf-8')
-                except Exception:
-                    # Even string decoding failed, return raw bytes info
-                    return f"<binary_key_length_{len(msg.key())}>"
+        return self.schema_hints(schema_id)
+
+    def _track_schema(self, msg: Message) -> None:
+        schema_id = parse_confluent_header(msg.value())
+        if schema_id is not None:
+            with self._lock:
+                self._schema_ids[msg.topic()] = schema_id
 
-    def __call__(self, msg: Message) -> Dict[str, Any]:
+    def __call__(self, msg: Message) -> Optional[Dict[str, Any]]:
         """
         Process an Avro message by deserializing it and adding Kafka metadata
         
@@ -66,12 +130,17 @@ class AvroMessageProcessor:
             msg: Confluent Kafka message with Avro-serialized value
             
         Returns:
-            Dict containing deserialized value and Kafka metadata
+            Dict containing deserialized value and Kafka metadata, None if the
+            message failed to deserialize and went to the dead letter queue
         """
         try:
             # Deserialize the Avro value
             ctx = SerializationContext(msg.topic(), MessageField.VALUE)
             deserialized_value = self.avro_deserializer(msg.value(), ctx)
+            if not isinstance(deserialized_value, dict):
+                # e.g. tombstones, decoded as None
+                raise ValueError(f"Avro value is not a record: {type(deserialized_value).__name__}")
+            self._track_schema(msg)
             
             # Deserialize the key using smart detection
             deserialized_key = self._deserialize_key(msg)
@@ -94,6 +163,10 @@ class AvroMessageProcessor:
             return processed_message
             
         except Exception as e:
+            if self.dlq is not None:
+                self.dlq.add(msg, e)
+                return None
+
             # Handle deserialization errors gracefully
             # Still try to get the key even if value deserialization failed
             fallback_key = self._deserialize_key(msg)
@@ -110,19 +183,390 @@ class AvroMessageProcessor:
                 }
             }
             
-            print(f"Avro deserialization failed for {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            self._error_log.warning(
+                msg.topic(),
+                f"Avro deserialization failed for {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}",
+            )
             return error_message
 
+    def process_batch(self, messages: List[Message]) -> Union[List[Dict[str, Any]], List[Any]]:
+        """
+        Process a whole consumed batch of Avro messages at once
+
+        Serialization contexts are created once per topic instead of once per
+        message. Messages filtered out by the pushdown are skipped, the header,
+        key and topic conditions are checked before decoding the value. Messages
+        failing to deserialize, or with values which aren't records (tombstones),
+        go through `__call__` to get the same error rows as in per-message
+        processing, or to the dead letter queue.
+
+        With the 'arrow' output format the batch is decoded column-wise instead,
+        into one Arrow table per topic and schema id. Either way the latest schema
+        id of every topic is tracked, for `table_hints`.
+
+        Args:
+            messages: Confluent Kafka messages with Avro-serialized values
+
+        Returns:
+            List of dicts containing deserialized values and Kafka metadata,
+            or a list of Arrow tables with flattened `_kafka__*` metadata columns,
+            and the rows of the messages rejected for mixed type columns
+        """
+        if self.dlq is not None:
+            self.dlq.count(messages)
+        if self.arrow_decoder is not None:
+            return self._process_batch_arrow(messages)
+
+        deserialize = self.avro_deserializer
+        projected_reader = self.projected_reader
+        deserialize_key = self._deserialize_key
+        if self.pushdown is not None:
+            # keys read by the conditions are decoded once
+            deserialize_key = self.pushdown.batch_key_decoder(deserialize_key)
+        accept_message = self.pushdown.accept_message if self.pushdown else None
+        filter_value = self.pushdown.filter_value if self.pushdown else None
+        contexts: Dict[str, SerializationContext] = {}
+        # the last message of a topic in the batch carries its latest schema id
+        last_messages: Dict[str, Message] = {}
+
+        rows = []
+        for msg in messages:
+            if accept_message is not None and not accept_message(msg, deserialize_key):
+                continue
+
+            topic = msg.topic()
+            ctx = contexts.get(topic)
+            if ctx is None:
+                ctx = contexts[topic] = SerializationContext(topic, MessageField.VALUE)
+
+            try:
+                if projected_reader is not None:
+                    deserialized_value = projected_reader(msg.value())
+                else:
+                    deserialized_value = deserialize(msg.value(), ctx)
+                if not isinstance(deserialized_value, dict):
+                    raise ValueError("Avro value is not a record")
+            except Exception:
+                row = self(msg)
+                if row is not None:
+                    rows.append(row)
+                continue
+            last_messages[topic] = msg
+
+            if filter_value is not None:
+                deserialized_value = filter_value(deserialized_value)
+                if deserialized_value is None:
+                    continue
+
+            ts = msg.timestamp()[1]
+            rows.append({
+                **deserialized_value,
+                "_kafka": {
+                    "topic": topic,
+                    "partition": msg.partition(),
+                    "offset": msg.offset(),
+                    "timestamp": ts if ts >= 0 else None,
+                    "key": deserialize_key(msg),
+                }
+            })
+
+        for msg in last_messages.values():
+            self._track_schema(msg)
+
+        return rows
+
+    def _process_batch_arrow(self, messages: List[Message]) -> List[Any]:
+        from .arrow import rows_to_tables
+
+        deserialize_key = self._deserialize_key
+        if self.pushdown is not None:
+            # keys read by the conditions are decoded once
+            deserialize_key = self.pushdown.batch_key_decoder(deserialize_key)
+        accept_message = self.pushdown.accept_message if self.pushdown else None
+        if accept_message is not None:
+            messages = [msg for msg in messages if accept_message(msg, deserialize_key)]
+
+        tables, rejected, mixed = self.arrow_decoder.decode_batch(messages, deserialize_key)
+        # the last framed message of a topic in the batch carries its latest schema id
+        last_messages = {msg.topic(): msg for msg in messages if parse_confluent_header(msg.value()) is not None}
+        for msg in last_messages.values():
+            self._track_schema(msg)
+
+        if rejected:
+            # not Confluent-framed or undecodable column-wise: fall back per message
+            rows = [row for row in map(self, rejected) if row is not None]
+            if rows:
+                rejects: List[Dict[str, Any]] = []
+                tables.extend(rows_to_tables(rows, rejects).values())
+                tables.extend(rejects)
+        # rows next to the tables go to the rejects tables
+        tables.extend({**self(msg), "_reject_reason": reason} for msg, reason in mixed)
+
+        return tables
+
+
+class DebeziumMessageProcessor(AvroMessageProcessor):
+    """Message processor for Debezium change events, compacted per batch
+
+    Expects Avro keys and values, with the values unwrapped by the
+    `ExtractNewRecordState` transform with the `op`, `source.table` and
+    `source.ts_ms` fields added (`__op`, `__table`, `__source_ts_ms`) and
+    deletes rewritten into rows flagged by `__deleted`. The tombstones
+    following deletes are turned into deletes of their keys.
+    """
+
+    def __init__(self, pushdown: Optional[RowPushdown] = None, dlq: Optional[DeadLetterQueue] = None):
+        """
+        Initialize the Debezium processor, decoding rows with the Avro processor
+
+        The primary key of every topic table is read from its message key schema.
+
+        Args:
+            pushdown: Compiled `select` and `where` of the resource, a `select`
+                has to keep the primary key and `__` fields
+            dlq: Dead letter queue for the events failing to deserialize, which
+                otherwise go to the rejects
+        """
+        super().__init__(output_format="rows", pushdown=pushdown, dlq=dlq)
+        # the latest key schema id seen on every topic
+        self._key_schema_ids: Dict[str, int] = {}
+        self._primary_keys: Dict[int, Optional[List[str]]] = {}
+        self._cdc_hints: Dict[Tuple[Optional[int], int], Dict[str, Any]] = {}
+        self._rejects: List[Dict[str, Any]] = []
+        self._rejects_lock = threading.Lock()
+        self.compacted = 0
+
+    def _primary_key(self, key_schema_id: int) -> Optional[List[str]]:
+        """Field names of a record key schema, None if the key isn't a record"""
+        if key_schema_id in self._primary_keys:
+            return self._primary_keys[key_schema_id]
+
+        try:
+            schema = json.loads(self.schema_registry_client.get_schema(key_schema_id).schema_str)
+            primary_key = (
+                [field["name"] for field in schema["fields"]]
+                if isinstance(schema, dict) and schema.get("type") == "record"
+                else None
+            )
+        except Exception as e:
+            logger.warning(f"Key schema id {key_schema_id} can't be read: {e}")
+            primary_key = None
+
+        with self._lock:
+            return self._primary_keys.setdefault(key_schema_id, primary_key)
+
+    def table_hints(self, topic: str) -> Optional[Dict[str, Any]]:
+        """
+        Merge hints of a topic table: the primary key from the key schema, columns
+        from the value schema, `__deleted` as hard delete flag and `__source_ts_ms`
+        to deduplicate the rows of a key within a load
+
+        Args:
+            topic: Topic name
+
+        Returns:
+            dlt table hints, None until a record key schema is seen on the topic
+        """
+        key_schema_id = self._key_schema_ids.get(topic)
+        primary_key = self._primary_key(key_schema_id) if key_schema_id is not None else None
+        if not primary_key:
+            return None
+
+        cache_key = (self._schema_ids.get(topic), key_schema_id)
+        hints = self._cdc_hints.get(cache_key)
+        if hints is None:
+            value_hints = super().table_hints(topic)
+            columns = dict(value_hints["columns"]) if value_hints else {}
+            columns["__deleted"] = {"name": "__deleted", "data_type": "bool", "nullable": True, "hard_delete": True}
+            columns["__source_ts_ms"] = {
+                **columns.get("__source_ts_ms", {"name": "__source_ts_ms", "data_type": "bigint"}),
+                "dedup_sort": "desc",
+            }
+            hints = {
+                "columns": columns,
+                "primary_key": primary_key,
+                "write_disposition": {"disposition": "merge", "strategy": "delete-insert"},
+                "nested_hints": value_hints["nested_hints"] if value_hints else {},
+            }
+            # the same hints object is kept per schema ids, see `_BatchFormatter`
+            with self._lock:
+                hints = self._cdc_hints.setdefault(cache_key, hints)
+
+        return hints
+
+    def drain_rejects(self) -> List[Dict[str, Any]]:
+        """
+        Take the rows of the messages rejected since the last call
+
+        Change events which couldn't be decoded or have no record key can't be
+        merged, and are routed to the topic's rejects table by the resources.
+        """
+        with self._rejects_lock:
+            rejects, self._rejects = self._rejects, []
+        return rejects
+
+    @staticmethod
+    def _is_newer(row: Dict[str, Any], current: Dict[str, Any]) -> bool:
+        # the offsets order the events of a key, as long as its partition didn't change
+        if row["_kafka"]["partition"] == current["_kafka"]["partition"]:
+            return row["_kafka"]["offset"] > current["_kafka"]["offset"]
+        return (row.get("__source_ts_ms") or 0) >= (current.get("__source_ts_ms") or 0)
+
+    @staticmethod
+    def _tombstone_row(msg: Message, key: Any) -> Dict[str, Any]:
+        """Delete row of a tombstone: the key fields, `__deleted` and the Kafka metadata"""
+        ts = msg.timestamp()[1]
+        row = {
+            # tombstones have no source timestamp, the message one orders them after their delete
+            "__source_ts_ms": ts if ts >= 0 else None,
+            "_kafka": {
+                "topic": msg.topic(),
+                "partition": msg.partition(),
+                "offset": msg.offset(),
+                "timestamp": ts if ts >= 0 else None,
+                "key": key,
+            },
+        }
+        if isinstance(key, dict):
+            row = {**key, **row, "__deleted": True}
+        else:
+            row["_reject_reason"] = "tombstone has no record key"
+        return row
+
+    def process_batch(self, messages: List[Message]) -> List[Dict[str, Any]]:
+        """
+        Process a batch of change events, keeping the latest event of every key
+
+        Events of the same topic and key are collapsed to the latest by offset,
+        or by `__source_ts_ms` across partitions, so a row updated many times in
+        a batch is written once. `__deleted` is turned into a boolean.
+
+        Tombstones (null values) become deletes of their keys, filtered by the
+        pushdown key, header and topic conditions only. A tombstone following
+        the delete of its key in the batch is collapsed into that delete, which
+        has the row values.
+
+        Args:
+            messages: Confluent Kafka messages with Avro-serialized keys and values
+
+        Returns:
+            List of dicts, one per changed key
+        """
+        last_messages: Dict[str, Message] = {}
+        for msg in messages:
+            last_messages[msg.topic()] = msg
+        for topic, msg in last_messages.items():
+            key_schema_id = parse_confluent_header(msg.key())
+            if key_schema_id is not None:
+                with self._lock:
+                    self._key_schema_ids[topic] = key_schema_id
+
+        tombstone_ids = set()
+        events = [msg for msg in messages if msg.value() is not None]
+        tombstones = [msg for msg in messages if msg.value() is None]
+        rows = super().process_batch(events)
+        if tombstones:
+            if self.dlq is not None:
+                self.dlq.count(tombstones)
+            deserialize_key = self._deserialize_key
+            accept_message = None
+            if self.pushdown is not None:
+                deserialize_key = self.pushdown.batch_key_decoder(deserialize_key)
+                accept_message = self.pushdown.accept_message
+            tombstone_rows = [
+                self._tombstone_row(msg, deserialize_key(msg))
+                for msg in tombstones
+                if accept_message is None or accept_message(msg, deserialize_key)
+            ]
+            tombstone_ids = {id(row) for row in tombstone_rows}
+            rows.extend(tombstone_rows)
+            # merged in offset order, so tombstones come after their deletes
+            rows.sort(key=lambda row: (row["_kafka"]["partition"], row["_kafka"]["offset"]))
+
+        latest: Dict[Tuple[str, Tuple[Any, ...]], Dict[str, Any]] = {}
+        rejects = []
+        for row in rows:
+            key = row["_kafka"]["key"]
+            if "_avro_error" in row or "_reject_reason" in row or not isinstance(key, dict):
+                row.setdefault("_reject_reason", row.get("_avro_error") or "change event has no record key")
+                rejects.append(row)
+                continue
+
+            deleted = row.get("__deleted")
+            if deleted is not None:
+                row["__deleted"] = deleted is True or deleted == "true"
+
+            try:
+                identity = (row["_kafka"]["topic"], tuple(key.values()))
+                current = latest.get(identity)
+            except TypeError:
+                # unhashable key values aren't compacted
+                identity, current = (row["_kafka"]["topic"], (id(row),)), None
+            if current is not None and current.get("__deleted") is True and id(row) in tombstone_ids:
+                # the tombstone of a delete in the batch
+                continue
+            if current is None or self._is_newer(row, current):
+                latest[identity] = row
+
+        if rejects:
+            with self._rejects_lock:
+                self._rejects.extend(rejects)
+        with self._lock:
+            self.compacted += len(messages) - len(latest) - len(rejects)
+
+        return list(latest.values())
+
 
 class JSONMessageProcessor:
     """Message processor for JSON-serialized Kafka messages"""
 
-    def __init__(self):
-        print("JSONMessageProcessor initialized")
+    def __init__(
+        self,
+        engine: str = "stdlib",
+        structs: Optional[Dict[str, Dict[str, str]]] = None,
+        struct_sample_size: int = 0,
+        schema_sample_size: int = 0,
+        schema_path: Optional[str] = None,
+        pushdown: Optional[RowPushdown] = None,
+        dlq: Optional[DeadLetterQueue] = None,
+    ):
+        """
+        Initialize the JSON processor
+
+        Args:
+            engine: JSON decoding engine: 'stdlib', 'orjson' or 'msgspec'
+            structs: Typed struct schemas by topic, as field name to type name
+                mappings, decoded with msgspec (see `TopicStructs`)
+            struct_sample_size: Messages sampled to infer a typed struct for topics
+                without a declared one, 0 disables inference
+            schema_sample_size: Messages sampled to infer the dlt column types of a
+                topic, messages contradicting them are rejected (see `TopicSchemaCache`),
+                0 disables inference
+            schema_path: Sidecar JSON file persisting the inferred column types
+            pushdown: Compiled `select` and `where` of the resource, with a `select`
+                only the selected and filtered fields are parsed, if msgspec is installed
+            dlq: Dead letter queue for the messages failing to deserialize, which are
+                then left out of the batch instead of becoming `_json_error` rows
+        """
+        self._loads = resolve_json_loads(engine)
+        self.pushdown = pushdown
+        self.dlq = dlq
+        # failures are logged at most once per topic and interval
+        self._error_log = RateLimitedLog()
+        # topics without a typed struct parse only the fields the pushdown needs
+        if pushdown is not None and pushdown.decode_fields:
+            self._loads = projected_json_loads(pushdown.decode_fields) or self._loads
+        self.structs = TopicStructs(structs, struct_sample_size) if structs or struct_sample_size else None
+        self.schemas = TopicSchemaCache(schema_sample_size, schema_path) if schema_sample_size else None
+        self._rejects: List[Dict[str, Any]] = []
+        self._rejects_lock = threading.Lock()
+        self.key_decoder = KeyDecoder()
+        logger.info(f"JSONMessageProcessor initialized with {engine} engine")
 
     def _deserialize_key(self, msg: Message) -> Optional[Any]:
         """
-        Deserialize message key: try JSON, fallback to UTF-8 string, then raw length
+        Deserialize message key with the format learned for its topic: JSON,
+        UTF-8 string or raw length (see `KeyDecoder`)
         
         Args:
             msg: Kafka message
@@ -130,18 +574,14 @@ class JSONMessageProcessor:
         Returns:
             Deserialized key or None if key not present
         """
-        if msg.key() is None:
-            return None
+        return self.key_decoder(msg)
 
-        try:
-            return json.loads(msg.key().decode("utf-8"))
-        except Exception:
-            try:
-                return msg.key().decode("utf-8")
-            except Exception:
-                return f"<binary_key_length_{len(msg.key())}>"
+    @property
+    def key_format_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Key format detected for every topic, with decoded keys and reprobe counts"""
+        return self.key_decoder.stats
 
-    def __call__(self, msg: Message) -> Dict[str, Any]:
+    def __call__(self, msg: Message) -> Optional[Dict[str, Any]]:
         """
         Process a JSON message and extract both content and metadata
 
@@ -149,10 +589,14 @@ class JSONMessageProcessor:
             msg: Confluent Kafka message with JSON-encoded value
 
         Returns:
-            Dict with deserialized value and metadata
+            Dict with deserialized value and metadata, None if the message failed
+            to deserialize and went to the dead letter queue
         """
         try:
-            deserialized_value = json.loads(msg.value().decode("utf-8")) if msg.value() else {}
+            deserialized_value = self._loads(msg.value()) if msg.value() else {}
+            if not isinstance(deserialized_value, dict):
+                # e.g. null, arrays or scalars
+                raise ValueError(f"JSON value is not an object: {type(deserialized_value).__name__}")
 
             deserialized_key = self._deserialize_key(msg)
 
@@ -168,6 +612,10 @@ class JSONMessageProcessor:
             }
 
         except Exception as e:
+            if self.dlq is not None:
+                self.dlq.add(msg, e)
+                return None
+
             fallback_key = self._deserialize_key(msg)
             error_message = {
                 "_json_error": str(e),
@@ -180,15 +628,177 @@ class JSONMessageProcessor:
                     "key": fallback_key,
                 },
             }
-            print(f"JSON deserialization failed for {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            self._error_log.warning(
+                msg.topic(),
+                f"JSON deserialization failed for {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}",
+            )
             return error_message
 
-def create_avro_processor() -> AvroMessageProcessor:
+    def bind_state(self, state: Dict[str, Any]) -> None:
+        """Persist the inferred column types in a resource state, see `TopicSchemaCache`"""
+        if self.schemas is not None:
+            self.schemas.bind_state(state)
+
+    def table_hints(self, topic: str) -> Optional[Dict[str, Any]]:
+        """dlt column hints inferred for a topic, None while sampling or without inference"""
+        if self.schemas is None:
+            return None
+        return self.schemas.table_hints(topic)
+
+    def drain_rejects(self) -> List[Dict[str, Any]]:
+        """
+        Take the rows of the messages rejected since the last call
+
+        Rejected rows keep the raw value, the reason and the Kafka metadata,
+        and are routed to the topic's rejects table by the resources.
+        """
+        with self._rejects_lock:
+            rejects, self._rejects = self._rejects, []
+        return rejects
+
+    def _reject(self, msg: Message, reason: str) -> None:
+        ts = msg.timestamp()[1]
+        row = {
+            "_reject_reason": reason,
+            "_raw_value": msg.value().decode("utf-8", errors="replace"),
+            "_kafka": {
+                "topic": msg.topic(),
+                "partition": msg.partition(),
+                "offset": msg.offset(),
+                "timestamp": ts if ts >= 0 else None,
+                "key": self._deserialize_key(msg),
+            },
+        }
+        with self._rejects_lock:
+            self._rejects.append(row)
+
+    def _decode_typed(self, topic: str, value: bytes) -> Any:
+        """
+        Decode a value into the typed struct of its topic, generically if it doesn't
+        have one yet or the value doesn't match it
+        """
+        decode = self.structs.decoder(topic)
+        if decode is not None:
+            try:
+                return decode(value)
+            except Exception:
+                pass
+
+        deserialized_value = self._loads(value)
+        self.structs.observe(topic, deserialized_value)
+        return deserialized_value
+
+    def process_batch(self, messages: List[Message]) -> List[Dict[str, Any]]:
+        """
+        Process a whole consumed batch of JSON messages at once
+
+        Values are parsed straight from bytes, into typed structs for topics
+        that have one. Messages filtered out by the pushdown are skipped, the
+        header, key and topic conditions are checked before parsing the value.
+        Messages failing to deserialize, or with values which aren't objects, go
+        through `__call__` to get the same error rows as in per-message
+        processing, or to the dead letter queue. Empty values are empty objects. With schema
+        inference, messages contradicting the inferred column types of their
+        topic are left out of the batch, for `drain_rejects`.
+
+        Args:
+            messages: Confluent Kafka messages with JSON-encoded values
+
+        Returns:
+            List of dicts with deserialized values and metadata
+        """
+        loads = self._loads
+        structs = self.structs
+        schemas = self.schemas
+        deserialize_key = self._deserialize_key
+        if self.pushdown is not None:
+            # keys read by the conditions are decoded once
+            deserialize_key = self.pushdown.batch_key_decoder(deserialize_key)
+        accept_message = self.pushdown.accept_message if self.pushdown else None
+        filter_value = self.pushdown.filter_value if self.pushdown else None
+        if self.dlq is not None:
+            self.dlq.count(messages)
+
+        rows = []
+        for msg in messages:
+            if accept_message is not None and not accept_message(msg, deserialize_key):
+                continue
+
+            value = msg.value()
+            try:
+                if not value:
+                    deserialized_value = {}
+                elif structs is None:
+                    deserialized_value = loads(value)
+                else:
+                    deserialized_value = self._decode_typed(msg.topic(), value)
+                if not isinstance(deserialized_value, dict):
+                    raise ValueError("JSON value is not an object")
+            except Exception:
+                row = self(msg)
+                if row is not None:
+                    rows.append(row)
+                continue
+
+            if filter_value is not None:
+                deserialized_value = filter_value(deserialized_value)
+                if deserialized_value is None:
+                    continue
+
+            if schemas is not None:
+                reason = schemas.check(msg.topic(), deserialized_value)
+                if reason is not None:
+                    self._reject(msg, reason)
+                    continue
+
+            ts = msg.timestamp()[1]
+            rows.append({
+                **deserialized_value,
+                "_kafka": {
+                    "topic": msg.topic(),
+                    "partition": msg.partition(),
+                    "offset": msg.offset(),
+                    "timestamp": ts if ts >= 0 else None,
+                    "key": deserialize_key(msg),
+                },
+            })
+
+        return rows
+
+def create_avro_processor(
+    output_format: str = "rows",
+    pushdown: Optional[RowPushdown] = None,
+    dlq: Optional[DeadLetterQueue] = None,
+) -> AvroMessageProcessor:
     """Factory function to create an Avro message processor"""
-    return AvroMessageProcessor()
+    return AvroMessageProcessor(output_format=output_format, pushdown=pushdown, dlq=dlq)
+
+def create_debezium_processor(
+    pushdown: Optional[RowPushdown] = None, dlq: Optional[DeadLetterQueue] = None
+) -> DebeziumMessageProcessor:
+    """Factory function to create a Debezium change event processor"""
+    return DebeziumMessageProcessor(pushdown=pushdown, dlq=dlq)
 
-def create_json_processor() -> JSONMessageProcessor:
-    return JSONMessageProcessor()
+def create_json_processor(
+    engine: str = "stdlib",
+    structs: Optional[Dict[str, Dict[str, str]]] = None,
+    struct_sample_size: int = 0,
+    schema_sample_size: int = 0,
+    schema_path: Optional[str] = None,
+    pushdown: Optional[RowPushdown] = None,
+    dlq: Optional[DeadLetterQueue] = None,
+) -> JSONMessageProcessor:
+    """Factory function to create a JSON message processor"""
+    return JSONMessageProcessor(
+        engine=engine,
+        structs=structs,
+        struct_sample_size=struct_sample_size,
+        schema_sample_size=schema_sample_size,
+        schema_path=schema_path,
+        pushdown=pushdown,
+        dlq=dlq,
+    )
 
 avro_processor = create_avro_processor
+debezium_processor = create_debezium_processor
 json_processor = create_json_processor
\ No newline at end of file
@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List, Optional, Pattern
+
+from confluent_kafka import Consumer
+from dlt.common import logger
+
+# above this many unknown topics a single cluster-wide listing is cheaper
+# than one `list_topics` request per topic
+SINGLE_TOPIC_FETCH_LIMIT = 8
+
+
+class ClusterMetadataCache:
+    """Topic metadata of a Kafka cluster, shared by discovery and offset tracking.
+
+    Keeps topic names and their partition ids for `ttl` seconds, so a run
+    lists the cluster topics at most once, no matter how many components
+    need them. Regex matches are cached per pattern until the listing
+    expires. Topics which are not listed yet are requested one by one,
+    instead of pulling the metadata of the whole cluster.
+
+    With `snapshot_path` the listing is saved to a JSON file, and loaded
+    back on the next run while it's younger than `ttl`, so repeated runs
+    start warm. With a longer `snapshot_ttl` an older snapshot is loaded
+    too, fresh for `ttl` from loading: runs sharing a snapshot written up
+    front, e.g. by `run_resources`, don't list the cluster again however
+    late they start. Concurrent writers each write a temporary file of
+    their own and replace the snapshot atomically.
+
+    Args:
+        consumer (confluent_kafka.Consumer): Consumer to request metadata with.
+        ttl (float): Seconds for which the metadata is considered fresh.
+        snapshot_path (Optional[str]): Path of the on-disk metadata snapshot.
+        timeout (float): Metadata request timeout, in seconds.
+        snapshot_ttl (Optional[float]): Age, in seconds, up to which the
+            snapshot is loaded. `ttl` if None.
+    """
+
+    def __init__(
+        self,
+        consumer: Consumer,
+        ttl: float = 60.0,
+        snapshot_path: Optional[str] = None,
+        timeout: float = 10.0,
+        snapshot_ttl: Optional[float] = None,
+    ):
+        self._consumer = consumer
+        self._ttl = ttl
+        self._snapshot_path = snapshot_path
+        self._timeout = timeout
+        self._snapshot_ttl = ttl if snapshot_ttl is None else snapshot_ttl
+
+        # topic name -> partition ids, with the time each was fetched at
+        self._partitions: Dict[str, List[int]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        # time of the last cluster-wide listing, None if there's none
+        self._listed_at: Optional[float] = None
+
+        self._patterns: Dict[str, Pattern[str]] = {}
+        self._matches: Dict[str, List[str]] = {}
+
+        if snapshot_path:
+            self._load_snapshot()
+
+    def _is_fresh(self, fetched_at: Optional[float]) -> bool:
+        return fetched_at is not None and time.time() - fetched_at < self._ttl
+
+    def _load_snapshot(self) -> None:
+        try:
+            with open(self._snapshot_path, "r") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable metadata snapshot {self._snapshot_path}: {e}")
+            return
+
+        listed_at = snapshot.get("listed_at")
+        if listed_at is None or time.time() - listed_at >= self._snapshot_ttl:
+            logger.info(f"Metadata snapshot {self._snapshot_path} is stale, ignoring it")
+            return
+
+        # a snapshot older than `ttl`, but not `snapshot_ttl`, is fresh for `ttl` from now
+        loaded_at = listed_at if self._is_fresh(listed_at) else time.time()
+        self._partitions = {t: list(parts) for t, parts in snapshot["topics"].items()}
+        self._fetched_at = dict.fromkeys(self._partitions, loaded_at)
+        self._listed_at = loaded_at
+        logger.info(f"Loaded metadata of {len(self._partitions)} topics from {self._snapshot_path}")
+
+    def _save_snapshot(self) -> None:
+        tmp_path = None
+        try:
+            # a temporary file per writer: processes sharing the snapshot can't interleave
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self._snapshot_path) or ".",
+                prefix=f"{os.path.basename(self._snapshot_path)}.",
+                suffix=".tmp",
+            )
+            with os.fdopen(fd, "w") as f:
+                json.dump({"listed_at": self._listed_at, "topics": self._partitions}, f)
+            os.replace(tmp_path, self._snapshot_path)
+        except OSError as e:
+            logger.warning(f"Failed to save metadata snapshot {self._snapshot_path}: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _list_all(self) -> None:
+        metadata = self._consumer.list_topics(timeout=self._timeout)
+        now = time.time()
+
+        self._partitions = {
+            name: sorted(topic.partitions) for name, topic in metadata.topics.items()
+        }
+        self._fetched_at = dict.fromkeys(self._partitions, now)
+        self._listed_at = now
+        self._matches.clear()
+
+        if self._snapshot_path:
+            self._save_snapshot()
+
+    def _fetch_topic(self, topic_name: str) -> None:
+        topic = self._consumer.list_topics(topic=topic_name, timeout=self._timeout).topics.get(
+            topic_name
+        )
+        if topic is None or topic.error is not None:
+            return
+
+        self._partitions[topic_name] = sorted(topic.partitions)
+        self._fetched_at[topic_name] = time.time()
+
+    def topic_names(self) -> List[str]:
+        """Names of all the cluster topics, listed again once expired."""
+        if not self._is_fresh(self._listed_at):
+            self._list_all()
+        return list(self._partitions)
+
+    def match(self, pattern: str) -> List[str]:
+        """Names of the cluster topics matching the given regex.
+
+        Args:
+            pattern (str): Regex pattern to match topic names from the start.
+
+        Returns:
+            List[str]: Matched topic names.
+        """
+        names = self.topic_names()
+
+        matched = self._matches.get(pattern)
+        if matched is None:
+            compiled = self._patterns.get(pattern)
+            if compiled is None:
+                compiled = self._patterns[pattern] = re.compile(pattern)
+            matched = self._matches[pattern] = [t for t in names if compiled.match(t)]
+
+        return list(matched)
+
+    def partitions(self, topic_names: List[str]) -> Dict[str, List[int]]:
+        """Partition ids of the given topics.
+
+        Only the topics not cached, or expired, are requested. A few are
+        requested one by one, many with a single cluster-wide listing.
+
+        Args:
+            topic_names (List[str]): Names of the topics.
+
+        Returns:
+            Dict[str, List[int]]: Partition ids by topic name.
+
+        Raises:
+            KeyError: A topic doesn't exist.
+        """
+        missing = [t for t in topic_names if not self._is_fresh(self._fetched_at.get(t))]
+        if len(missing) > SINGLE_TOPIC_FETCH_LIMIT:
+            self._list_all()
+        else:
+            for t_name in missing:
+                self._fetch_topic(t_name)
+
+        unknown = [t for t in topic_names if t not in self._partitions]
+        if unknown:
+            raise KeyError(f"Topics not found in the cluster: {unknown}")
+
+        return {t: self._partitions[t] for t in topic_names}
+
+    def invalidate(self) -> None:
+        """Drop the cached metadata, so it's requested again on the next use."""
+        self._partitions.clear()
+        self._fetched_at.clear()
+        self._matches.clear()
+        self._listed_at = None
@@ -0,0 +1,328 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from confluent_kafka import Consumer, Message, TopicPartition
+from dlt.common import logger
+from dlt.common.typing import TDataItems
+
+from .adaptive import AdaptiveBatchController
+from .batching import ByteBudget, process_messages
+from .helpers import OffsetTracker
+from .memory import MemoryGovernor
+
+# (topic, partition, first offset to read, partition maximum offset)
+TPartitionRange = Tuple[str, int, int, int]
+
+_DONE = object()
+
+
+class _PartitionEnd(NamedTuple):
+    # queued by a worker when a partition ends before its range maximum,
+    # on an EOF event or a message past the range, e.g. after offset gaps
+    topic: str
+    partition: int
+
+
+def split_partitions(tracker: OffsetTracker, parallelism: int) -> List[List[TPartitionRange]]:
+    """Split the unread partitions of the tracker into groups for workers.
+
+    Partitions are sorted by the amount of unread messages and dealt out
+    round-robin, so that the heaviest partitions end up on different workers.
+
+    Args:
+        tracker (OffsetTracker): An initialized offset tracker.
+        parallelism (int): Number of groups to split partitions into.
+
+    Returns:
+        List[List[TPartitionRange]]: Non-empty partition groups.
+    """
+    ranges = [
+        (offset.topic, offset.partition, offset.cur + 1, offset.max)
+        for offset in tracker.partitions()
+        if offset.unread
+    ]
+
+    ranges.sort(key=lambda r: r[3] - r[2], reverse=True)
+
+    groups: List[List[TPartitionRange]] = [[] for _ in range(parallelism)]
+    for i, part_range in enumerate(ranges):
+        groups[i % parallelism].append(part_range)
+
+    return [group for group in groups if group]
+
+
+class PartitionWorkerPool:
+    """Consumes partition groups concurrently, one consumer per worker.
+
+    Every worker thread owns a dedicated consumer, assigned to its group
+    of partition ranges in turn, and reads them up to their maximum
+    offsets; messages past a range end are dropped. Processed
+    batches of all the workers are merged into a single bounded queue,
+    which is drained by the thread iterating the pool. Partitions ending
+    before their range maximum are reported to that thread too.
+
+    The message processor is shared by the workers, so it has to be
+    thread-safe: the processors of this package lock their caches.
+
+    Kafka fetching and librdkafka decompression run outside of the GIL,
+    so the workers overlap network, broker and processing time.
+
+    A pool can be run again, e.g. once per cycle of a long-running
+    runner: the worker consumers are kept idle between runs, with their
+    connections and metadata, until `close()`.
+
+    Args:
+        consumer_factory (Callable[[], Consumer]): Creates a new consumer
+            for every worker without an idle one.
+        msg_processor (Callable): A function-converter for every message.
+        batch_size (int): Messages batch size to read at once.
+        batch_timeout (int): Maximum time to wait for a batch consume, in seconds.
+        max_queued_batches (int): Batches buffered before workers are blocked.
+        max_batch_bytes (Optional[int]): Maximum size of a batch's message
+            keys and values.
+        memory_governor (Optional[MemoryGovernor]): Pauses the workers'
+            consumption while the process memory is over its ceiling
+            and queued batches are left to drain.
+        batch_controller (Optional[AdaptiveBatchController]): Tunes the
+            batch size and timeout. Every worker slot gets its own clone,
+            which keeps learning across the groups it reads and the runs
+            of the pool, and the clones are merged back into it after
+            every run.
+    """
+
+    def __init__(
+        self,
+        consumer_factory: Callable[[], Consumer],
+        msg_processor: Callable[[Message], Dict[str, Any]],
+        batch_size: int,
+        batch_timeout: int,
+        max_queued_batches: int = 8,
+        max_batch_bytes: Optional[int] = None,
+        memory_governor: Optional[MemoryGovernor] = None,
+        batch_controller: Optional[AdaptiveBatchController] = None,
+    ):
+        self._consumer_factory = consumer_factory
+        self._msg_processor = msg_processor
+        self._batch_size = batch_size
+        self._batch_timeout = batch_timeout
+        self._max_batch_bytes = max_batch_bytes
+        self._memory_governor = memory_governor
+        self._batch_controller = batch_controller
+        # one controller per worker slot, the workers of a slot never overlap
+        self._controllers: List[AdaptiveBatchController] = []
+        self._max_queued_batches = max_queued_batches
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queued_batches)
+        self._stop = threading.Event()
+        self._idle: List[Consumer] = []
+        self._idle_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close the idle worker consumers."""
+        with self._idle_lock:
+            consumers, self._idle = self._idle, []
+        for consumer in consumers:
+            consumer.close()
+
+    def run(
+        self,
+        groups: List[List[TPartitionRange]],
+        max_workers: Optional[int] = None,
+        on_eof: Optional[Callable[[str, int], None]] = None,
+    ) -> Iterator[Tuple[TDataItems, List[Message]]]:
+        """Read the partition groups with worker threads and yield their batches.
+
+        Args:
+            groups (List[List[TPartitionRange]]): Partition groups, as
+                returned by `split_partitions`. A group must not have two
+                ranges of the same partition.
+            max_workers (Optional[int]): Worker threads, each taking the
+                next group when done with the previous one. A worker
+                per group if None.
+            on_eof (Optional[Callable[[str, int], None]]): Called, from the
+                iterating thread, with the topic and partition of every
+                partition ending before its range maximum, so trackers can
+                skip the offset gaps left at the end, as with serial reads.
+
+        Yields:
+            Tuple[TDataItems, List[Message]]: Processed items and the
+                messages they were produced from.
+        """
+        # batches left by a previous run stopped early are dropped
+        self._queue = queue.Queue(maxsize=self._max_queued_batches)
+        self._stop.clear()
+        pending: "queue.Queue[List[TPartitionRange]]" = queue.Queue()
+        for group in groups:
+            pending.put(group)
+
+        slots = min(max_workers or len(groups), len(groups))
+        if self._batch_controller is not None:
+            self._controllers += [self._batch_controller.clone() for _ in range(slots - len(self._controllers))]
+        workers = [
+            threading.Thread(
+                target=self._work,
+                args=(pending, self._controllers[i] if self._batch_controller else None),
+                name=f"kafka-partition-worker-{i}",
+                daemon=True,
+            )
+            for i in range(slots)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            running = len(workers)
+            while running:
+                item = self._queue.get()
+                if item is _DONE:
+                    running -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                elif isinstance(item, _PartitionEnd):
+                    if on_eof is not None:
+                        on_eof(item.topic, item.partition)
+                else:
+                    yield item
+        finally:
+            self._stop.set()
+            # unblock the workers waiting on a full queue
+            while any(worker.is_alive() for worker in workers):
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if self._batch_controller is not None:
+                # later runs, and serial reads, start from what the workers learned
+                self._batch_controller.merge(self._controllers)
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _work(
+        self,
+        pending: "queue.Queue[List[TPartitionRange]]",
+        controller: Optional[AdaptiveBatchController],
+    ) -> None:
+        try:
+            with self._idle_lock:
+                consumer = self._idle.pop() if self._idle else None
+            if consumer is None:
+                consumer = self._consumer_factory()
+            try:
+                while not self._stop.is_set():
+                    try:
+                        group = pending.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    if not self._read_group(consumer, group, controller):
+                        break
+            except BaseException:
+                consumer.close()
+                raise
+            with self._idle_lock:
+                self._idle.append(consumer)
+        except Exception as e:
+            logger.error(f"Partition worker failed: {e}")
+            self._put(e)
+            return
+
+        self._put(_DONE)
+
+    def _read_group(
+        self,
+        consumer: Consumer,
+        group: List[TPartitionRange],
+        controller: Optional[AdaptiveBatchController],
+    ) -> bool:
+        # [last read, max] per partition, same semantics as OffsetTracker
+        offsets = {(t_name, part): [start - 1, max_] for t_name, part, start, max_ in group}
+        consumer.assign(
+            [TopicPartition(t_name, part, start) for t_name, part, start, _ in group]
+        )
+
+        finished: List[TopicPartition] = []
+        ended: List[_PartitionEnd] = []
+
+        def _finish(topic: str, partition: int) -> None:
+            offset = offsets[(topic, partition)]
+            if offset[0] + 1 < offset[1]:
+                offset[0] = offset[1] - 1
+                finished.append(TopicPartition(topic, partition))
+                ended.append(_PartitionEnd(topic, partition))
+
+        def _unread() -> List[TopicPartition]:
+            return [
+                TopicPartition(t_name, part)
+                for (t_name, part), (cur, max_) in offsets.items()
+                if cur + 1 < max_
+            ]
+
+        budget = ByteBudget(self._max_batch_bytes)
+        batch_size, batch_timeout = self._batch_size, self._batch_timeout
+        try:
+            while not self._stop.is_set():
+                remaining = sum(max(max_ - cur - 1, 0) for cur, max_ in offsets.values())
+                if not remaining:
+                    break
+
+                if self._memory_governor is not None:
+                    # the iterating thread frees memory while it takes queued batches
+                    self._memory_governor.throttle(consumer, _unread, draining=lambda: not self._queue.empty())
+
+                if controller is not None:
+                    batch_size, batch_timeout = controller.batch_size, controller.batch_timeout
+
+                requested = budget.limit(min(batch_size, remaining))
+                started = time.perf_counter()
+                messages = consumer.consume(requested, timeout=batch_timeout)
+                consume_seconds = time.perf_counter() - started
+                if not messages:
+                    break
+
+                # messages past the range end belong to the next range or run
+                in_range = []
+                for msg in messages:
+                    if msg.error() is None and msg.offset() >= offsets[(msg.topic(), msg.partition())][1]:
+                        _finish(msg.topic(), msg.partition())
+                    else:
+                        in_range.append(msg)
+
+                decode_seconds = 0.0
+                for chunk in budget.split(in_range):
+                    started = time.perf_counter()
+                    batch, consumed = process_messages(chunk, self._msg_processor, _finish)
+                    for msg in consumed:
+                        offset = offsets[(msg.topic(), msg.partition())]
+                        was_unread = offset[0] + 1 < offset[1]
+                        offset[0] = msg.offset()
+                        if was_unread and offset[0] + 1 >= offset[1]:
+                            finished.append(TopicPartition(msg.topic(), msg.partition()))
+
+                    decode_seconds += time.perf_counter() - started
+                    if consumed and not self._put((batch, consumed)):
+                        return False
+
+                # after the batches, which may hold the last messages of the partitions
+                if finished:
+                    consumer.pause(finished)
+                    finished.clear()
+                for end in ended:
+                    if not self._put(end):
+                        return False
+                ended.clear()
+
+                if controller is not None:
+                    controller.record(requested, messages, consume_seconds, decode_seconds)
+        finally:
+            # leave the consumer ready for the next group, or run
+            consumer.resume(consumer.assignment())
+            consumer.unassign()
+        return True
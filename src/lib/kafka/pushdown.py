@@ -0,0 +1,195 @@
+import operator
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from confluent_kafka import Message
+
+
+def _ordered(op: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    # missing values, and values of another type, never pass an ordering comparison
+    def compare(a: Any, b: Any) -> bool:
+        try:
+            return a is not None and op(a, b)
+        except TypeError:
+            return False
+
+    return compare
+
+
+WHERE_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": _ordered(operator.gt),
+    ">=": _ordered(operator.ge),
+    "<": _ordered(operator.lt),
+    "<=": _ordered(operator.le),
+    # the values are normalized into tuples, which compare members by equality
+    "in": lambda a, b: a in b,
+    "not_in": lambda a, b: a not in b,
+}
+
+MEMBERSHIP_OPS = ("in", "not_in")
+ORDERING_OPS = (">", ">=", "<", "<=")
+
+# `where` fields read from the message itself, before the value is decoded
+MESSAGE_FIELDS = ("topic", "partition", "key")
+HEADER_PREFIX = "header."
+KEY_PREFIX = "key."
+
+
+def _is_message_field(field: str) -> bool:
+    return field in MESSAGE_FIELDS or field.startswith((HEADER_PREFIX, KEY_PREFIX))
+
+
+def _headers(msg: Message) -> Dict[str, Optional[str]]:
+    return {
+        name: value.decode("utf-8", errors="replace") if value is not None else None
+        for name, value in msg.headers() or []
+    }
+
+
+def _key_field(key: Any, name: str) -> Any:
+    return key.get(name) if isinstance(key, dict) else None
+
+
+def check_condition(field: Any, op: str, value: Any) -> None:
+    """Check the shape of a `where` condition.
+
+    Raises:
+        ValueError: Unknown op, a membership op without a list of values
+            or an ordering op without a value.
+    """
+    if not isinstance(field, str) or not field:
+        raise ValueError(f"Where field must be a non-empty string, got {field!r}")
+    if op not in WHERE_OPS:
+        raise ValueError(f"Unknown where op: {op}. Expected one of {tuple(WHERE_OPS)}")
+    if op in MEMBERSHIP_OPS and not isinstance(value, (list, tuple, set, frozenset)):
+        raise ValueError(f"Where op {op} on {field} needs a list of values, got {value!r}")
+    if op in ORDERING_OPS and value is None:
+        raise ValueError(f"Where op {op} on {field} needs a value")
+
+
+def _message_operand(field: str) -> Callable[[Message, Dict[str, Optional[str]], Any], Any]:
+    # operands read from the message, its decoded headers and its decoded key
+    if field == "topic":
+        return lambda msg, headers, key: msg.topic()
+    if field == "partition":
+        return lambda msg, headers, key: msg.partition()
+    if field == "key":
+        return lambda msg, headers, key: key
+    name = field.split(".", 1)[1]
+    if field.startswith(KEY_PREFIX):
+        return lambda msg, headers, key: _key_field(key, name)
+    return lambda msg, headers, key: headers.get(name)
+
+
+class RowPushdown:
+    """A resource `select` projection and `where` filter, compiled once.
+
+    `where` conditions are ANDed and checked when the pushdown is built.
+    Conditions on the message topic, partition, key (`key`, or
+    `key.<field>` of record keys) and headers (`header.<name>`, compared
+    as UTF-8 strings) are compiled into `accept_message`, which processors
+    call before decoding the value. Conditions on top-level value fields
+    and the `select` projection are compiled into `filter_value`, a single
+    function returning the projected value, or None for a filtered out
+    message. Missing fields and headers are None, which only equality
+    and membership conditions can match.
+
+    `decode_fields` are the value fields processors have to decode: the
+    selected ones and the ones the conditions read, decoders skip the
+    others where their format allows.
+
+    Args:
+        select (Optional[List[str]]): Top-level value fields to keep,
+            all if None.
+        where (Optional[List[Dict[str, Any]]]): Conditions, each with a
+            `field`, an `op` (see `WHERE_OPS`, "==" by default) and a `value`.
+    """
+
+    def __init__(
+        self,
+        select: Optional[List[str]] = None,
+        where: Optional[List[Dict[str, Any]]] = None,
+    ):
+        conditions = []
+        for condition in where or []:
+            field, op, value = condition.get("field"), condition.get("op", "=="), condition.get("value")
+            check_condition(field, op, value)
+            if op in MEMBERSHIP_OPS:
+                value = tuple(value)
+            conditions.append((field, WHERE_OPS[op], value))
+
+        message_conditions = [c for c in conditions if _is_message_field(c[0])]
+        value_conditions = [c for c in conditions if not _is_message_field(c[0])]
+
+        self.select = list(select) if select else None
+        self.decode_fields: Optional[List[str]] = None
+        if self.select is not None:
+            self.decode_fields = list(dict.fromkeys(self.select + [field for field, _, _ in value_conditions]))
+
+        # the key conditions decode message keys, which processors then reuse for the rows
+        self.reads_key = any(field == "key" or field.startswith(KEY_PREFIX) for field, _, _ in message_conditions)
+        self.accept_message = self._build_message(message_conditions) if message_conditions else None
+        self.filter_value = (
+            self._build_value(value_conditions) if value_conditions or self.select else None
+        )
+
+    def batch_key_decoder(self, decode_key: Callable[[Message], Any]) -> Callable[[Message], Any]:
+        """Key decoder for the messages of a batch.
+
+        When `accept_message` reads the keys, every key is decoded once,
+        for the conditions and for the rows.
+
+        Args:
+            decode_key (Callable[[Message], Any]): Key deserializer.
+
+        Returns:
+            Callable[[Message], Any]: Key deserializer, to use for one batch only.
+        """
+        if not self.reads_key:
+            return decode_key
+
+        # by message identity: the batch holds on to its messages
+        keys: Dict[int, Any] = {}
+
+        def decode_batch_key(msg: Message) -> Any:
+            try:
+                return keys[id(msg)]
+            except KeyError:
+                key = keys[id(msg)] = decode_key(msg)
+                return key
+
+        return decode_batch_key
+
+    def _build_message(
+        self, conditions: List[Tuple[str, Callable[[Any, Any], bool], Any]]
+    ) -> Callable[[Message, Callable[[Message], Any]], bool]:
+        checks = [(_message_operand(field), op, value) for field, op, value in conditions]
+        # headers and keys are read once, only when a condition needs them
+        reads_headers = any(field.startswith(HEADER_PREFIX) for field, _, _ in conditions)
+        reads_key = self.reads_key
+
+        def accept_message(msg: Message, decode_key: Callable[[Message], Any]) -> bool:
+            headers = _headers(msg) if reads_headers else None
+            key = decode_key(msg) if reads_key else None
+            for operand, op, value in checks:
+                if not op(operand(msg, headers, key), value):
+                    return False
+            return True
+
+        return accept_message
+
+    def _build_value(
+        self, conditions: List[Tuple[str, Callable[[Any, Any], bool], Any]]
+    ) -> Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        select = self.select
+
+        def filter_value(value: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            for field, op, expected in conditions:
+                if not op(value.get(field), expected):
+                    return None
+            if select is None:
+                return value
+            return {f: value[f] for f in select if f in value}
+
+        return filter_value
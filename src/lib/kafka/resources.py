@@ -1,18 +1,118 @@
 import dlt
-from contextlib import closing
-from typing import Any, Callable, Dict, Iterable, List, Optional, Union, Type
+import time
+from contextlib import closing, contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union, Type
 from confluent_kafka import Consumer, Message, KafkaError
+from confluent_kafka.admin import AdminClient
 from dlt.common import logger
-from dlt.common.typing import TDataItem, TAnyDateTime
+from dlt.common.typing import TDataItem, TDataItems, TAnyDateTime
 from dlt.common.time import ensure_pendulum_datetime
 
+from .adaptive import AdaptiveBatchController
+from .backfill import TOffsetBound, chunk_ranges, resolve_backfill_ranges
+from .batching import OUTPUT_FORMATS, ByteBudget, TopicTableRouter, group_by_topic, process_messages
 from .discovery import resolve_topics_regex
+from .memory import MemoryGovernor
+from .metadata import ClusterMetadataCache
+from .parallel import PartitionWorkerPool, split_partitions
 from .tracking import CustomOffsetTracker
-from .helpers import KafkaCredentials, default_msg_processor, OffsetTracker
+from .helpers import KafkaCredentials, default_msg_processor, OffsetTracker, partition_shard
+
+def _enhanced_table_name(topic: str) -> str:
+    return topic.replace(".", "_")
+
+
+@contextmanager
+def _released(consumer: Consumer) -> Iterator[Consumer]:
+    # leave the consumer open, but without paused partitions
+    # or an assignment, ready for the next run
+    try:
+        yield consumer
+    finally:
+        consumer.resume(consumer.assignment())
+        consumer.unassign()
+
+
+def _bind_state(msg_processor: Any) -> None:
+    # processors keeping data across runs, e.g. inferred schemas,
+    # implement `bind_state` to keep it in the resource state
+    bind_state = getattr(msg_processor, "bind_state", None)
+    if bind_state is not None:
+        bind_state(dlt.current.resource_state())
+
+
+class _BatchFormatter:
+    """Routes processed batches to their tables.
+
+    Items are routed to tables by topic, as Arrow tables can't go through
+    a dynamic `table_name` hint. Processors implementing `table_hints(topic)`
+    get their hints attached to the topic table the first time and whenever
+    they change. Rows of processors implementing `drain_rejects()` go to
+    the `<table>_rejects` table of their topic, as do the rows left out of
+    the Arrow output for a value of another type than the rest of its
+    column. The dead letter queue of a processor (its `dlq`, see
+    `DeadLetterQueue`) is flushed after every batch, before the batch
+    offsets can be saved.
+    """
+
+    def __init__(self, msg_processor: Any, output_format: str, table_name: Callable[[str], str]):
+        self._output_format = output_format
+        self._table_name = table_name
+        self._table_hints = getattr(msg_processor, "table_hints", None)
+        self._drain_rejects = getattr(msg_processor, "drain_rejects", None)
+        self._dlq = getattr(msg_processor, "dlq", None)
+        self._attached: Dict[str, Any] = {}
+
+    def _changed_hints(self, topic: str) -> Optional[Dict[str, Any]]:
+        if self._table_hints is None:
+            return None
+        hints = self._table_hints(topic)
+        if hints is None or self._attached.get(topic) is hints:
+            return None
+        self._attached[topic] = hints
+        return hints
+
+    def _routed(self, items: TDataItems, topic: str, nested: bool = True) -> TDataItems:
+        hints = self._changed_hints(topic)
+        if hints is None:
+            return dlt.mark.with_table_name(items, self._table_name(topic))
+        if not nested:
+            # Arrow tables keep nested values in place, without nested tables
+            hints = {k: v for k, v in hints.items() if k != "nested_hints"}
+        # a table variant keeps the hints for the following batches of the table
+        return dlt.mark.with_hints(
+            items,
+            dlt.mark.make_hints(table_name=self._table_name(topic), **hints),
+            create_table_variant=True,
+        )
+
+    def __call__(self, batch: TDataItems) -> Iterator[TDataItems]:
+        rejects: List[Dict[str, Any]] = []
+        is_rows = isinstance(batch, list) and (not batch or isinstance(batch[0], dict))
+        if self._output_format == "rows" and is_rows:
+            for topic, rows in group_by_topic(batch).items():
+                yield self._routed(rows, topic)
+        else:
+            from .arrow import to_topic_tables
+
+            tables, rejects = to_topic_tables(batch)
+            for topic, table in tables.items():
+                yield self._routed(table, topic, nested=False)
+
+        if self._drain_rejects is not None:
+            rejects.extend(self._drain_rejects())
+        for topic, rows in group_by_topic(rejects).items():
+            yield dlt.mark.with_table_name(rows, f"{self._table_name(topic)}_rejects")
+
+        if self._dlq is not None:
+            self._dlq.flush()
+            dead_letters = self._dlq.drain_rows()
+            if dead_letters:
+                yield dlt.mark.with_table_name(dead_letters, self._dlq.table_name)
+
 
 @dlt.resource(
     name="kafka_messages",
-    table_name=lambda msg: msg["_kafka"]["topic"],
     standalone=True,
 )
 def kafka_consumer(
@@ -24,6 +124,8 @@ def kafka_consumer(
     batch_size: Optional[int] = 3000,
     batch_timeout: Optional[int] = 3,
     start_from: Optional[TAnyDateTime] = None,
+    output_format: str = "rows",
+    table_mapping: Optional[Dict[str, str]] = None,
 ) -> Iterable[TDataItem]:
     """Extract recent messages from the given Kafka topics.
 
@@ -39,12 +141,18 @@ def kafka_consumer(
             is taken from secrets.
         msg_processor(Optional[Callable]): A function-converter,
             which'll process every Kafka message after it's read and
-            before it's transferred to the destination.
+            before it's transferred to the destination. Processors
+            implementing `process_batch` get the whole batch at once.
         batch_size (Optional[int]): Messages batch size to read at once.
         batch_timeout (Optional[int]): Maximum time to wait for a batch
             consume, in seconds.
         start_from (Optional[TAnyDateTime]): A timestamp, at which to start
             reading. Older messages are ignored.
+        output_format (str): "rows" to yield lists of dicts, "arrow" to yield
+            every batch as one Arrow table per topic, which lets dlt skip
+            per-row normalization.
+        table_mapping (Optional[Dict[str, str]]): Table names by topic
+            name, unmapped topics are saved in tables named after them.
 
     Yields:
         Iterable[TDataItem]: Kafka messages.
@@ -64,35 +172,139 @@ def kafka_consumer(
             )
         )
 
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+
     if start_from is not None:
         start_from = ensure_pendulum_datetime(start_from)
 
     tracker = OffsetTracker(consumer, topics, dlt.current.resource_state(), start_from)
+    format_batch = _BatchFormatter(msg_processor, output_format, TopicTableRouter(table_mapping))
+    _bind_state(msg_processor)
 
     # read messages up to the maximum offsets,
     # not waiting for new messages
     with closing(consumer):
         while tracker.has_unread:
-            messages = consumer.consume(batch_size, timeout=batch_timeout)
+            # don't wait for more messages than there are left to read
+            messages = consumer.consume(
+                min(batch_size, tracker.remaining), timeout=batch_timeout
+            )
             if not messages:
                 break
 
-            batch = []
-            for msg in messages:
-                if msg.error():
-                    err = msg.error()
-                    if err.retriable() or not err.fatal():
-                        logger.warning(f"ERROR: {err} - RETRYING")
-                    else:
-                        raise err
-                else:
-                    batch.append(msg_processor(msg))
-                    tracker.renew(msg)
+            batch, consumed = process_messages(messages, msg_processor, tracker.mark_eof)
+            tracker.renew_batch(consumed)
+            tracker.pause_finished()
+
+            yield from format_batch(batch)
+
+def read_batches(
+    consumer: Consumer,
+    tracker: OffsetTracker,
+    msg_processor: Callable[[Message], Dict[str, Any]],
+    batch_size: int,
+    batch_timeout: int,
+    output_format: str = "rows",
+    parallelism: int = 1,
+    consumer_factory: Optional[Callable[[], Consumer]] = None,
+    max_batch_bytes: Optional[int] = None,
+    memory_governor: Optional[MemoryGovernor] = None,
+    batch_controller: Optional[AdaptiveBatchController] = None,
+    table_mapping: Optional[Dict[str, str]] = None,
+    worker_pool: Optional[PartitionWorkerPool] = None,
+) -> Iterator[List[TDataItems]]:
+    """Read the partitions assigned by an offset tracker up to their maximum offsets.
+
+    Moves the tracker offsets, and so its state, as the batches are read.
+
+    Args:
+        consumer (confluent_kafka.Consumer): Consumer the tracker assigned
+            the partitions to.
+        tracker (OffsetTracker): Tracker of the partitions to read.
+        msg_processor (Callable): A function-converter for every message.
+        batch_size (int): Messages batch size to read at once.
+        batch_timeout (int): Maximum time to wait for a batch consume, in seconds.
+        output_format (str): "rows" or "arrow", see `enhanced_kafka_consumer`.
+        parallelism (int): Worker consumers to split the partitions across.
+        consumer_factory (Optional[Callable]): Creates the worker consumers.
+        max_batch_bytes (Optional[int]): Maximum size of a yielded batch's
+            message keys and values.
+        memory_governor (Optional[MemoryGovernor]): Pauses consumption
+            while the process memory is over its ceiling and the batches
+            yielded so far are drained by another thread.
+        batch_controller (Optional[AdaptiveBatchController]): Tunes the
+            batch size and timeout, overriding the static ones.
+        table_mapping (Optional[Dict[str, str]]): Table names by topic name,
+            see `enhanced_kafka_consumer`.
+        worker_pool (Optional[PartitionWorkerPool]): Pool to read with when
+            `parallelism` > 1, kept open for later calls. Its own settings
+            are used instead of the consumption ones given here. A pool is
+            created, and closed, for the call if None.
+
+    Yields:
+        List[TDataItems]: Items of every batch, marked with their table names.
+    """
+    format_batch = _BatchFormatter(
+        msg_processor, output_format, TopicTableRouter(table_mapping, _enhanced_table_name)
+    )
+    if parallelism > 1:
+        # hand the partitions over to the workers' consumers
+        consumer.unassign()
+        groups = split_partitions(tracker, parallelism)
+        logger.info(f"Consuming {sum(map(len, groups))} partitions with {len(groups)} workers")
+
+        pool = worker_pool or PartitionWorkerPool(
+            consumer_factory,
+            msg_processor,
+            batch_size,
+            batch_timeout,
+            max_batch_bytes=max_batch_bytes,
+            memory_governor=memory_governor,
+            batch_controller=batch_controller,
+        )
+        try:
+            for batch, consumed in pool.run(groups, on_eof=tracker.mark_eof):
+                tracker.renew_batch(consumed)
+
+                yield list(format_batch(batch))
+        finally:
+            if worker_pool is None:
+                pool.close()
+    else:
+        budget = ByteBudget(max_batch_bytes)
+        while tracker.has_unread:
+            if memory_governor is not None:
+                memory_governor.throttle(consumer, tracker.unread_partitions)
+
+            if batch_controller is not None:
+                batch_size = batch_controller.batch_size
+                batch_timeout = batch_controller.batch_timeout
+
+            # don't wait for more messages than there are left to read
+            requested = budget.limit(min(batch_size, tracker.remaining))
+            started = time.perf_counter()
+            messages = consumer.consume(requested, timeout=batch_timeout)
+            consume_seconds = time.perf_counter() - started
+            if not messages:
+                break
+
+            decode_seconds = 0.0
+            for chunk in budget.split(messages):
+                started = time.perf_counter()
+                batch, consumed = process_messages(chunk, msg_processor, tracker.mark_eof)
+                tracker.renew_batch(consumed)
+                tracker.pause_finished()
+
+                items = list(format_batch(batch))
+                decode_seconds += time.perf_counter() - started
+                yield items
+
+            if batch_controller is not None:
+                batch_controller.record(requested, messages, consume_seconds, decode_seconds)
 
-            yield batch
 
 @dlt.resource(
-    table_name=lambda msg: msg["_kafka"]["topic"].replace(".", "_"),
     standalone=True,
     parallelized=True
 )
@@ -105,24 +317,87 @@ def enhanced_kafka_consumer(
     batch_size: Optional[int] = 3000,
     batch_timeout: Optional[int] = 3,
     start_from: Optional[TAnyDateTime] = None,
+    parallelism: int = 1,
+    consumer_factory: Optional[Callable[[], Consumer]] = None,
+    output_format: str = "rows",
+    admin_client: Optional[AdminClient] = None,
+    metadata_cache: Optional[ClusterMetadataCache] = None,
+    close_consumer: bool = True,
+    max_batch_bytes: Optional[int] = None,
+    max_rss_mb: Optional[int] = None,
+    batch_controller: Optional[AdaptiveBatchController] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    table_mapping: Optional[Dict[str, str]] = None,
+    worker_pool: Optional[PartitionWorkerPool] = None,
 ) -> Iterable[TDataItem]:
     """
     Enhanced Kafka consumer with advanced features:
     - Regex topic discovery
     - Custom offset tracking for dynamic topics
     - Flexible credential system (Consumer, BaseKafkaCredentials, KafkaCredentials, or dict)
-    - Configurable message processors
+    - Configurable message processors, called once per batch when they
+      implement `process_batch` (see `BatchMessageProcessor`)
+    - Partition-parallel consumption: with `parallelism` > 1 the partitions
+      assigned by the offset tracker are split across worker consumers
+      created by `consumer_factory` (defaults to `credentials.init_consumer`),
+      or by the given `worker_pool`, which keeps them open across runs
+    - Arrow output: with `output_format="arrow"` every batch is yielded as
+      one Arrow table per topic, with flattened `_kafka__*` metadata columns
+    - End-of-partition aware termination: partitions are paused as soon as they
+      reach the high watermarks read at start, and the run returns once all
+      of them are done instead of waiting for `batch_timeout`
+    - Bulk offset resolution at startup: watermarks and timestamp offsets of
+      all the partitions are resolved at once, through `admin_client`
+      `list_offsets` requests when given, concurrently otherwise
+    - Shared cluster metadata: discovery and offset tracking read topics
+      through one `metadata_cache` (see `ClusterMetadataCache`), created per
+      run unless given, and use the same consumer; a custom `offset_tracker`
+      gets the `metadata` argument only when a cache is given
+    - Reusable consumer: with `close_consumer=False` the consumer is left open
+      and unassigned after the run, so long-running callers can keep it warm
+    - Memory bounds: `max_batch_bytes` bounds every yielded batch by the size
+      of its messages, and with `max_rss_mb` garbage is collected once the
+      process RSS is over the ceiling, and parallel workers are paused while
+      their queued batches drain (see `MemoryGovernor`)
+    - Adaptive batching: a `batch_controller` tunes the batch size and timeout
+      from the measured consume and decode times (see `AdaptiveBatchController`)
+    - Partition sharding: with `shard=(i, N)` only the partitions owned by shard
+      `i` of `N` are read (see `partition_shard`), so N replicas with their own
+      pipeline states can split a resource without coordination
+    - Per-topic table routing: every batch is grouped by topic and each group
+      is saved in the table `table_mapping` gives for its topic, or named after
+      the topic with dots replaced; names are resolved once per topic
+    - Precomputed table schemas: processors implementing `table_hints(topic)`
+      (e.g. Avro, from the registry schemas, or JSON, inferred from a sample)
+      get their column hints attached to the topic table, once and again
+      whenever they change; rows they reject go to `<table>_rejects` tables
+    - Dead letter queue: messages that processors with a `dlq` fail to decode
+      are flushed to its sink (a Kafka topic, a file or a table) after every
+      batch, and the run aborts once a topic error ratio passes its limit
     """
 
     try:
+        try:
+            if isinstance(credentials, Consumer):
+                consumer = credentials
+            elif isinstance(credentials, KafkaCredentials):
+                consumer = credentials.init_consumer()
+            else:
+                raise TypeError("Credentials must be Consumer, BaseKafkaCredentials, KafkaCredentials, or dict")
+        
+        except Exception as e:
+            logger.error(f"Failed to create Kafka consumer: {e}")
+            logger.info("Check credentials and Kafka broker connectivity")
+            raise
+
+        # discovery and offset tracking share one metadata listing, custom
+        # offset trackers get it only when configured, like the admin client
+        if metadata_cache is None and offset_tracker is CustomOffsetTracker:
+            metadata_cache = ClusterMetadataCache(consumer)
+
         if topics_regex:
             try:
-                if isinstance(credentials, Consumer):
-                    discovery_consumer = credentials
-                else:
-                    discovery_consumer = credentials.init_consumer()
-                
-                discovered_topics = resolve_topics_regex(discovery_consumer, topics_regex)
+                discovered_topics = resolve_topics_regex(consumer, topics_regex, metadata_cache)
 
                 if not discovered_topics:
                     msg = f"No topics found matching pattern: {topics_regex}"
@@ -143,25 +418,28 @@ def enhanced_kafka_consumer(
         # Ensure topics is a list
         if isinstance(topics, str):
             topics = [topics]
-        
-        try:
-            if isinstance(credentials, Consumer):
-                consumer = credentials
-            elif isinstance(credentials, KafkaCredentials):
-                consumer = credentials.init_consumer()
+
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+        if shard is not None and not 0 <= shard[0] < shard[1]:
+            raise ValueError(f"Invalid shard {shard[0]}/{shard[1]}: index must be in [0, count)")
+
+        if parallelism > 1 and consumer_factory is None and worker_pool is None:
+            if isinstance(credentials, KafkaCredentials):
+                consumer_factory = credentials.init_consumer
             else:
-                raise TypeError("Credentials must be Consumer, BaseKafkaCredentials, KafkaCredentials, or dict")
-        
-        except Exception as e:
-            logger.error(f"Failed to create Kafka consumer: {e}")
-            logger.info("Check credentials and Kafka broker connectivity")
-            raise
+                raise ValueError("consumer_factory is required for parallelism > 1 with a Consumer instance")
+
+        if admin_client is None and isinstance(credentials, KafkaCredentials):
+            admin_client = credentials.init_admin_client()
 
         if msg_processor is None:
             logger.warning("No message processor provided, falling back to default")
             msg_processor = default_msg_processor
 
         logger.info(f"Using message processor: {msg_processor.__class__.__name__}")
+        _bind_state(msg_processor)
 
         if start_from is not None:
             start_from = ensure_pendulum_datetime(start_from)
@@ -169,32 +447,184 @@ def enhanced_kafka_consumer(
         
         # Use the configurable offset tracker
         try:
-            tracker = offset_tracker(consumer, topics, dlt.current.resource_state(), start_from)
+            tracker_kwargs = {}
+            if metadata_cache is not None:
+                tracker_kwargs["metadata"] = metadata_cache
+            if admin_client is not None:
+                tracker_kwargs["admin_client"] = admin_client
+            if shard is not None:
+                tracker_kwargs["shard"] = shard
+            tracker = offset_tracker(
+                consumer, topics, dlt.current.resource_state(), start_from, **tracker_kwargs
+            )
             logger.info("Offset tracker initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize offset tracker: {e}")
             logger.info("Check topic permissions and partition access")
             raise
 
-        with closing(consumer):
-            while tracker.has_unread:
-                messages = consumer.consume(batch_size, timeout=batch_timeout)
-                if not messages:
-                    break
-
-                batch = []
-                for msg in messages:
-                    if msg.error():
-                        err = msg.error()
-                        if err.retriable() or not err.fatal():
-                            logger.warning(f"ERROR: {err} - RETRYING")
-                        else:
-                            raise err
-                    else:
-                        batch.append(msg_processor(msg))
-                        tracker.renew(msg)
-
-                yield batch
+        with closing(consumer) if close_consumer else _released(consumer):
+            for items in read_batches(
+                consumer,
+                tracker,
+                msg_processor,
+                batch_size,
+                batch_timeout,
+                output_format,
+                parallelism,
+                consumer_factory,
+                max_batch_bytes,
+                MemoryGovernor(max_rss_mb) if max_rss_mb else None,
+                batch_controller,
+                table_mapping,
+                worker_pool,
+            ):
+                yield from items
+
+        key_format_stats = getattr(msg_processor, "key_format_stats", None)
+        if key_format_stats:
+            logger.info(f"Detected key formats: {key_format_stats}")
+        dlq = getattr(msg_processor, "dlq", None)
+        if dlq is not None:
+            logger.info(f"Dead letters by topic: {dlq.stats}")
     except Exception as e:
         logger.error(f"Enhanced Kafka consumer failed: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _advance_state_offsets(ranges: List[Tuple[str, int, int, int]]) -> None:
+    # move the incremental offsets over the backfilled ranges, unless
+    # that would skip messages between the saved offsets and the range
+    state = dlt.current.resource_state().setdefault("offsets", {})
+    for t_name, part, start, end in ranges:
+        topic_state = state.setdefault(t_name, {})
+        cur = topic_state.get(str(part))
+        if cur is not None and start > cur + 1:
+            logger.warning(
+                f"Backfill of {t_name}[{part}] starts at {start}, after the saved offset {cur}, "
+                "the saved offset is kept"
+            )
+            continue
+        topic_state[str(part)] = max(end - 1, -1 if cur is None else cur)
+
+
+@dlt.resource(
+    name="kafka_backfill",
+    standalone=True,
+)
+def kafka_backfill(
+    topics: Optional[Union[str, List[str]]] = None,
+    topics_regex: Optional[str] = None,
+    credentials: Union[KafkaCredentials, Consumer] = dlt.secrets.value,
+    msg_processor: Optional[Callable[[Message], Dict[str, Any]]] = default_msg_processor,
+    start: TOffsetBound = 0,
+    end: Optional[TOffsetBound] = None,
+    chunk_size: int = 100000,
+    max_workers: int = 4,
+    batch_size: Optional[int] = 3000,
+    batch_timeout: Optional[int] = 3,
+    consumer_factory: Optional[Callable[[], Consumer]] = None,
+    output_format: str = "rows",
+    admin_client: Optional[AdminClient] = None,
+    metadata_cache: Optional[ClusterMetadataCache] = None,
+    max_batch_bytes: Optional[int] = None,
+    max_rss_mb: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    table_mapping: Optional[Dict[str, str]] = None,
+) -> Iterable[TDataItem]:
+    """Read an offset or time range of the given Kafka topics in parallel.
+
+    `start` and `end` are resolved into offsets of every partition, as
+    offsets or through the timestamp lookups `OffsetTracker` uses for
+    `start_from`. Partitions are split into chunks of `chunk_size` offsets,
+    which `max_workers` worker consumers read concurrently.
+
+    Once all the chunks are read, the offsets in the resource state are
+    moved to the range ends, so an `enhanced_kafka_consumer` with the same
+    resource name continues after the backfill. Saved offsets are never
+    moved back, nor over messages before the range start.
+
+    Args:
+        topics (Optional[Union[str, List[str]]]): Names of topics to read.
+        topics_regex (Optional[str]): Pattern of topics to read, instead of `topics`.
+        credentials (Union[KafkaCredentials, Consumer]): Auth credentials or
+            an initiated Kafka consumer, used to resolve the offsets.
+        msg_processor (Optional[Callable]): A function-converter for every message.
+        start (TOffsetBound): First offset, or timestamp, to read.
+        end (Optional[TOffsetBound]): Offset, or timestamp, to stop before.
+            The high watermarks at start if None.
+        chunk_size (int): Maximum offsets of a partition read by one worker at once.
+        max_workers (int): Worker consumers reading the chunks.
+        batch_size (Optional[int]): Messages batch size to read at once.
+        batch_timeout (Optional[int]): Maximum time to wait for a batch consume, in seconds.
+        consumer_factory (Optional[Callable]): Creates the worker consumers,
+            `credentials.init_consumer` by default.
+        output_format (str): "rows" or "arrow", see `enhanced_kafka_consumer`.
+        admin_client (Optional[AdminClient]): Admin client to resolve offsets in bulk.
+        metadata_cache (Optional[ClusterMetadataCache]): Cluster metadata to read topics from.
+        max_batch_bytes (Optional[int]): Maximum size of a batch's message keys and values.
+        max_rss_mb (Optional[int]): Process RSS ceiling to pause consumption over.
+        shard (Optional[Tuple[int, int]]): Shard index and shards count,
+            to read only the partitions owned by the shard.
+        table_mapping (Optional[Dict[str, str]]): Table names by topic name,
+            see `enhanced_kafka_consumer`.
+
+    Yields:
+        Iterable[TDataItem]: Kafka messages.
+    """
+    if isinstance(credentials, Consumer):
+        consumer = credentials
+    elif isinstance(credentials, KafkaCredentials):
+        consumer = credentials.init_consumer()
+        consumer_factory = consumer_factory or credentials.init_consumer
+        if admin_client is None:
+            admin_client = credentials.init_admin_client()
+    else:
+        raise TypeError("Credentials must be Consumer or KafkaCredentials")
+
+    if consumer_factory is None:
+        raise ValueError("consumer_factory is required with a Consumer instance")
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    with closing(consumer):
+        if metadata_cache is None:
+            metadata_cache = ClusterMetadataCache(consumer)
+
+        if topics_regex:
+            topics = resolve_topics_regex(consumer, topics_regex, metadata_cache)
+        elif topics is None:
+            raise ValueError("You must provide either topics or topics_regex")
+        if isinstance(topics, str):
+            topics = [topics]
+
+        partitions = {
+            t_name: [
+                part
+                for part in parts
+                if shard is None or partition_shard(t_name, part, shard[1]) == shard[0]
+            ]
+            for t_name, parts in metadata_cache.partitions(topics).items()
+        }
+        ranges = resolve_backfill_ranges(consumer, partitions, start, end, admin_client)
+
+    chunks = chunk_ranges(ranges, chunk_size)
+    format_batch = _BatchFormatter(
+        msg_processor, output_format, TopicTableRouter(table_mapping, _enhanced_table_name)
+    )
+    _bind_state(msg_processor)
+    if chunks:
+        logger.info(f"Backfilling {len(chunks)} chunks with {min(max_workers, len(chunks))} workers")
+        pool = PartitionWorkerPool(
+            consumer_factory,
+            msg_processor or default_msg_processor,
+            batch_size,
+            batch_timeout,
+            max_batch_bytes=max_batch_bytes,
+            memory_governor=MemoryGovernor(max_rss_mb) if max_rss_mb else None,
+        )
+        for batch, _ in pool.run([[chunk] for chunk in chunks], max_workers=max_workers):
+            yield from format_batch(batch)
+
+    _advance_state_offsets(ranges)
@@ -1,12 +1,13 @@
-from confluent_kafka import Consumer, Message, TopicPartition
-from confluent_kafka.admin import AdminClient, TopicMetadata
-from typing import Any, Dict, List
+from confluent_kafka import Consumer
+from confluent_kafka.admin import AdminClient
+from typing import List, Tuple
 
 from dlt.common import pendulum
 from dlt.common.typing import DictStrAny
 
 # Import DLT's original OffsetTracker
 from .helpers import OffsetTracker
+from .metadata import ClusterMetadataCache
 
 class CustomOffsetTracker(OffsetTracker):
     """
@@ -22,11 +23,17 @@ class CustomOffsetTracker(OffsetTracker):
         topic_names: List[str],
         pl_state: DictStrAny,
         start_from: pendulum.DateTime = None,
+        admin_client: AdminClient = None,
+        metadata: ClusterMetadataCache = None,
+        shard: Tuple[int, int] = None,
     ):
         # Initialize as a dict (parent's parent) to avoid calling _init_partition_offsets yet
         dict.__init__(self)
 
         self._consumer = consumer
+        self._admin_client = admin_client
+        self._metadata = metadata
+        self._shard = shard
         self._topics = self._read_topics(topic_names)
 
         # Read/init current offsets
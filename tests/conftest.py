@@ -0,0 +1,14 @@
+import pytest
+
+from src.lib.kafka import message_processors
+from tests.fakes import FakeAvroDeserializer, FakeSchemaRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch) -> FakeSchemaRegistry:
+    """A fake Schema Registry, used by the Avro processors created in the test."""
+    registry = FakeSchemaRegistry()
+    monkeypatch.setenv("SCHEMA_REGISTRY_URL", "http://registry")
+    monkeypatch.setattr(message_processors, "SchemaRegistryClient", lambda conf: registry)
+    monkeypatch.setattr(message_processors, "AvroDeserializer", FakeAvroDeserializer)
+    return registry
@@ -0,0 +1,266 @@
+"""In-memory stand-ins for the Kafka consumer and Schema Registry clients."""
+import json
+import struct
+from concurrent.futures import Future
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from confluent_kafka import Consumer, KafkaError, TopicPartition
+from confluent_kafka.admin import ListOffsetsResultInfo, OffsetSpec
+from fastavro import parse_schema, schemaless_reader, schemaless_writer
+
+from src.lib.kafka.avro import HEADER_SIZE, MAGIC_BYTE, parse_confluent_header
+
+
+class FakeError:
+    def __init__(self, code: int):
+        self._code = code
+
+    def code(self) -> int:
+        return self._code
+
+    def retriable(self) -> bool:
+        return False
+
+    def fatal(self) -> bool:
+        return False
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        topic: str,
+        partition: int,
+        offset: int,
+        value: Optional[bytes],
+        key: Optional[bytes] = None,
+        timestamp: int = 1700000000000,
+        headers: Optional[List[Tuple[str, bytes]]] = None,
+        error: Optional[FakeError] = None,
+    ):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._value = value
+        self._key = key
+        self._timestamp = timestamp
+        self._headers = headers
+        self._error = error
+
+    def topic(self) -> str:
+        return self._topic
+
+    def partition(self) -> int:
+        return self._partition
+
+    def offset(self) -> int:
+        return self._offset
+
+    def value(self) -> Optional[bytes]:
+        return self._value
+
+    def key(self) -> Optional[bytes]:
+        return self._key
+
+    def timestamp(self) -> Tuple[int, int]:
+        return (1, self._timestamp)
+
+    def headers(self) -> Optional[List[Tuple[str, bytes]]]:
+        return self._headers
+
+    def error(self) -> Optional[FakeError]:
+        return self._error
+
+    def __len__(self) -> int:
+        return len(self._value or b"")
+
+
+class _PartitionMetadata:
+    pass
+
+
+class _TopicMetadata:
+    error = None
+
+    def __init__(self, partitions: int):
+        self.partitions = {i: _PartitionMetadata() for i in range(partitions)}
+
+
+class _ClusterMetadata:
+    def __init__(self, topics: Dict[str, _TopicMetadata]):
+        self.topics = topics
+
+
+def json_value(topic: str, partition: int, i: int) -> bytes:
+    return json.dumps({"id": i, "partition": partition}).encode()
+
+
+class FakeCluster:
+    """Partition logs of messages, with explicit offsets so they can have gaps."""
+
+    def __init__(self) -> None:
+        self.logs: Dict[Tuple[str, int], List[FakeMessage]] = {}
+        self.high: Dict[Tuple[str, int], int] = {}
+        self.low: Dict[Tuple[str, int], int] = {}
+        self.partitions: Dict[str, int] = {}
+
+    def add_topic(
+        self,
+        topic: str,
+        partitions: int,
+        per_partition: int,
+        make_value: Callable[[str, int, int], Optional[bytes]] = json_value,
+        make_key: Callable[[str, int, int], Optional[bytes]] = lambda t, p, i: str(i).encode(),
+        trailing_gap: int = 0,
+    ) -> None:
+        """Add a topic, `trailing_gap` offsets past the last messages have none, as in compacted topics."""
+        self.partitions[topic] = partitions
+        for part in range(partitions):
+            self.logs[(topic, part)] = [
+                FakeMessage(topic, part, i, make_value(topic, part, i), make_key(topic, part, i))
+                for i in range(per_partition)
+            ]
+            self.high[(topic, part)] = per_partition + trailing_gap
+            self.low[(topic, part)] = 0
+
+    def delete_before(self, topic: str, low: int) -> None:
+        """Delete the messages before offset `low` of every partition of a topic, as retention does."""
+        for part in range(self.partitions[topic]):
+            self.logs[(topic, part)] = [m for m in self.logs[(topic, part)] if m.offset() >= low]
+            self.low[(topic, part)] = low
+
+
+class FakeConsumer(Consumer):
+    """Reads a `FakeCluster`, following assignments, pauses and partition EOF events."""
+
+    def __new__(cls, *args: Any, **kwargs: Any) -> "FakeConsumer":
+        return Consumer.__new__(cls)
+
+    def __init__(self, cluster: FakeCluster, eof: bool = True):
+        self.cluster = cluster
+        self.eof = eof
+        self.positions: Dict[Tuple[str, int], int] = {}
+        self.paused: set = set()
+        self.eof_sent: set = set()
+        self.closed = False
+
+    def list_topics(self, topic: Optional[str] = None, timeout: float = -1) -> _ClusterMetadata:
+        return _ClusterMetadata({t: _TopicMetadata(n) for t, n in self.cluster.partitions.items()})
+
+    def get_watermark_offsets(self, part: TopicPartition, timeout: float = None, cached: bool = False):
+        key = (part.topic, part.partition)
+        return self.cluster.low[key], self.cluster.high[key]
+
+    def offsets_for_times(self, parts: List[TopicPartition], timeout: float = None) -> List[TopicPartition]:
+        result = []
+        for part in parts:
+            offsets = [m.offset() for m in self.cluster.logs[(part.topic, part.partition)] if m._timestamp >= part.offset]
+            result.append(TopicPartition(part.topic, part.partition, offsets[0] if offsets else -1))
+        return result
+
+    def assign(self, parts: List[TopicPartition]) -> None:
+        self.positions = {(p.topic, p.partition): max(p.offset, 0) for p in parts}
+        self.eof_sent = set()
+
+    def unassign(self) -> None:
+        self.positions = {}
+
+    def assignment(self) -> List[TopicPartition]:
+        return [TopicPartition(t, p, o) for (t, p), o in self.positions.items()]
+
+    def pause(self, parts: List[TopicPartition]) -> None:
+        self.paused.update((p.topic, p.partition) for p in parts)
+
+    def resume(self, parts: List[TopicPartition]) -> None:
+        self.paused.difference_update((p.topic, p.partition) for p in parts)
+
+    def consume(self, num_messages: int = 1, timeout: float = -1) -> List[FakeMessage]:
+        out: List[FakeMessage] = []
+        for key, position in list(self.positions.items()):
+            if key in self.paused:
+                continue
+            for msg in self.cluster.logs[key]:
+                if len(out) >= num_messages:
+                    break
+                if msg.offset() >= position:
+                    out.append(msg)
+                    position = msg.offset() + 1
+            self.positions[key] = position
+
+            at_end = all(m.offset() < position for m in self.cluster.logs[key])
+            if self.eof and at_end and key not in self.eof_sent and len(out) < num_messages:
+                self.eof_sent.add(key)
+                out.append(FakeMessage(key[0], key[1], position, None, error=FakeError(KafkaError._PARTITION_EOF)))
+        return out
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeAdminClient:
+    """Answers `list_offsets` from a `FakeCluster`, recording the requests."""
+
+    def __init__(self, cluster: FakeCluster):
+        self.cluster = cluster
+        self.requests: List[Dict[TopicPartition, OffsetSpec]] = []
+
+    def _offset(self, part: TopicPartition, spec: OffsetSpec) -> int:
+        key = (part.topic, part.partition)
+        if spec is OffsetSpec.latest():
+            return self.cluster.high[key]
+        if spec is OffsetSpec.earliest():
+            return self.cluster.low[key]
+        offsets = [m.offset() for m in self.cluster.logs[key] if m._timestamp >= spec.timestamp]
+        return offsets[0] if offsets else -1
+
+    def list_offsets(self, specs: Dict[TopicPartition, OffsetSpec], **kwargs: Any) -> Dict[TopicPartition, Future]:
+        self.requests.append(specs)
+        futures = {}
+        for part, spec in specs.items():
+            futures[part] = Future()
+            futures[part].set_result(ListOffsetsResultInfo(self._offset(part, spec), -1, -1))
+        return futures
+
+
+class _RegisteredSchema:
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema_str = json.dumps(schema)
+
+
+class FakeSchemaRegistry:
+    """Schemas by id, counting the lookups."""
+
+    def __init__(self) -> None:
+        self.schemas: Dict[int, Dict[str, Any]] = {}
+        self.calls = 0
+
+    def register(self, schema_id: int, schema: Dict[str, Any]) -> None:
+        self.schemas[schema_id] = schema
+
+    def get_schema(self, schema_id: int, *args: Any, **kwargs: Any) -> _RegisteredSchema:
+        self.calls += 1
+        return _RegisteredSchema(self.schemas[schema_id])
+
+
+class FakeAvroDeserializer:
+    """Decodes Confluent-framed values with the writer schemas of a `FakeSchemaRegistry`."""
+
+    def __init__(self, registry: FakeSchemaRegistry):
+        self.registry = registry
+
+    def __call__(self, value: Optional[bytes], ctx: Any = None) -> Any:
+        if value is None:
+            return None
+        schema_id = parse_confluent_header(value)
+        if schema_id is None:
+            raise ValueError("Value is not Confluent-framed")
+        schema = parse_schema(self.registry.schemas[schema_id])
+        return schemaless_reader(BytesIO(value[HEADER_SIZE:]), schema, None)
+
+
+def avro_encode(schema_id: int, schema: Dict[str, Any], record: Any) -> bytes:
+    """Serialize a record in the Confluent wire format."""
+    buffer = BytesIO()
+    buffer.write(struct.pack(">bI", MAGIC_BYTE, schema_id))
+    schemaless_writer(buffer, parse_schema(schema), record)
+    return buffer.getvalue()
@@ -0,0 +1,91 @@
+import pytest
+
+from src.lib.kafka.adaptive import AdaptiveBatchController
+from tests.fakes import FakeMessage
+
+
+def _messages(n, size=100):
+    return [FakeMessage("t", 0, i, b"x" * size) for i in range(n)]
+
+
+def test_rejects_bad_targets():
+    with pytest.raises(ValueError):
+        AdaptiveBatchController(1000, 1, target="speed")
+    with pytest.raises(ValueError):
+        AdaptiveBatchController(1000, 1, target="latency")
+
+
+def test_initial_values_are_clamped():
+    controller = AdaptiveBatchController(10, 60, min_batch_size=100, max_batch_timeout=5)
+    assert (controller.batch_size, controller.batch_timeout) == (100, 5)
+
+    controller = AdaptiveBatchController(1000, 5, target="latency", target_latency_ms=500)
+    assert controller.batch_timeout == 0.5
+
+
+def test_throughput_grows_while_rate_improves_and_turns_back():
+    controller = AdaptiveBatchController(1000, 1)
+
+    controller.record(1000, _messages(1000), 0.1, 0.1)
+    assert controller.batch_size == 1250
+
+    # faster: keeps growing
+    controller.record(1250, _messages(1250), 0.1, 0.1)
+    assert controller.batch_size == 1562
+
+    # rate drops by more than 5%: shrinks
+    controller.record(1562, _messages(1562), 1.0, 1.0)
+    assert controller.batch_size == 1249
+
+
+def test_short_batches_cut_the_timeout():
+    controller = AdaptiveBatchController(1000, 2)
+
+    controller.record(1000, _messages(10), 2.0, 0.01)
+
+    assert (controller.batch_size, controller.batch_timeout) == (1000, 1.6)
+
+
+def test_capped_and_empty_batches_are_ignored():
+    controller = AdaptiveBatchController(1000, 1)
+
+    # bounded by the remaining messages, not by the batch size
+    controller.record(500, _messages(500), 0.1, 0.1)
+    controller.record(1000, [], 1.0, 0.0)
+
+    assert (controller.batch_size, controller.batch_timeout) == (1000, 1)
+
+
+def test_latency_target_is_aimd():
+    controller = AdaptiveBatchController(1000, 1, min_batch_size=100, target="latency", target_latency_ms=200)
+
+    controller.record(1000, _messages(1000), 0.2, 0.1)
+    assert controller.batch_size == 500
+
+    controller.record(500, _messages(500), 0.05, 0.05)
+    assert controller.batch_size == 600
+
+    # a short batch under the target says nothing of the size
+    controller.record(600, _messages(10), 0.05, 0.0)
+    assert controller.batch_size == 600
+
+
+def test_bounds_hold():
+    controller = AdaptiveBatchController(1000, 1, min_batch_size=800, max_batch_size=1100)
+
+    controller.record(1000, _messages(1000), 0.1, 0.1)
+    assert controller.batch_size == 1100
+
+    controller = AdaptiveBatchController(1000, 1, min_batch_size=800, target="latency", target_latency_ms=100)
+    controller.record(1000, _messages(1000), 1.0, 0.0)
+    assert controller.batch_size == 800
+
+
+def test_clone_keeps_settings_not_measurements():
+    controller = AdaptiveBatchController(1000, 1, max_batch_size=5000)
+    controller.record(1000, _messages(1000), 0.1, 0.1)
+
+    clone = controller.clone()
+
+    assert (clone.batch_size, clone.max_batch_size) == (1250, 5000)
+    assert clone._last_rate is None
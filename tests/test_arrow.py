@@ -0,0 +1,125 @@
+import json
+
+import dlt
+import pytest
+
+from src.lib.kafka.arrow import MixedTypesError, rows_to_tables, to_topic_tables
+from src.lib.kafka.message_processors import AvroMessageProcessor
+from src.lib.kafka.resources import kafka_consumer
+from tests.fakes import FakeCluster, FakeConsumer, FakeMessage, avro_encode
+
+ORDER = {
+    "type": "record",
+    "name": "Order",
+    "fields": [
+        {"name": "id", "type": "long"},
+        {"name": "amount", "type": "double"},
+        # multi-type unions are left to Arrow type inference
+        {"name": "note", "type": ["null", "string", "long"], "default": None},
+    ],
+}
+ORDER_KEY = {"type": "record", "name": "OrderKey", "fields": [{"name": "id", "type": "long"}]}
+
+
+def _orders(n):
+    return [
+        FakeMessage(
+            "orders",
+            0,
+            i,
+            avro_encode(1, ORDER, {"id": i, "amount": i * 1.5, "note": f"n{i}"}),
+            key=avro_encode(2, ORDER_KEY, {"id": i}),
+        )
+        for i in range(n)
+    ]
+
+
+def test_rows_to_tables_flattens_metadata():
+    rows = [{"id": 1, "_kafka": {"topic": "t", "offset": 3, "key": {"id": 1, "region": "eu"}}}]
+
+    table = rows_to_tables(rows)["t"]
+
+    assert table.column_names == ["id", "_kafka__topic", "_kafka__offset", "_kafka__key__id", "_kafka__key__region"]
+
+
+def test_decoded_and_fallback_tables_share_key_columns(registry):
+    registry.register(1, ORDER)
+    registry.register(2, ORDER_KEY)
+    processor = AvroMessageProcessor(output_format="arrow")
+    messages = _orders(3)
+
+    decoded = processor.process_batch(messages)[0]
+    fallback = rows_to_tables([processor(msg) for msg in messages])["orders"]
+
+    assert decoded.column_names == fallback.column_names
+    assert decoded.column("_kafka__key__id").to_pylist() == [0, 1, 2]
+
+
+def test_fallback_rows_concatenate_with_decoded_tables(registry):
+    registry.register(1, ORDER)
+    registry.register(2, ORDER_KEY)
+    processor = AvroMessageProcessor(output_format="arrow")
+    # not Confluent-framed: decoded per message, into an error row
+    broken = FakeMessage("orders", 0, 3, b"garbage", key=avro_encode(2, ORDER_KEY, {"id": 3}))
+
+    tables, rejects = to_topic_tables(processor.process_batch(_orders(3) + [broken]))
+
+    table = tables["orders"]
+    assert table.num_rows == 4
+    assert table.column("_kafka__key__id").to_pylist() == [0, 1, 2, 3]
+    assert "_kafka__key" not in table.column_names
+    assert rejects == []
+
+
+def _row(offset, value):
+    return {"v": value, "_kafka": {"topic": "t", "partition": 0, "offset": offset}}
+
+
+def test_mixed_type_rows_are_left_out_of_tables():
+    rows = [_row(0, 1), _row(1, "one"), _row(2, 2), _row(3, None)]
+
+    with pytest.raises(MixedTypesError):
+        rows_to_tables(rows)
+
+    rejects = []
+    table = rows_to_tables(rows, rejects)["t"]
+    assert table.column("v").type == "int64"
+    assert table.column("_kafka__offset").to_pylist() == [0, 2, 3]
+    assert [(row["v"], "_reject_reason" in row) for row in rejects] == [("one", True)]
+    assert "_reject_reason" not in rows[1]
+
+
+def test_mixed_type_union_values_are_rejected(registry):
+    registry.register(1, ORDER)
+    processor = AvroMessageProcessor(output_format="arrow")
+    messages = [
+        FakeMessage("orders", 0, i, avro_encode(1, ORDER, {"id": i, "amount": 1.0, "note": note}))
+        for i, note in enumerate(["a", 7, "b"])
+    ]
+
+    tables, rejects = to_topic_tables(processor.process_batch(messages))
+
+    assert tables["orders"].column("note").to_pylist() == ["a", "b"]
+    assert [(row["_kafka"]["offset"], row["note"]) for row in rejects] == [(1, 7)]
+
+
+def test_mixed_type_batch_is_loaded(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("t", 1, 4, make_value=lambda t, p, i: json.dumps({"v": "two" if i == 2 else i}).encode())
+
+    def msg_processor(msg):
+        return {**json.loads(msg.value()), "_kafka": {"topic": msg.topic(), "partition": 0, "offset": msg.offset()}}
+
+    pipeline = dlt.pipeline(
+        pipeline_name="mixed",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "kafka.duckdb")),
+    )
+    pipeline.run(kafka_consumer("t", FakeConsumer(cluster), msg_processor=msg_processor, output_format="arrow"))
+
+    with pipeline.sql_client() as client:
+        rows = client.execute_sql("SELECT _kafka__offset, v FROM t ORDER BY _kafka__offset")
+        rejects = client.execute_sql("SELECT _kafka__offset, v FROM t_rejects")
+    assert pipeline.default_schema.get_table("t")["columns"]["v"]["data_type"] == "bigint"
+    assert [tuple(row) for row in rows] == [(0, 0), (1, 1), (3, 3)]
+    assert [tuple(row) for row in rejects] == [(2, "two")]
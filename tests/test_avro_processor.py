@@ -0,0 +1,88 @@
+import pytest
+
+from src.lib.kafka.dlq import DeadLetterQueue
+from src.lib.kafka.message_processors import AvroMessageProcessor
+from tests.fakes import FakeMessage, avro_encode
+
+USER = {
+    "type": "record",
+    "name": "User",
+    "fields": [
+        {"name": "id", "type": "long"},
+        {"name": "email", "type": ["null", "string"], "default": None},
+    ],
+}
+
+
+@pytest.fixture
+def users(registry):
+    registry.register(1, USER)
+    return [
+        FakeMessage("users", 0, i, avro_encode(1, USER, {"id": i, "email": f"u{i}@x"}), key=str(i).encode())
+        for i in range(3)
+    ]
+
+
+def test_decodes_batch(users):
+    rows = AvroMessageProcessor().process_batch(users)
+
+    assert [row["id"] for row in rows] == [0, 1, 2]
+    assert rows[0]["_kafka"] == {
+        "topic": "users",
+        "partition": 0,
+        "offset": 0,
+        "timestamp": 1700000000000,
+        "key": 0,
+    }
+
+
+def test_tombstone_becomes_error_row(users):
+    tombstone = FakeMessage("users", 0, 3, None, key=b"2")
+
+    rows = AvroMessageProcessor().process_batch(users + [tombstone])
+
+    assert [row.get("id") for row in rows] == [0, 1, 2, None]
+    assert "not a record" in rows[3]["_avro_error"]
+    assert rows[3]["_kafka"]["offset"] == 3
+
+
+def test_tombstone_goes_to_dlq(users):
+    dlq = DeadLetterQueue()
+    tombstone = FakeMessage("users", 0, 3, None, key=b"2")
+
+    rows = AvroMessageProcessor(dlq=dlq).process_batch(users + [tombstone])
+    dlq.flush()
+
+    assert len(rows) == 3
+    assert [row["offset"] for row in dlq.drain_rows()] == [3]
+    assert dlq.stats == {"users": {"messages": 4, "errors": 1}}
+
+
+def test_tombstone_in_arrow_batch(users):
+    tables = AvroMessageProcessor(output_format="arrow").process_batch(
+        users + [FakeMessage("users", 0, 3, None, key=b"2")]
+    )
+
+    assert sum(table.num_rows for table in tables) == 4
+
+
+def test_table_hints_of_rows_and_arrow(registry, users):
+    profile = {
+        "type": "record",
+        "name": "Profile",
+        "fields": [
+            {"name": "id", "type": "long"},
+            {"name": "address", "type": {"type": "record", "name": "Address", "fields": [{"name": "city", "type": "string"}]}},
+        ],
+    }
+    registry.register(2, profile)
+    users.append(FakeMessage("users", 0, 3, avro_encode(2, profile, {"id": 3, "address": {"city": "Lagos"}})))
+
+    for output_format, address_columns in (("rows", {"address__city": "text"}), ("arrow", {"address": "json"})):
+        processor = AvroMessageProcessor(output_format=output_format)
+        assert processor.table_hints("users") is None
+        processor.process_batch(users)
+
+        columns = processor.table_hints("users")["columns"]
+        assert {name: columns[name]["data_type"] for name in address_columns} == address_columns
+        assert columns["_kafka__offset"]["data_type"] == "bigint"
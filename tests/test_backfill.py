@@ -0,0 +1,102 @@
+import dlt
+import pytest
+
+from src.lib.kafka.backfill import chunk_ranges, resolve_backfill_ranges
+from src.lib.kafka.helpers import default_msg_processor
+from src.lib.kafka.resources import kafka_backfill
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+@pytest.fixture
+def cluster():
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 10)
+    # one message per second, from the first timestamp on
+    for (topic, part), messages in cluster.logs.items():
+        for msg in messages:
+            msg._timestamp = 1700000000000 + msg.offset() * 1000
+    return cluster
+
+
+def test_offsets_are_clamped_to_watermarks(cluster):
+    ranges = resolve_backfill_ranges(FakeConsumer(cluster), {"orders": [0, 1]}, 4, 50)
+
+    assert ranges == [("orders", 0, 4, 10), ("orders", 1, 4, 10)]
+
+
+def test_start_before_log_start_is_clamped(cluster, pipeline):
+    cluster.delete_before("orders", 3)
+
+    ranges = resolve_backfill_ranges(FakeConsumer(cluster), {"orders": [0, 1]}, 0, 2)
+    assert ranges == []
+    ranges = resolve_backfill_ranges(FakeConsumer(cluster), {"orders": [0, 1]}, 1, 6)
+    assert ranges == [("orders", 0, 3, 6), ("orders", 1, 3, 6)]
+
+    read, offsets = _backfill(pipeline, cluster, 0, 6)
+    assert read == [(part, offset) for part in (0, 1) for offset in range(3, 6)]
+    assert offsets == {"orders": {"0": 5, "1": 5}}
+
+
+def test_timestamps_resolve_to_offsets(cluster):
+    consumer = FakeConsumer(cluster)
+
+    ranges = resolve_backfill_ranges(consumer, {"orders": [0]}, "2023-11-14T22:13:22Z", "2023-11-14T22:13:25Z")
+    assert ranges == [("orders", 0, 2, 5)]
+
+    # after the last message: up to the high watermark, and an empty range
+    assert resolve_backfill_ranges(consumer, {"orders": [0]}, 7, "2030-01-01") == [("orders", 0, 7, 10)]
+    assert resolve_backfill_ranges(consumer, {"orders": [0]}, "2030-01-01") == []
+
+
+def test_chunks_interleave_partitions():
+    chunks = chunk_ranges([("a", 0, 0, 5), ("a", 1, 10, 12)], 2)
+
+    assert chunks == [("a", 0, 0, 2), ("a", 1, 10, 12), ("a", 0, 2, 4), ("a", 0, 4, 5)]
+    assert chunk_ranges([], 2) == []
+    with pytest.raises(ValueError):
+        chunk_ranges([("a", 0, 0, 5)], 0)
+
+
+def _backfill(pipeline, cluster, start, end):
+    read = []
+
+    def msg_processor(msg):
+        read.append((msg.partition(), msg.offset()))
+        return default_msg_processor(msg)
+
+    resource = kafka_backfill(
+        topics="orders",
+        credentials=FakeConsumer(cluster),
+        msg_processor=msg_processor,
+        start=start,
+        end=end,
+        consumer_factory=lambda: FakeConsumer(cluster),
+        chunk_size=3,
+        max_workers=2,
+        batch_size=2,
+    )
+    pipeline.extract(resource)
+    return sorted(read), pipeline.state["sources"]["backfill"]["resources"]["kafka_backfill"]["offsets"]
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return dlt.pipeline(pipeline_name="backfill", pipelines_dir=str(tmp_path), destination="duckdb")
+
+
+def test_backfill_reads_range_and_advances_offsets(pipeline, cluster):
+    read, offsets = _backfill(pipeline, cluster, 2, 8)
+
+    assert read == [(part, offset) for part in (0, 1) for offset in range(2, 8)]
+    assert offsets == {"orders": {"0": 7, "1": 7}}
+
+
+def test_saved_offsets_never_move_back_or_skip_messages(pipeline, cluster):
+    _backfill(pipeline, cluster, 0, 5)
+
+    # before the saved offsets: they stay
+    assert _backfill(pipeline, cluster, 0, 2)[1] == {"orders": {"0": 4, "1": 4}}
+    # after a gap of unread messages: they stay
+    assert _backfill(pipeline, cluster, 7, 9)[1] == {"orders": {"0": 4, "1": 4}}
+    # adjacent to them: they move to the range end
+    assert _backfill(pipeline, cluster, 5, 9)[1] == {"orders": {"0": 8, "1": 8}}
@@ -0,0 +1,42 @@
+import dlt
+
+from src.lib.kafka.batching import TopicTableRouter
+from src.lib.kafka.resources import enhanced_kafka_consumer
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+def test_router_resolves_every_topic_once():
+    resolved = []
+
+    def default(topic):
+        resolved.append(topic)
+        return topic.upper()
+
+    router = TopicTableRouter({"debezium.public.orders": "orders"}, default)
+
+    assert [router(t) for t in ["debezium.public.orders", "users", "users"]] == ["orders", "USERS", "USERS"]
+    assert resolved == ["users"]
+
+
+def test_mapped_and_unmapped_topics_are_loaded(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("debezium.public.orders", 1, 3)
+    cluster.add_topic("app.users", 2, 2)
+
+    pipeline = dlt.pipeline(
+        pipeline_name="routing",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "kafka.duckdb")),
+    )
+    pipeline.run(
+        enhanced_kafka_consumer(
+            credentials=FakeConsumer(cluster),
+            batch_timeout=1,
+            topics=["debezium.public.orders", "app.users"],
+            table_mapping={"debezium.public.orders": "orders"},
+        )
+    )
+
+    # unmapped topics are named after them, with the dots replaced
+    assert pipeline.last_trace.last_normalize_info.row_counts["orders"] == 3
+    assert pipeline.last_trace.last_normalize_info.row_counts["app_users"] == 4
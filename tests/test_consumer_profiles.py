@@ -0,0 +1,77 @@
+import pytest
+
+import advanced_usage.helpers
+from advanced_usage.helpers import ResourceConfig
+from src.lib.kafka import helpers
+from src.lib.kafka.helpers import CONSUMER_PROFILES, KafkaCredentials, consumer_tuning
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+@pytest.fixture
+def consumer_configs(monkeypatch):
+    """Configs of the consumers created in the test, by both factories."""
+    configs = []
+
+    def _consumer(config):
+        configs.append(config)
+        return FakeConsumer(FakeCluster())
+
+    monkeypatch.setattr(helpers, "Consumer", _consumer)
+    monkeypatch.setattr(advanced_usage.helpers, "Consumer", _consumer)
+    return configs
+
+
+def test_overrides_apply_over_the_profile():
+    settings = consumer_tuning("throughput", {"fetch.wait.max.ms": 100, "check.crcs": True})
+
+    assert settings["fetch.wait.max.ms"] == 100
+    assert settings["check.crcs"] is True
+    assert settings["fetch.min.bytes"] == CONSUMER_PROFILES["throughput"]["fetch.min.bytes"]
+    # the profile itself isn't changed
+    assert CONSUMER_PROFILES["throughput"]["fetch.wait.max.ms"] == 500
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown consumer profile"):
+        consumer_tuning("fastest")
+    with pytest.raises(ValueError, match="profile must be one of"):
+        ResourceConfig(
+            name="orders",
+            kafka={"consumer_group_id": "g", "topics": ["orders"], "profile": "fastest"},
+            processing={"serializer": "json", "target_dataset": None},
+        )
+
+
+def test_credentials_consumer_is_tuned(consumer_configs):
+    credentials = KafkaCredentials()
+    credentials.bootstrap_servers = "localhost:9092"
+    credentials.group_id = "g"
+    credentials.profile = "low_latency"
+    credentials.consumer_overrides = {"fetch.wait.max.ms": 5}
+
+    credentials.init_consumer()
+
+    config = consumer_configs[0]
+    assert config["group.id"] == "g"
+    assert config["fetch.min.bytes"] == 1
+    assert config["fetch.wait.max.ms"] == 5
+
+
+def test_resource_consumer_is_tuned(consumer_configs, monkeypatch):
+    monkeypatch.setenv("BOOTSTRAP_SERVERS", "localhost:9092")
+    config = ResourceConfig(
+        name="orders",
+        kafka={
+            "consumer_group_id": "g",
+            "topics": ["orders"],
+            "profile": "memory_constrained",
+            "consumer_overrides": {"queued.min.messages": 10},
+        },
+        processing={"serializer": "json", "target_dataset": None},
+    )
+
+    config.create_consumer()
+
+    assert consumer_configs[0]["enable.partition.eof"] is True
+    assert consumer_configs[0]["fetch.max.bytes"] == 5242880
+    assert consumer_configs[0]["queued.min.messages"] == 10
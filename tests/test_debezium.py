@@ -0,0 +1,100 @@
+import pytest
+
+from src.lib.kafka.message_processors import DebeziumMessageProcessor
+from src.lib.kafka.pushdown import RowPushdown
+from tests.fakes import FakeMessage, avro_encode
+
+KEY = {"type": "record", "name": "Key", "fields": [{"name": "id", "type": "int"}]}
+VALUE = {
+    "type": "record",
+    "name": "Value",
+    "fields": [
+        {"name": "id", "type": "int"},
+        {"name": "name", "type": ["null", "string"], "default": None},
+        {"name": "__op", "type": ["null", "string"], "default": None},
+        {"name": "__source_ts_ms", "type": ["null", "long"], "default": None},
+        {"name": "__deleted", "type": ["null", "string"], "default": None},
+    ],
+}
+
+
+@pytest.fixture
+def processor(registry):
+    registry.register(1, KEY)
+    registry.register(2, VALUE)
+    return DebeziumMessageProcessor()
+
+
+def _event(offset, id_, name=None, op="u", partition=0, deleted="false"):
+    value = {"id": id_, "name": name, "__op": op, "__source_ts_ms": 1000 + offset, "__deleted": deleted}
+    return FakeMessage("customers", partition, offset, avro_encode(2, VALUE, value), key=avro_encode(1, KEY, {"id": id_}))
+
+
+def _tombstone(offset, id_, partition=0):
+    return FakeMessage("customers", partition, offset, None, key=avro_encode(1, KEY, {"id": id_}))
+
+
+def test_keeps_latest_event_by_offset(processor):
+    rows = processor.process_batch([_event(0, 1, "a", "c"), _event(1, 2, "b", "c"), _event(2, 1, "a2")])
+
+    assert sorted((row["id"], row["name"]) for row in rows) == [(1, "a2"), (2, "b")]
+    assert processor.compacted == 1
+    assert processor.table_hints("customers")["primary_key"] == ["id"]
+
+
+def test_delete_is_flagged(processor):
+    rows = processor.process_batch([_event(0, 1, "a", "c"), _event(1, 1, "a", "d", deleted="true")])
+
+    assert len(rows) == 1
+    assert rows[0]["__deleted"] is True
+
+
+def test_tombstone_collapses_into_its_delete(processor):
+    rows = processor.process_batch(
+        [_event(0, 1, "a", "c"), _event(1, 1, "a", "d", deleted="true"), _tombstone(2, 1), _event(3, 2, "b", "c")]
+    )
+
+    deletes = [row for row in rows if row["id"] == 1]
+    assert len(deletes) == 1
+    assert deletes[0]["__deleted"] is True and deletes[0]["name"] == "a"
+    assert processor.drain_rejects() == []
+
+
+def test_tombstone_alone_deletes_its_key(processor):
+    rows = processor.process_batch([_tombstone(5, 1)])
+
+    assert rows == [
+        {
+            "id": 1,
+            "__source_ts_ms": 1700000000000,
+            "__deleted": True,
+            "_kafka": {"topic": "customers", "partition": 0, "offset": 5, "timestamp": 1700000000000, "key": {"id": 1}},
+        }
+    ]
+    assert processor.drain_rejects() == []
+
+
+def test_insert_after_tombstone_wins(processor):
+    rows = processor.process_batch([_event(0, 1, "a", "d", deleted="true"), _tombstone(1, 1), _event(2, 1, "a3", "c")])
+
+    assert [(row["name"], row["__deleted"]) for row in rows] == [("a3", False)]
+
+
+def test_keyless_events_are_rejected(processor):
+    keyless = FakeMessage("customers", 0, 0, avro_encode(2, VALUE, {"id": 1, "name": "a"}), key=b"1")
+    keyless_tombstone = FakeMessage("customers", 0, 1, None, key=None)
+
+    assert processor.process_batch([keyless, keyless_tombstone]) == []
+
+    reasons = [row["_reject_reason"] for row in processor.drain_rejects()]
+    assert reasons == ["change event has no record key", "tombstone has no record key"]
+
+
+def test_tombstones_follow_key_conditions(registry):
+    registry.register(1, KEY)
+    registry.register(2, VALUE)
+    processor = DebeziumMessageProcessor(pushdown=RowPushdown(where=[{"field": "key.id", "op": "==", "value": 2}]))
+
+    rows = processor.process_batch([_tombstone(0, 1), _tombstone(1, 2)])
+
+    assert [row["id"] for row in rows] == [2]
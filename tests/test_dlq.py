@@ -0,0 +1,135 @@
+import base64
+import json
+
+import dlt
+import pytest
+
+from src.lib.kafka import dlq as dlq_module
+from src.lib.kafka.dlq import DeadLetterQueue, DeadLetterThresholdExceeded, RateLimitedLog
+from src.lib.kafka.message_processors import JSONMessageProcessor
+from src.lib.kafka.resources import enhanced_kafka_consumer
+from tests.fakes import FakeCluster, FakeConsumer, FakeMessage
+
+
+def _invalid_every(n):
+    def make_value(topic, partition, i):
+        return b"{oops" if i % n == 0 else json.dumps({"id": i}).encode()
+
+    return make_value
+
+
+class _Warnings:
+    def __init__(self):
+        self.messages = []
+
+    def warning(self, message):
+        self.messages.append(message)
+
+
+class _Producer:
+    def __init__(self, config):
+        self.produced = []
+
+    def produce(self, topic, value=None, key=None, headers=None):
+        self.produced.append((topic, value, key, dict(headers)))
+
+    def flush(self, timeout):
+        return 0
+
+
+def test_file_sink_appends_json_lines(tmp_path):
+    path = tmp_path / "dlq.jsonl"
+    dlq = DeadLetterQueue(sink="file", path=str(path))
+
+    for offset in range(2):
+        dlq.add(FakeMessage("t", 0, offset, b"\xff", key=b"k"), "bad value")
+        dlq.flush()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["offset"] for r in records] == [0, 1]
+    assert base64.b64decode(records[0]["raw_value"]) == b"\xff"
+    assert records[0]["error"] == "bad value"
+
+
+def test_kafka_sink_keeps_origin_in_headers(monkeypatch):
+    monkeypatch.setattr(dlq_module, "Producer", _Producer)
+    dlq = DeadLetterQueue(sink="kafka", topic="t.dlq", producer_config={"bootstrap.servers": "b"})
+
+    dlq.add(FakeMessage("t", 2, 7, b"{oops", key=b"k"), "bad value")
+    dlq.flush()
+
+    topic, value, key, headers = dlq._producer.produced[0]
+    assert (topic, value, key) == ("t.dlq", b"{oops", b"k")
+    assert headers["dlq.topic"] == b"t"
+    assert headers["dlq.offset"] == b"7"
+
+
+def test_sink_settings_are_validated():
+    with pytest.raises(ValueError, match="Unknown DLQ sink"):
+        DeadLetterQueue(sink="s3")
+    with pytest.raises(ValueError, match="path is required"):
+        DeadLetterQueue(sink="file")
+
+
+def test_error_ratio_over_limit_aborts():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 1, 20, make_value=_invalid_every(2))
+    dlq = DeadLetterQueue(max_error_ratio=0.2, min_messages=10)
+    processor = JSONMessageProcessor(dlq=dlq)
+
+    with pytest.raises(DeadLetterThresholdExceeded, match="of topic t"):
+        processor.process_batch(cluster.logs[("t", 0)])
+
+
+def test_error_ratio_is_checked_after_min_messages():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 1, 5, make_value=_invalid_every(2))
+    dlq = DeadLetterQueue(max_error_ratio=0.2, min_messages=10)
+
+    rows = JSONMessageProcessor(dlq=dlq).process_batch(cluster.logs[("t", 0)])
+
+    assert [row["id"] for row in rows] == [1, 3]
+    assert dlq.stats == {"t": {"messages": 5, "errors": 3}}
+
+
+def test_table_sink_is_loaded(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 5, make_value=_invalid_every(4))
+
+    pipeline = dlt.pipeline(
+        pipeline_name="dlq",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "kafka.duckdb")),
+    )
+    pipeline.run(
+        enhanced_kafka_consumer(
+            credentials=FakeConsumer(cluster),
+            batch_timeout=1,
+            topics=["orders"],
+            msg_processor=JSONMessageProcessor(dlq=DeadLetterQueue()),
+        )
+    )
+
+    with pipeline.sql_client() as client:
+        dead = client.execute_sql('SELECT "partition", "offset" FROM kafka_dlq ORDER BY 1, 2')
+        rows = client.execute_sql("SELECT count(*) FROM orders")
+    assert [tuple(row) for row in dead] == [(0, 0), (0, 4), (1, 0), (1, 4)]
+    assert rows[0][0] == 6
+
+
+def test_rate_limited_log_summarizes_suppressed(monkeypatch):
+    warnings = _Warnings()
+    monkeypatch.setattr(dlq_module, "logger", warnings)
+    log = RateLimitedLog(interval=60)
+
+    for i in range(3):
+        log.warning("t", f"failure {i}")
+    log.warning("u", "other topic")
+    log._keys["t"] = (log._keys["t"][0] - 60, log._keys["t"][1])
+    log.warning("t", "failure 3")
+
+    assert warnings.messages == [
+        "failure 0",
+        "other topic",
+        "failure 3 (2 similar suppressed in the last 60s)",
+    ]
@@ -0,0 +1,143 @@
+import json
+
+import dlt
+import pytest
+
+from src.lib.kafka.dlq import DeadLetterQueue
+from src.lib.kafka.message_processors import JSONMessageProcessor
+from src.lib.kafka.pushdown import RowPushdown
+from src.lib.kafka.resources import enhanced_kafka_consumer
+from tests.fakes import FakeCluster, FakeConsumer, FakeMessage
+
+NOT_OBJECTS = [b"null", b"[1, 2]", b"42", b'"text"']
+
+
+def _messages(*values):
+    return [FakeMessage("t", 0, i, value, key=str(i).encode()) for i, value in enumerate(values)]
+
+
+def test_decodes_batch():
+    rows = JSONMessageProcessor().process_batch(_messages(b'{"id": 1}', b'{"id": 2, "name": "b"}'))
+
+    assert rows == [
+        {"id": 1, "_kafka": {"topic": "t", "partition": 0, "offset": 0, "timestamp": 1700000000000, "key": 0}},
+        {"id": 2, "name": "b", "_kafka": {"topic": "t", "partition": 0, "offset": 1, "timestamp": 1700000000000, "key": 1}},
+    ]
+
+
+def test_empty_value_is_empty_object():
+    rows = JSONMessageProcessor().process_batch(_messages(b""))
+
+    assert list(rows[0]) == ["_kafka"]
+
+
+@pytest.mark.parametrize("value", NOT_OBJECTS)
+def test_non_object_becomes_error_row(value):
+    rows = JSONMessageProcessor().process_batch(_messages(b'{"id": 1}', value))
+
+    assert rows[0]["id"] == 1
+    assert "not an object" in rows[1]["_json_error"]
+    assert rows[1]["_kafka"]["offset"] == 1
+
+
+@pytest.mark.parametrize("value", NOT_OBJECTS)
+def test_non_object_goes_to_dlq(value):
+    dlq = DeadLetterQueue()
+
+    rows = JSONMessageProcessor(dlq=dlq).process_batch(_messages(b'{"id": 1}', value))
+    dlq.flush()
+
+    assert [row["id"] for row in rows] == [1]
+    assert [row["raw_value"] for row in dlq.drain_rows()] == [value]
+
+
+@pytest.mark.parametrize("value", NOT_OBJECTS)
+def test_non_object_with_pushdown_and_schema_inference(value):
+    processor = JSONMessageProcessor(
+        schema_sample_size=1,
+        pushdown=RowPushdown(where=[{"field": "id", "op": ">", "value": 0}]),
+    )
+
+    rows = processor.process_batch(_messages(b'{"id": 1}', value, b'{"id": 0}'))
+
+    assert [row.get("id") for row in rows] == [1, None]
+    assert "_json_error" in rows[1]
+
+
+def test_invalid_json_becomes_error_row():
+    rows = JSONMessageProcessor().process_batch(_messages(b"{oops"))
+
+    assert rows[0]["_raw_value_length"] == 5
+    assert "_json_error" in rows[0]
+
+
+def test_schema_inference_rejects_nonconforming_values():
+    processor = JSONMessageProcessor(schema_sample_size=2)
+
+    rows = processor.process_batch(_messages(b'{"n": 1}', b'{"n": 2}', b'{"n": "x"}', b'{"n": 3}'))
+
+    assert [row["n"] for row in rows] == [1, 2, 3]
+    assert processor.table_hints("t")["columns"]["n"]["data_type"] == "bigint"
+    rejects = processor.drain_rejects()
+    assert [(r["_raw_value"], r["_kafka"]["offset"]) for r in rejects] == [('{"n": "x"}', 2)]
+    assert processor.drain_rejects() == []
+
+
+def test_does_not_print(capsys):
+    JSONMessageProcessor().process_batch(_messages(b"{oops"))
+
+    assert capsys.readouterr().out == ""
+
+
+def test_inferred_types_persist_in_state():
+    state = {}
+    first = JSONMessageProcessor(schema_sample_size=2)
+    first.bind_state(state)
+    first.process_batch(_messages(b'{"n": 1}', b'{"n": 2}'))
+
+    # the next run starts from the saved types, without sampling
+    second = JSONMessageProcessor(schema_sample_size=2)
+    second.bind_state(state)
+    rows = second.process_batch(_messages(b'{"n": "x"}', b'{"n": 3}'))
+
+    assert [row["n"] for row in rows] == [3]
+    assert second.table_hints("t")["columns"]["n"]["data_type"] == "bigint"
+    assert [r["_kafka"]["offset"] for r in second.drain_rejects()] == [0]
+
+
+def test_inferred_types_persist_in_sidecar_file(tmp_path):
+    path = str(tmp_path / "schemas.json")
+    JSONMessageProcessor(schema_sample_size=1, schema_path=path).process_batch(_messages(b'{"flag": true}'))
+
+    processor = JSONMessageProcessor(schema_sample_size=1, schema_path=path)
+    processor.process_batch(_messages(b'{"flag": 1}'))
+
+    assert processor.table_hints("t")["columns"]["flag"]["data_type"] == "bool"
+    assert "expected bool" in processor.drain_rejects()[0]["_reject_reason"]
+
+
+def test_rejects_are_loaded_to_their_table(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("app.orders", 1, 4, make_value=lambda t, p, i: json.dumps({"n": "x" if i == 3 else i}).encode())
+
+    pipeline = dlt.pipeline(
+        pipeline_name="rejects",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "kafka.duckdb")),
+    )
+    pipeline.run(
+        enhanced_kafka_consumer(
+            credentials=FakeConsumer(cluster),
+            batch_timeout=1,
+            topics=["app.orders"],
+            msg_processor=JSONMessageProcessor(schema_sample_size=2),
+        )
+    )
+
+    with pipeline.sql_client() as client:
+        rows = client.execute_sql("SELECT n FROM app_orders ORDER BY n")
+        rejects = client.execute_sql("SELECT _raw_value FROM app_orders_rejects")
+    assert [row[0] for row in rows] == [0, 1, 2]
+    assert [row[0] for row in rejects] == ['{"n": "x"}']
+    resource_state = pipeline.state["sources"]["rejects"]["resources"]["enhanced_kafka_consumer"]
+    assert resource_state["json_schemas"] == {"app.orders": {"n": "bigint"}}
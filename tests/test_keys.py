@@ -0,0 +1,75 @@
+import pytest
+
+from src.lib.kafka.keys import KeyDecoder
+from tests.fakes import FakeAvroDeserializer, FakeMessage, FakeSchemaRegistry, avro_encode
+
+KEY = {"type": "record", "name": "Key", "fields": [{"name": "id", "type": "long"}]}
+
+
+def _decode(decoder, *keys, topic="t"):
+    return [decoder(FakeMessage(topic, 0, i, b"{}", key=key)) for i, key in enumerate(keys)]
+
+
+@pytest.fixture
+def avro_keys():
+    registry = FakeSchemaRegistry()
+    registry.register(1, KEY)
+    return KeyDecoder(FakeAvroDeserializer(registry))
+
+
+def test_caches_format_per_topic():
+    decoder = KeyDecoder()
+
+    assert _decode(decoder, b'{"id": 1}', b'{"id": 2}') == [{"id": 1}, {"id": 2}]
+    assert _decode(decoder, b"abc", topic="s") == ["abc"]
+    assert decoder.stats == {
+        "t": {"format": "json", "decoded": 2, "reprobes": 0},
+        "s": {"format": "string", "decoded": 1, "reprobes": 0},
+    }
+
+
+def test_reprobes_when_key_stops_matching():
+    decoder = KeyDecoder()
+
+    assert _decode(decoder, b"1", b"abc", b"2") == [1, "abc", 2]
+    assert decoder.stats["t"]["reprobes"] == 2
+
+
+def test_string_topic_still_decodes_json_keys():
+    decoder = KeyDecoder()
+
+    assert _decode(decoder, b"abc", b'{"id": 1}', b"42", b"true", b"", b"def") == [
+        "abc",
+        {"id": 1},
+        42,
+        True,
+        "",
+        "def",
+    ]
+
+
+def test_string_topic_still_decodes_avro_keys(avro_keys):
+    assert _decode(avro_keys, b"abc", avro_encode(1, KEY, {"id": 7})) == ["abc", {"id": 7}]
+
+
+def test_binary_topic_decodes_binary_keys_directly(avro_keys):
+    probed = []
+    decode_avro = avro_keys._decoders["avro"]
+    avro_keys._decoders["avro"] = lambda topic, key: probed.append(key) or decode_avro(topic, key)
+
+    assert _decode(avro_keys, b"\xff\xfe", b"\xff", b"\x80\x00\x01") == [
+        "<binary_key_length_2>",
+        "<binary_key_length_1>",
+        "<binary_key_length_3>",
+    ]
+    assert probed == [b"\xff\xfe"]
+    assert avro_keys.stats["t"] == {"format": "binary", "decoded": 3, "reprobes": 0}
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [(b"abc", "abc"), ("é".encode(), "é"), (b"42", 42), (avro_encode(1, KEY, {"id": 7}), {"id": 7})],
+)
+def test_binary_topic_reprobes_keys_in_earlier_formats(avro_keys, key, expected):
+    assert _decode(avro_keys, b"\xff", key) == ["<binary_key_length_1>", expected]
+    assert avro_keys.stats["t"]["reprobes"] == 1
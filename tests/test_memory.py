@@ -0,0 +1,89 @@
+import time
+
+from confluent_kafka import TopicPartition
+
+from src.lib.kafka.helpers import OffsetTracker, default_msg_processor
+from src.lib.kafka.memory import MB, MemoryGovernor
+from src.lib.kafka.resources import read_batches
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+class _PauseLog(FakeConsumer):
+    def __init__(self, cluster):
+        super().__init__(cluster)
+        self.calls = []
+
+    def pause(self, parts):
+        self.calls.append(("pause", [p.partition for p in parts]))
+        super().pause(parts)
+
+    def resume(self, parts):
+        self.calls.append(("resume", [p.partition for p in parts]))
+        super().resume(parts)
+
+
+def _governor(rss_mb, **kwargs):
+    governor = MemoryGovernor(100, check_interval=0.01, **kwargs)
+    readings = iter(rss_mb)
+    last = [0]
+
+    def rss():
+        last[0] = next(readings, last[0])
+        return last[0] * MB
+
+    governor.rss = rss
+    return governor
+
+
+def _consumer():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 2, 10)
+    return cluster, _PauseLog(cluster)
+
+
+def _partitions(consumer):
+    return consumer.assignment
+
+
+def test_under_ceiling_reads_on():
+    _, consumer = _consumer()
+    _governor([50], draining=lambda: True).throttle(consumer, _partitions(consumer))
+
+    assert consumer.calls == []
+
+
+def test_pauses_until_memory_drains():
+    _, consumer = _consumer()
+    consumer.assign([TopicPartition("t", 0, 0), TopicPartition("t", 1, 0)])
+    # over the ceiling, still over after gc, then twice while paused, then under the resume ratio
+    governor = _governor([120, 120, 110, 90, 70], draining=lambda: True)
+
+    governor.throttle(consumer, _partitions(consumer))
+
+    assert consumer.calls == [("pause", [0, 1]), ("resume", [0, 1])]
+    assert consumer.paused == set()
+
+
+def test_resumes_once_nothing_is_left_to_drain():
+    _, consumer = _consumer()
+    queued = [1, 1, 1]
+    governor = _governor([120], max_wait=30)
+
+    started = time.monotonic()
+    governor.throttle(consumer, lambda: [], draining=lambda: bool(queued and queued.pop()))
+
+    assert time.monotonic() - started < 1
+    assert [call[0] for call in consumer.calls] == ["pause", "resume"]
+
+
+def test_extract_without_draining_thread_is_not_stalled():
+    cluster, consumer = _consumer()
+    tracker = OffsetTracker(consumer, ["t"], {})
+    governor = _governor([500], max_wait=30)
+
+    started = time.monotonic()
+    batches = list(read_batches(consumer, tracker, default_msg_processor, 5, 1, memory_governor=governor))
+
+    assert time.monotonic() - started < 1
+    assert not tracker.has_unread
+    assert len(batches) == 4
@@ -0,0 +1,50 @@
+import json
+import os
+import time
+
+from src.lib.kafka.metadata import ClusterMetadataCache
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+class _CountingConsumer(FakeConsumer):
+    listings = 0
+
+    def list_topics(self, topic=None, timeout=-1):
+        if topic is None:
+            self.listings += 1
+        return super().list_topics(topic, timeout)
+
+
+def _snapshot(path, listed_at, topics):
+    with open(path, "w") as f:
+        json.dump({"listed_at": listed_at, "topics": topics}, f)
+
+
+def test_snapshot_is_saved_without_leftovers(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 1)
+    path = tmp_path / "metadata.json"
+
+    for _ in range(2):
+        ClusterMetadataCache(FakeConsumer(cluster), ttl=0, snapshot_path=str(path)).topic_names()
+
+    assert json.loads(path.read_text())["topics"] == {"orders": [0, 1]}
+    assert os.listdir(tmp_path) == ["metadata.json"]
+
+
+def test_old_snapshot_is_loaded_within_snapshot_ttl(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 1)
+    path = tmp_path / "metadata.json"
+    _snapshot(path, time.time() - 3600, {"orders": [0, 1]})
+
+    consumer = _CountingConsumer(cluster)
+    assert ClusterMetadataCache(consumer, ttl=60, snapshot_path=str(path)).topic_names() == ["orders"]
+    assert consumer.listings == 1
+
+    # the snapshot of a run, e.g. `run_resources`, however old
+    consumer = _CountingConsumer(cluster)
+    _snapshot(path, time.time() - 3600, {"orders": [0, 1], "users": [0]})
+    cache = ClusterMetadataCache(consumer, ttl=60, snapshot_path=str(path), snapshot_ttl=float("inf"))
+    assert cache.topic_names() == ["orders", "users"]
+    assert consumer.listings == 0
@@ -0,0 +1,82 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dlt
+
+from advanced_usage import multi_runner
+from advanced_usage.helpers import ResourceConfig
+from advanced_usage.multi_runner import format_report, run_resources
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+class _CountingConsumer(FakeConsumer):
+    listings = 0
+
+    def list_topics(self, topic=None, timeout=-1):
+        if topic is None:
+            type(self).listings += 1
+        return super().list_topics(topic, timeout)
+
+
+def test_resources_start_from_the_snapshot_of_the_run(monkeypatch, tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 5)
+    cluster.add_topic("users", 1, 5)
+    snapshots = []
+
+    def build_pipeline(self, destination="duckdb", shard=None):
+        snapshots.append(json.load(open(self.kafka.metadata_snapshot)))
+        return dlt.pipeline(
+            pipeline_name=self.name,
+            pipelines_dir=str(tmp_path),
+            destination=dlt.destinations.duckdb(str(tmp_path / f"{self.name}_db.duckdb")),
+        )
+
+    prefetch_metadata = multi_runner.prefetch_metadata
+
+    def prefetch_then_age(resources, snapshot_path):
+        prefetch_metadata(resources, snapshot_path)
+        # resources starting long after the listing, past the metadata ttl
+        with open(snapshot_path) as f:
+            snapshot = json.load(f)
+        snapshot["listed_at"] = time.time() - 3600
+        with open(snapshot_path, "w") as f:
+            json.dump(snapshot, f)
+
+    monkeypatch.setattr(_CountingConsumer, "listings", 0)
+    monkeypatch.setattr(ResourceConfig, "create_consumer", lambda self: _CountingConsumer(cluster))
+    monkeypatch.setattr(ResourceConfig, "create_admin_client", lambda self: None)
+    monkeypatch.setattr(ResourceConfig, "build_pipeline", build_pipeline)
+    monkeypatch.setattr(multi_runner, "prefetch_metadata", prefetch_then_age)
+    # resources share the fake cluster, so they run in threads of this process
+    monkeypatch.setattr(multi_runner, "ProcessPoolExecutor", ThreadPoolExecutor)
+    processing = {"serializer": "json", "target_dataset": None, "batch_size": 10, "batch_timeout": 1}
+    resources = [
+        ResourceConfig(name="orders", kafka={"consumer_group_id": "g", "topics_regex": "ord.*"}, processing=processing),
+        ResourceConfig(name="users", kafka={"consumer_group_id": "g", "topics_regex": "us.*"}, processing=processing),
+    ]
+
+    results = run_resources(resources, max_workers=1)
+
+    assert {r["name"]: (r["status"], r["rows"]) for r in results} == {
+        "orders": ("ok", {"orders": 10}),
+        "users": ("ok", {"users": 5}),
+    }
+    # listed once, up front
+    assert _CountingConsumer.listings == 1
+    assert [s["topics"] for s in snapshots] == [{"orders": [0, 1], "users": [0]}] * 2
+
+
+def test_format_report_totals():
+    report = format_report(
+        [
+            {"name": "b", "status": "ok", "rows": {"b": 30}, "seconds": 3.0},
+            {"name": "a", "status": "failed", "rows": {}, "seconds": 1.0},
+        ],
+        3.0,
+    )
+
+    lines = report.splitlines()
+    assert [line.split()[0] for line in lines] == ["resource", "a", "b", "total"]
+    assert lines[-1].split() == ["total", "30", "3.00", "10.0"]
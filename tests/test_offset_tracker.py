@@ -0,0 +1,194 @@
+import dlt
+import pendulum
+import pytest
+
+from src.lib.kafka.helpers import OffsetTracker, default_msg_processor, partition_shard
+from src.lib.kafka.metadata import ClusterMetadataCache
+from src.lib.kafka.resources import enhanced_kafka_consumer, read_batches
+from src.lib.kafka.tracking import CustomOffsetTracker
+from tests.fakes import FakeAdminClient, FakeCluster, FakeConsumer, FakeMessage
+
+
+def _tracker(cluster, state=None):
+    consumer = FakeConsumer(cluster)
+    state = {} if state is None else state
+    return OffsetTracker(consumer, list(cluster.partitions), state), consumer, state
+
+
+def test_starts_after_saved_offsets():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 2, 10)
+    tracker, consumer, _ = _tracker(cluster, {"offsets": {"t": {"0": 4}}})
+
+    assert consumer.positions == {("t", 0): 5, ("t", 1): 0}
+    assert tracker.remaining == 5 + 10
+    assert tracker.has_unread
+
+
+def test_renew_batch_moves_offsets_and_state():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 2, 10)
+    tracker, consumer, state = _tracker(cluster)
+
+    tracker.renew_batch([FakeMessage("t", 0, i, b"{}") for i in range(10)] + [FakeMessage("t", 1, 0, b"{}")])
+
+    assert state["offsets"]["t"] == {"0": 9, "1": 0}
+    assert tracker.remaining == 9
+    assert tracker.unread_partitions()[0].partition == 1
+
+    tracker.pause_finished()
+    assert consumer.paused == {("t", 0)}
+    # finished partitions are paused once
+    tracker.pause_finished()
+    assert consumer.paused == {("t", 0)}
+
+
+def test_offsets_never_move_back():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 1, 10)
+    tracker, _, state = _tracker(cluster)
+
+    tracker.renew(FakeMessage("t", 0, 5, b"{}"))
+    tracker.renew(FakeMessage("t", 0, 3, b"{}"))
+
+    assert state["offsets"]["t"]["0"] == 5
+    assert tracker.remaining == 4
+
+
+def test_mark_eof_skips_trailing_gaps():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 1, 10, trailing_gap=3)
+    tracker, _, state = _tracker(cluster)
+
+    tracker.renew(FakeMessage("t", 0, 9, b"{}"))
+    assert tracker.has_unread
+
+    tracker.mark_eof("t", 0)
+    assert not tracker.has_unread
+    assert tracker.remaining == 0
+    assert state["offsets"]["t"]["0"] == 12
+
+
+class _BulkOnlyConsumer(FakeConsumer):
+    def get_watermark_offsets(self, *args, **kwargs):
+        raise AssertionError("watermarks read per partition")
+
+    def offsets_for_times(self, *args, **kwargs):
+        raise AssertionError("timestamp offsets read by the consumer")
+
+
+def test_startup_offsets_are_resolved_in_bulk():
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 3, 10)
+    cluster.add_topic("users", 2, 4)
+    admin = FakeAdminClient(cluster)
+    consumer = _BulkOnlyConsumer(cluster)
+
+    tracker = OffsetTracker(
+        consumer,
+        ["orders", "users"],
+        {},
+        start_from=pendulum.from_timestamp(1600000000),
+        admin_client=admin,
+    )
+
+    # one request for the watermarks and one for the timestamps, of all the partitions
+    assert len(admin.requests) == 2
+    assert all(len(request) == 5 for request in admin.requests)
+    assert tracker.remaining == 3 * 10 + 2 * 4
+    assert all(position == 0 for position in consumer.positions.values())
+
+
+class _RecordingConsumer(FakeConsumer):
+    def __init__(self, cluster):
+        super().__init__(cluster)
+        self.requests = []
+
+    def consume(self, num_messages=1, timeout=-1):
+        self.requests.append(num_messages)
+        return super().consume(num_messages, timeout)
+
+
+def test_read_stops_at_partition_ends():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 2, 5, trailing_gap=2)
+    consumer = _RecordingConsumer(cluster)
+    state = {}
+    tracker = OffsetTracker(consumer, ["t"], state)
+
+    list(read_batches(consumer, tracker, default_msg_processor, 100, 30))
+
+    # asks for no more than is left, and the EOF events end the gapped partitions
+    assert consumer.requests == [14]
+    assert state["offsets"]["t"] == {"0": 6, "1": 6}
+    assert not tracker.has_unread
+
+
+@pytest.mark.parametrize(
+    "topic, partitions, shards",
+    [("debezium.public.customers", 4, 4), ("orders", 6, 3), ("orders", 7, 3), ("events", 12, 5)],
+)
+def test_shards_are_balanced(topic, partitions, shards):
+    owners = [partition_shard(topic, p, shards) for p in range(partitions)]
+
+    counts = [owners.count(i) for i in range(shards)]
+    assert min(counts) == partitions // shards
+    assert max(counts) - min(counts) <= 1
+
+
+def test_sharded_trackers_split_partitions():
+    cluster = FakeCluster()
+    cluster.add_topic("debezium.public.customers", 4, 10)
+    owned = []
+    for index in range(4):
+        tracker = OffsetTracker(FakeConsumer(cluster), list(cluster.partitions), {}, shard=(index, 4))
+        owned.append([offset.partition for offset in tracker.partitions()])
+
+    assert all(len(parts) == 1 for parts in owned)
+    assert sorted(p for parts in owned for p in parts) == [0, 1, 2, 3]
+
+
+class _CountingConsumer(FakeConsumer):
+    listings = 0
+
+    def list_topics(self, topic=None, timeout=-1):
+        self.listings += 1
+        return super().list_topics(topic, timeout)
+
+
+class _LegacyTracker(OffsetTracker):
+    """A custom tracker with the signature from before the metadata cache."""
+
+    def __init__(self, consumer, topics, state, start_from=None):
+        super().__init__(consumer, topics, state, start_from)
+
+
+def _extract(tmp_path, consumer, **kwargs):
+    pipeline = dlt.pipeline(pipeline_name="tracker", pipelines_dir=str(tmp_path))
+    pipeline.extract(enhanced_kafka_consumer(credentials=consumer, batch_timeout=1, **kwargs))
+
+
+def test_custom_tracker_without_metadata_cache(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 1, 3)
+
+    _extract(tmp_path, FakeConsumer(cluster), topics=["orders"], offset_tracker=_LegacyTracker)
+
+
+def test_configured_cache_is_shared_by_discovery_and_tracker(tmp_path):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 3)
+    cluster.add_topic("users", 1, 3)
+    consumer = _CountingConsumer(cluster)
+    trackers = []
+
+    class _Tracker(CustomOffsetTracker):
+        def __init__(self, *args, **kwargs):
+            trackers.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    cache = ClusterMetadataCache(consumer)
+    _extract(tmp_path, consumer, topics_regex="ord.*", offset_tracker=_Tracker, metadata_cache=cache)
+
+    assert trackers == [{"metadata": cache}]
+    assert consumer.listings == 1
@@ -0,0 +1,146 @@
+from src.lib.kafka.adaptive import AdaptiveBatchController
+from src.lib.kafka.helpers import OffsetTracker, default_msg_processor
+from src.lib.kafka.message_processors import JSONMessageProcessor
+from src.lib.kafka.parallel import PartitionWorkerPool, split_partitions
+from src.lib.kafka.resources import read_batches
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+def _read_parallel(cluster, msg_processor, parallelism=4, batch_size=7):
+    consumer = FakeConsumer(cluster)
+    state = {}
+    tracker = OffsetTracker(consumer, list(cluster.partitions), state)
+    rows = []
+    for items in read_batches(
+        consumer,
+        tracker,
+        msg_processor,
+        batch_size,
+        1,
+        parallelism=parallelism,
+        consumer_factory=lambda: FakeConsumer(cluster),
+    ):
+        for item in items:
+            rows.extend(item.data if hasattr(item, "data") else item)
+    return rows, tracker, state
+
+
+def test_split_partitions_spreads_heaviest():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 4, 10)
+    tracker = OffsetTracker(FakeConsumer(cluster), ["t"], {"offsets": {"t": {"0": 8, "1": 2}}})
+
+    groups = split_partitions(tracker, 2)
+
+    assert [[r[1] for r in group] for group in groups] == [[2, 1], [3, 0]]
+    assert groups[1][1] == ("t", 0, 9, 10)
+
+
+def test_shared_processor_counts_every_key():
+    cluster = FakeCluster()
+    cluster.add_topic("a", 8, 500)
+    cluster.add_topic("b", 8, 500, make_key=lambda t, p, i: f'{{"id": {i}}}'.encode())
+    processor = JSONMessageProcessor()
+
+    rows, tracker, _ = _read_parallel(cluster, processor, parallelism=8)
+
+    assert len(rows) == 8000
+    stats = processor.key_format_stats
+    assert stats["a"]["decoded"] == 4000
+    assert stats["b"]["decoded"] == 4000
+    assert not tracker.has_unread
+
+
+def test_partition_ends_reach_tracker():
+    cluster = FakeCluster()
+    # offsets past the last messages have none, e.g. in compacted topics
+    cluster.add_topic("t", 3, 20, trailing_gap=5)
+
+    rows, tracker, state = _read_parallel(cluster, JSONMessageProcessor(), parallelism=3)
+
+    assert len(rows) == 60
+    assert not tracker.has_unread
+    assert state["offsets"]["t"] == {"0": 24, "1": 24, "2": 24}
+
+
+def test_pool_drops_messages_past_range():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 2, 30)
+    pool = PartitionWorkerPool(lambda: FakeConsumer(cluster), JSONMessageProcessor(), 8, 1)
+    ends = []
+
+    consumed = [
+        msg
+        for _, messages in pool.run([[("t", 0, 5, 15)], [("t", 1, 0, 10)]], on_eof=lambda t, p: ends.append((t, p)))
+        for msg in messages
+    ]
+
+    assert sorted((m.partition(), m.offset()) for m in consumed) == [(0, i) for i in range(5, 15)] + [
+        (1, i) for i in range(10)
+    ]
+    assert all(m.offset() < 15 for m in consumed)
+    # the ranges are read exactly, without offset gaps to report
+    assert ends == []
+
+
+class _RecordingController(AdaptiveBatchController):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.groups = set()
+
+    def clone(self):
+        return _RecordingController(self.batch_size, self.batch_timeout, min_batch_size=10)
+
+    def record(self, requested, messages, consume_seconds, decode_seconds):
+        self.groups.add(messages[0].partition())
+        super().record(requested, messages, consume_seconds, decode_seconds)
+
+
+def test_worker_controllers_keep_learning_across_groups():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 3, 200)
+    controller = _RecordingController(20, 1, min_batch_size=10)
+    pool = PartitionWorkerPool(
+        lambda: FakeConsumer(cluster), default_msg_processor, 20, 1, batch_controller=controller
+    )
+
+    groups = [[("t", part, 0, 100)] for part in range(3)]
+    assert sum(len(batch) for batch, _ in pool.run(groups, max_workers=1)) == 300
+    (worker,) = pool._controllers
+    assert worker.groups == {0, 1, 2}
+    # merged back: the next pool starts from what the worker learned
+    assert (controller.batch_size, controller.batch_timeout) == (worker.batch_size, worker.batch_timeout)
+
+
+def test_merge_takes_the_mean():
+    controller = AdaptiveBatchController(1000, 1)
+    workers = [AdaptiveBatchController(size, timeout) for size, timeout in ((1000, 1), (2000, 2), (4000, 0.5))]
+
+    controller.merge(workers)
+
+    assert (controller.batch_size, controller.batch_timeout) == (2333, 3.5 / 3)
+
+
+def test_pool_keeps_worker_consumers_across_runs():
+    cluster = FakeCluster()
+    cluster.add_topic("t", 2, 20)
+    created = []
+
+    def consumer_factory():
+        created.append(FakeConsumer(cluster))
+        return created[-1]
+
+    pool = PartitionWorkerPool(consumer_factory, default_msg_processor, 7, 1)
+    counts = []
+    for start, end in ((0, 10), (10, 20), (20, 20)):
+        groups = [[("t", part, start, end)] for part in range(2)]
+        assert sum(len(batch) for batch, _ in pool.run(groups)) == 2 * (end - start)
+        counts.append(len(created))
+
+    # a worker takes the consumer another one left idle, or creates one
+    assert counts[0] in (1, 2)
+    assert counts == [counts[0]] * 3
+    assert not any(consumer.closed or consumer.assignment() for consumer in created)
+
+    pool.close()
+    assert all(consumer.closed for consumer in created)
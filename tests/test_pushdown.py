@@ -0,0 +1,99 @@
+import pytest
+
+from advanced_usage.helpers import WhereConfig
+from src.lib.kafka.message_processors import JSONMessageProcessor
+from src.lib.kafka.pushdown import RowPushdown
+from tests.fakes import FakeMessage
+
+
+def _filter(*where, select=None):
+    return RowPushdown(select=select, where=list(where)).filter_value
+
+
+@pytest.mark.parametrize(
+    "condition",
+    [
+        {"field": "status", "op": "like", "value": "a"},
+        {"field": "status", "op": "in", "value": None},
+        {"field": "status", "op": "in", "value": "active"},
+        {"field": "id", "op": "not_in", "value": 3},
+        {"field": "id", "op": ">", "value": None},
+        {"op": "==", "value": 1},
+    ],
+)
+def test_rejects_malformed_conditions(condition):
+    with pytest.raises(ValueError):
+        RowPushdown(where=[condition])
+
+
+def test_where_config_checks_the_value():
+    assert WhereConfig(field="status", op="in", value=["a", "b"]).value == ["a", "b"]
+    with pytest.raises(ValueError):
+        WhereConfig(field="status", op="in", value="a")
+
+
+@pytest.mark.parametrize(
+    "condition, passing",
+    [
+        ({"field": "status", "value": "active"}, [{"status": "active"}]),
+        ({"field": "status", "op": "!=", "value": "active"}, [{"status": "gone"}, {}, {"status": None}]),
+        ({"field": "status", "op": "in", "value": ["active", None]}, [{"status": "active"}, {}, {"status": None}]),
+        ({"field": "status", "op": "not_in", "value": ("active",)}, [{"status": "gone"}, {}, {"status": None}]),
+        ({"field": "id", "op": ">=", "value": 2}, [{"id": 2}]),
+        ({"field": "id", "op": "<", "value": 2}, [{"id": 1}]),
+    ],
+)
+def test_missing_and_mistyped_fields_are_safe(condition, passing):
+    filter_value = _filter(condition)
+    values = [{"status": "active"}, {"status": "gone"}, {}, {"status": None}, {"id": 1}, {"id": 2}, {"id": "x"}]
+    values = [v for v in values if set(v) <= {condition["field"]}]
+
+    assert [v for v in values if filter_value(v) is not None] == passing
+
+
+def test_select_projects_filtered_values():
+    filter_value = _filter({"field": "id", "op": ">", "value": 1}, select=["name"])
+
+    assert filter_value({"id": 2, "name": "a", "email": "x"}) == {"name": "a"}
+    assert filter_value({"id": 1, "name": "b"}) is None
+    assert RowPushdown(select=["name"], where=[{"field": "id", "value": 1}]).decode_fields == ["name", "id"]
+
+
+def test_message_conditions():
+    pushdown = RowPushdown(
+        where=[
+            {"field": "topic", "op": "in", "value": ["users"]},
+            {"field": "header.source", "value": "web"},
+            {"field": "key.region", "op": "!=", "value": "us"},
+        ]
+    )
+    keys = {b"1": {"region": "eu"}, b"2": {"region": "us"}, b"3": "plain"}
+
+    def accepts(topic, key, headers):
+        return pushdown.accept_message(FakeMessage(topic, 0, 0, b"{}", key=key, headers=headers), lambda m: keys[m.key()])
+
+    assert accepts("users", b"1", [("source", b"web")])
+    assert not accepts("users", b"2", [("source", b"web")])
+    assert not accepts("orders", b"1", [("source", b"web")])
+    assert not accepts("users", b"1", None)
+    # a key field of a non-record key is None
+    assert accepts("users", b"3", [("source", b"web")])
+
+
+def test_keys_are_decoded_once_per_message(monkeypatch):
+    pushdown = RowPushdown(where=[{"field": "key", "op": "in", "value": [1, 2]}, {"field": "key", "op": "!=", "value": 2}])
+    processor = JSONMessageProcessor(pushdown=pushdown)
+    decoded = []
+    decode_key = processor._deserialize_key
+    monkeypatch.setattr(processor, "_deserialize_key", lambda msg: decoded.append(msg.offset()) or decode_key(msg))
+
+    messages = [FakeMessage("users", 0, i, b'{"id": 1}', key=str(i).encode()) for i in range(4)]
+    rows = processor.process_batch(messages)
+
+    assert [row["_kafka"]["key"] for row in rows] == [1]
+    assert decoded == [0, 1, 2, 3]
+
+
+def test_no_key_memo_without_key_conditions():
+    decode_key = lambda msg: None
+    assert RowPushdown(where=[{"field": "topic", "value": "t"}]).batch_key_decoder(decode_key) is decode_key
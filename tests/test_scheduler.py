@@ -0,0 +1,96 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from advanced_usage.helpers import ResourceConfig
+from advanced_usage.scheduler import LagScheduler
+from advanced_usage.streaming import committed_offsets
+from tests.fakes import FakeCluster, FakeConsumer
+
+
+class _Pipeline:
+    pipeline_name = "orders_duckdb"
+    default_schema_name = None
+
+    def __init__(self, offsets):
+        self.state = {"sources": {"orders_source": {"resources": {"orders": {"offsets": offsets}}}}}
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 2, 10)
+    built = []
+
+    def build_pipeline(self, destination="duckdb", shard=None):
+        built.append(self.name)
+        return _Pipeline({"orders": {"0": 9}})
+
+    monkeypatch.setattr(ResourceConfig, "create_consumer", lambda self: FakeConsumer(cluster))
+    monkeypatch.setattr(ResourceConfig, "create_admin_client", lambda self: None)
+    monkeypatch.setattr(ResourceConfig, "build_pipeline", build_pipeline)
+    config = ResourceConfig(
+        name="orders",
+        kafka={"consumer_group_id": "g", "topics": ["orders"]},
+        processing={"serializer": "json", "target_dataset": None},
+    )
+    scheduler = LagScheduler([config], max_workers=1)
+    scheduler.built = built
+    yield scheduler
+    if scheduler._pool is not None:
+        scheduler._pool.shutdown()
+
+
+def _done(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_committed_offsets_before_schema_is_known():
+    assert committed_offsets(_Pipeline({"t": {"0": 3}}), "orders") == {"t": {"0": 3}}
+
+
+def test_lag_builds_pipeline_once(scheduler):
+    assert scheduler.lag(scheduler.resources["orders"]) == 10
+    assert scheduler.lag(scheduler.resources["orders"]) == 10
+    assert scheduler.built == ["orders"]
+
+
+def test_failed_run_is_rescheduled(scheduler):
+    scheduler._new_pool()
+    scheduler._last_run["orders"] = 0.0
+    scheduler._running["orders"] = (_done(error=RuntimeError("boom")), scheduler._pool)
+
+    scheduler._collect()
+
+    assert scheduler._running == {}
+    assert "orders" not in scheduler._last_run
+    assert scheduler.due() == ["orders"]
+
+
+def test_broken_pool_is_replaced(scheduler):
+    scheduler._new_pool()
+    pool = scheduler._pool
+    scheduler._running["orders"] = (_done(error=BrokenProcessPool("killed")), pool)
+
+    scheduler._collect()
+
+    assert scheduler._running == {}
+    assert scheduler._pool is not pool
+
+
+def test_finished_run_is_logged(scheduler):
+    scheduler._new_pool()
+    scheduler._last_run["orders"] = 1.0
+    result = {"status": "ok", "rows": {"orders": 5}, "seconds": 0.1}
+    scheduler._running["orders"] = (_done(result), scheduler._pool)
+
+    scheduler._collect()
+
+    assert scheduler._running == {}
+    assert scheduler._last_run["orders"] == 1.0
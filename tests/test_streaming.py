@@ -0,0 +1,119 @@
+import os
+import signal
+import threading
+import time
+
+import dlt
+import pytest
+
+from advanced_usage.helpers import ResourceConfig
+from advanced_usage.streaming import ContinuousRunner, PipelinedRunner, committed_offsets
+from tests.fakes import FakeCluster, FakeConsumer, FakeMessage, json_value
+
+
+@pytest.fixture
+def cluster():
+    cluster = FakeCluster()
+    cluster.add_topic("orders", 1, 30)
+    return cluster
+
+
+@pytest.fixture
+def config(monkeypatch, tmp_path, cluster):
+    def build_pipeline(self, destination="duckdb", shard=None):
+        return dlt.pipeline(
+            pipeline_name=f"{self.name}_pipeline",
+            pipelines_dir=str(tmp_path),
+            destination=dlt.destinations.duckdb(str(tmp_path / "kafka.duckdb")),
+            dataset_name="orders",
+        )
+
+    monkeypatch.setattr(ResourceConfig, "create_consumer", lambda self: FakeConsumer(cluster))
+    monkeypatch.setattr(ResourceConfig, "create_admin_client", lambda self: None)
+    monkeypatch.setattr(ResourceConfig, "build_pipeline", build_pipeline)
+    return ResourceConfig(
+        name="orders",
+        kafka={"consumer_group_id": "g", "topics": ["orders"]},
+        processing={"serializer": "json", "target_dataset": None, "batch_size": 10, "batch_timeout": 1},
+    )
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reader_hands_over_chunks_and_blocks_on_full_queue(config):
+    runner = PipelinedRunner(config, max_queued_cycles=1, max_chunk_batches=1)
+    state = {"offsets": {}}
+    reader = threading.Thread(target=runner._read, args=(state,), daemon=True)
+    reader.start()
+    try:
+        _wait_for(runner._queue.full)
+        # the second chunk is read, and waits for room in the queue
+        _wait_for(lambda: state["offsets"].get("orders", {}).get("0") == 19)
+        time.sleep(0.2)
+        assert reader.is_alive()
+        assert state["offsets"]["orders"]["0"] == 19
+
+        items, offsets = runner._queue.get()
+        assert offsets == {"orders": {"0": 9}}
+        assert sum(len(item.data) for item in items) == 10
+
+        _wait_for(lambda: state["offsets"]["orders"]["0"] == 29)
+    finally:
+        runner.stop()
+        while reader.is_alive():
+            runner._queue.queue.clear()
+            reader.join(0.1)
+
+
+def test_chunks_are_loaded_with_their_offsets(config):
+    runner = PipelinedRunner(config, interval=0.1, max_cycles=3, max_chunk_batches=1)
+
+    assert runner.run() == 3
+
+    assert committed_offsets(runner.pipeline, config.resource_name) == {"orders": {"0": 29}}
+    with runner.pipeline.sql_client() as client:
+        assert client.execute_sql("select count(*) from orders")[0][0] == 30
+
+
+def test_continuous_runner_keeps_workers_and_stops_on_sigterm(monkeypatch, config, cluster):
+    cluster.add_topic("orders", 2, 30)
+    created = []
+
+    def create_consumer(self):
+        created.append(FakeConsumer(cluster))
+        return created[-1]
+
+    monkeypatch.setattr(ResourceConfig, "create_consumer", create_consumer)
+    config.processing.parallelism = 2
+    runner = ContinuousRunner(config, interval=0)
+    run_cycle = runner.run_cycle
+    cycles = []
+
+    def run_cycle_then_produce():
+        run_cycle()
+        cycles.append(len(created))
+        if len(cycles) == 2:
+            os.kill(os.getpid(), signal.SIGTERM)
+        for part in range(2):
+            offset = cluster.high[("orders", part)]
+            cluster.logs[("orders", part)].append(FakeMessage("orders", part, offset, json_value("orders", part, offset)))
+            cluster.high[("orders", part)] = offset + 1
+
+    monkeypatch.setattr(runner, "run_cycle", run_cycle_then_produce)
+    handler = signal.getsignal(signal.SIGTERM)
+
+    # the in-flight cycle is loaded, no other one starts
+    assert runner.run() == 2
+    assert signal.getsignal(signal.SIGTERM) is handler
+
+    assert committed_offsets(runner.pipeline, config.resource_name) == {"orders": {"0": 30, "1": 30}}
+    with runner.pipeline.sql_client() as client:
+        assert client.execute_sql("select count(*) from orders")[0][0] == 62
+    # the worker consumers of the first cycle are reused by the second one
+    assert cycles[0] == cycles[1] == len(created)
+    assert all(consumer.closed for consumer in created)